@@ -0,0 +1,118 @@
+"""Partition play history by month
+
+Revision ID: 2bbd317959c9
+Revises: da0e2e6ad3de
+Create Date: 2026-10-18 03:21:37.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '2bbd317959c9'
+down_revision = 'da0e2e6ad3de'
+branch_labels = None
+depends_on = None
+
+# Months of partitions created ahead of the current one, the API keeps
+# creating them from then on
+PARTITIONS_AHEAD = 3
+
+
+def upgrade():
+    op.rename_table('playhistory', 'playhistory_unpartitioned')
+    op.execute('ALTER TABLE playhistory_unpartitioned RENAME CONSTRAINT playhistory_pkey TO playhistory_unpartitioned_pkey')
+    op.drop_index('ix_playhistory_user_id_played_at', table_name='playhistory_unpartitioned')
+
+    op.create_table('playhistory',
+    sa.Column('song_id', sa.Uuid(), nullable=False),
+    sa.Column('played_at', sa.DateTime(), nullable=False),
+    sa.Column('duration_played_ms', sa.Integer(), nullable=False),
+    sa.Column('device_type', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('skip_reason', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.ForeignKeyConstraint(['song_id'], ['song.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id', 'played_at'),
+    postgresql_partition_by='RANGE (played_at)'
+    )
+    op.create_index('ix_playhistory_user_id_played_at', 'playhistory', ['user_id', 'played_at', 'id'], unique=False)
+    op.create_index('ix_playhistory_song_id_played_at', 'playhistory', ['song_id', 'played_at'], unique=False)
+
+    # Plays outside every monthly partition, e.g. reported late by clients
+    op.execute('CREATE TABLE playhistory_default PARTITION OF playhistory DEFAULT')
+    # A partition per month of existing plays, up to a few months ahead
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', LEAST(
+                        (SELECT min(played_at) FROM playhistory_unpartitioned),
+                        now() AT TIME ZONE 'UTC'
+                    )),
+                    date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{PARTITIONS_AHEAD} months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF playhistory FOR VALUES FROM (%L) TO (%L)',
+                    to_char(month, '"playhistory_y"YYYY"m"MM'),
+                    month,
+                    month + interval '1 month'
+                );
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute("""
+        INSERT INTO playhistory (id, user_id, song_id, played_at, duration_played_ms, device_type, skip_reason)
+        SELECT id, user_id, song_id, played_at, duration_played_ms, device_type, skip_reason
+        FROM playhistory_unpartitioned
+    """)
+    op.drop_table('playhistory_unpartitioned')
+
+    op.create_table('playhistorymonthly',
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('song_id', sa.Uuid(), nullable=False),
+    sa.Column('plays', sa.Integer(), nullable=False),
+    sa.Column('skips', sa.Integer(), nullable=False),
+    sa.Column('duration_played_ms', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('month', 'user_id', 'song_id')
+    )
+    op.create_index('ix_playhistorymonthly_song_id_month', 'playhistorymonthly', ['song_id', 'month'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_playhistorymonthly_song_id_month', table_name='playhistorymonthly')
+    op.drop_table('playhistorymonthly')
+
+    # Plays already rolled up into monthly totals are not restored
+    op.rename_table('playhistory', 'playhistory_partitioned')
+    op.create_table('playhistory',
+    sa.Column('id', sa.Uuid(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('song_id', sa.Uuid(), nullable=False),
+    sa.Column('played_at', sa.DateTime(), nullable=False),
+    sa.Column('duration_played_ms', sa.Integer(), nullable=False),
+    sa.Column('device_type', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('skip_reason', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.ForeignKeyConstraint(['song_id'], ['song.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id', name='playhistory_unpartitioned_pkey')
+    )
+    op.execute("""
+        INSERT INTO playhistory (id, user_id, song_id, played_at, duration_played_ms, device_type, skip_reason)
+        SELECT id, user_id, song_id, played_at, duration_played_ms, device_type, skip_reason
+        FROM playhistory_partitioned
+    """)
+    # Drops the partitions with it
+    op.drop_table('playhistory_partitioned')
+    op.execute('ALTER TABLE playhistory RENAME CONSTRAINT playhistory_unpartitioned_pkey TO playhistory_pkey')
+    op.create_index('ix_playhistory_user_id_played_at', 'playhistory', ['user_id', 'played_at', 'id'], unique=False)
@@ -0,0 +1,29 @@
+"""Add upload completion start time
+
+Revision ID: 5b8e3d1f7a26
+Revises: 7c1d4e8b2a90
+Create Date: 2026-10-18 16:41:09.215377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e3d1f7a26'
+down_revision = '7c1d4e8b2a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('uploadsession', sa.Column('completion_started_at', sa.DateTime(), nullable=True))
+    # Sessions already completing count from now
+    op.execute(
+        "UPDATE uploadsession SET completion_started_at = now() AT TIME ZONE 'utc' "
+        "WHERE status = 'COMPLETING'"
+    )
+
+
+def downgrade():
+    op.drop_column('uploadsession', 'completion_started_at')
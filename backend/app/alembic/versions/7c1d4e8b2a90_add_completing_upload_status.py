@@ -0,0 +1,31 @@
+"""Add completing upload status
+
+Revision ID: 7c1d4e8b2a90
+Revises: e9211fcd84ef
+Create Date: 2026-10-18 14:02:17.834120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '7c1d4e8b2a90'
+down_revision = 'e9211fcd84ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TYPE uploadstatus ADD VALUE IF NOT EXISTS 'COMPLETING' AFTER 'ACTIVE'")
+
+
+def downgrade():
+    # Enum values can't be dropped, the type is recreated without it
+    op.execute("UPDATE uploadsession SET status = 'ACTIVE' WHERE status = 'COMPLETING'")
+    op.execute("ALTER TYPE uploadstatus RENAME TO uploadstatus_old")
+    op.execute("CREATE TYPE uploadstatus AS ENUM ('ACTIVE', 'COMPLETED')")
+    op.execute(
+        "ALTER TABLE uploadsession ALTER COLUMN status TYPE uploadstatus "
+        "USING status::text::uploadstatus"
+    )
+    op.execute("DROP TYPE uploadstatus_old")
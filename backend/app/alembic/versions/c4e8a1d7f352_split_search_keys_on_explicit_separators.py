@@ -0,0 +1,49 @@
+"""Split search keys on explicit separators
+
+Revision ID: c4e8a1d7f352
+Revises: 5b8e3d1f7a26
+Create Date: 2026-10-18 18:12:40.731208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a1d7f352'
+down_revision = '5b8e3d1f7a26'
+branch_labels = None
+depends_on = None
+
+
+# Table, name column
+NAMES = (('artist', 'stage_name'), ('album', 'title'), ('song', 'title'), ('playlist', 'name'))
+
+# As in services.normalize
+SEPARATORS = (
+    r"[\u0001-\u002f\u003a-\u0040\u005b-\u0060\u007b-\u00bf\u00d7\u00f7"
+    r"\u2000-\u2bff\u2e00-\u2e7f\u3000-\u3004\u3008-\u3020\u3030\u30fb"
+    r"\U0001f000-\U0001faff]+"
+)
+
+# As in models.music, before and after
+OLD_SEARCH_KEY = "btrim(regexp_replace(fold_accents(lower({})), '[^[:alnum:]]+', ' ', 'g'))"
+SEARCH_KEY = f"btrim(regexp_replace(fold_accents(lower({{}})), '{SEPARATORS}', ' ', 'g'))"
+
+
+def replace_search_keys(expression):
+    # Generated columns can't change their expression before Postgres 17,
+    # the column and its index are added again and filled for every row
+    for table, name in NAMES:
+        op.drop_index(f'ix_{table}_search_key_trgm', table_name=table, postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+        op.drop_column(table, 'search_key')
+        op.add_column(table, sa.Column('search_key', sa.String(), sa.Computed(expression.format(name), persisted=True), nullable=True))
+        op.create_index(f'ix_{table}_search_key_trgm', table, ['search_key'], unique=False, postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+
+
+def upgrade():
+    replace_search_keys(SEARCH_KEY)
+
+
+def downgrade():
+    replace_search_keys(OLD_SEARCH_KEY)
@@ -0,0 +1,82 @@
+"""Add accent insensitive search keys
+
+Revision ID: e9211fcd84ef
+Revises: fad310855564
+Create Date: 2026-10-18 03:35:42.490591
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9211fcd84ef'
+down_revision = 'fad310855564'
+branch_labels = None
+depends_on = None
+
+
+# Table, name column
+NAMES = (('artist', 'stage_name'), ('album', 'title'), ('song', 'title'), ('playlist', 'name'))
+
+# As in services.normalize
+COMBINING_MARKS = "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]"
+
+FOLD_ACCENTS = f"""
+    CREATE FUNCTION fold_accents(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+        SELECT translate(regexp_replace(normalize(value, NFKD), '{COMBINING_MARKS}', '', 'g'), 'đĐ', 'dD')
+    $$
+"""
+
+
+# As in models.music, computed by the database for every row
+SEARCH_KEY = "btrim(regexp_replace(fold_accents(lower({})), '[^[:alnum:]]+', ' ', 'g'))"
+
+
+def vectors(fold):
+    """The search vectors the API maintains, see crud.music"""
+    def tsvector(text, weight):
+        text = f"coalesce({text}, '')"
+        return f"setweight(to_tsvector('simple', {f'fold_accents({text})' if fold else text}), '{weight}')"
+
+    artist_name = '(SELECT stage_name FROM artist WHERE artist.id = {}.artist_id)'
+    genre_name = '(SELECT name FROM genre WHERE genre.id = {}.genre_id)'
+    return {
+        'artist': [tsvector('stage_name', 'A'), tsvector('biography', 'D')],
+        'album': [
+            tsvector('title', 'A'),
+            tsvector(artist_name.format('album'), 'B'),
+            tsvector(genre_name.format('album'), 'C'),
+            tsvector('description', 'D'),
+        ],
+        'song': [
+            tsvector('title', 'A'),
+            tsvector(artist_name.format('song'), 'B'),
+            tsvector('(SELECT title FROM album WHERE album.id = song.album_id)', 'C'),
+            tsvector(genre_name.format('song'), 'C'),
+            tsvector('lyrics', 'D'),
+        ],
+        'playlist': [tsvector('name', 'A'), tsvector('description', 'D')],
+    }
+
+
+def upgrade():
+    op.execute(FOLD_ACCENTS)
+    for table, name in NAMES:
+        # Filled for the existing rows as the column is added
+        op.add_column(table, sa.Column('search_key', sa.String(), sa.Computed(SEARCH_KEY.format(name), persisted=True), nullable=True))
+        op.drop_index(f'ix_{table}_{name}_trgm', table_name=table, postgresql_using='gin', postgresql_ops={name: 'gin_trgm_ops'})
+        op.create_index(f'ix_{table}_search_key_trgm', table, ['search_key'], unique=False, postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+    for table, parts in vectors(fold=True).items():
+        op.execute(f"UPDATE {table} SET search_vector = {' || '.join(parts)}")
+
+
+def downgrade():
+    for table, parts in vectors(fold=False).items():
+        op.execute(f"UPDATE {table} SET search_vector = {' || '.join(parts)}")
+    for table, name in reversed(NAMES):
+        op.drop_index(f'ix_{table}_search_key_trgm', table_name=table, postgresql_using='gin', postgresql_ops={'search_key': 'gin_trgm_ops'})
+        op.create_index(f'ix_{table}_{name}_trgm', table, [name], unique=False, postgresql_using='gin', postgresql_ops={name: 'gin_trgm_ops'})
+        op.drop_column(table, 'search_key')
+    op.execute('DROP FUNCTION fold_accents(text)')
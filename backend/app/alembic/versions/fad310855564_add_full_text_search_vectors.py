@@ -0,0 +1,68 @@
+"""Add full-text search vectors
+
+Revision ID: fad310855564
+Revises: 6bccb5b95a63
+Create Date: 2026-10-18 03:18:58.934196
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'fad310855564'
+down_revision = '6bccb5b95a63'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('artist', 'album', 'song', 'playlist')
+
+# The vectors the API maintains from then on, see crud.music
+BACKFILL = {
+    'artist': """
+        setweight(to_tsvector('simple', stage_name), 'A')
+        || setweight(to_tsvector('simple', coalesce(biography, '')), 'D')
+    """,
+    'album': """
+        setweight(to_tsvector('simple', title), 'A')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT stage_name FROM artist WHERE artist.id = album.artist_id), ''
+        )), 'B')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM genre WHERE genre.id = album.genre_id), ''
+        )), 'C')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    """,
+    'song': """
+        setweight(to_tsvector('simple', title), 'A')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT stage_name FROM artist WHERE artist.id = song.artist_id), ''
+        )), 'B')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT title FROM album WHERE album.id = song.album_id), ''
+        )), 'C')
+        || setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM genre WHERE genre.id = song.genre_id), ''
+        )), 'C')
+        || setweight(to_tsvector('simple', coalesce(lyrics, '')), 'D')
+    """,
+    'playlist': """
+        setweight(to_tsvector('simple', name), 'A')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+    """,
+}
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(f'UPDATE {table} SET search_vector = {BACKFILL[table]}')
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table, postgresql_using='gin')
+        op.drop_column(table, 'search_vector')
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import login, private, users, utils, social, search, discover, play, files
+from app.api.routes import login, private, users, utils, social, search, discover, play, files, media
 from app.api.routes.music import (
     artists_router,
     albums_router,
@@ -28,6 +28,7 @@ api_router.include_router(search.router)
 api_router.include_router(discover.router)
 api_router.include_router(play.router)
 api_router.include_router(files.router)
+api_router.include_router(media.router)
 
 if settings.ENVIRONMENT == "local":
     api_router.include_router(private.router)
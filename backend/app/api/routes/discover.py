@@ -2,13 +2,15 @@
 Discover and recommendation API routes
 """
 
+from datetime import datetime, timedelta
 from typing import Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
 from app import crud
+from app.services.trending import trending
 from app.models import (
     Song, SongsPublic,
     Album, AlbumsPublic,
@@ -21,12 +23,20 @@ router = APIRouter(prefix="/discover", tags=["discover"])
 
 @router.get("/popular-songs", response_model=SongsPublic)
 def get_popular_songs(
-    *, session: SessionDep, skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
-    Get popular songs ordered by play count.
+    Get popular songs, those played most recently.
     """
-    songs = crud.get_popular_songs(session=session, skip=skip, limit=limit)
+    songs = crud.get_songs_by_ids(
+        session=session, song_ids=trending.top(skip=skip, limit=limit)
+    )
+    if not songs and not skip:
+        # Nothing played lately
+        songs = crud.get_popular_songs(session=session, skip=skip, limit=limit)
     return SongsPublic(data=songs, count=len(songs))
 
 
@@ -43,15 +53,38 @@ def get_new_releases(
 
 @router.get("/trending-artists", response_model=ArtistsPublic)
 def get_trending_artists(
-    *, session: SessionDep, skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
-    Get trending artists.
+    Get trending artists, the most played over the last week.
     """
-    artists = crud.get_artists(session=session, skip=skip, limit=limit)
+    since = datetime.utcnow().date() - timedelta(days=7)
+    artists = crud.get_chart_artists(session=session, since=since, skip=skip, limit=limit)
+    if not artists and not skip:
+        # Nothing played lately
+        artists = crud.get_artists(session=session, skip=skip, limit=limit)
     return ArtistsPublic(data=artists, count=len(artists))
 
 
+@router.get("/charts/songs", response_model=SongsPublic)
+def get_song_chart(
+    *,
+    session: SessionDep,
+    days: int = Query(default=7, ge=1, le=365),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
+) -> Any:
+    """
+    Get the most played songs over the last ``days`` days.
+    """
+    since = datetime.utcnow().date() - timedelta(days=days)
+    songs = crud.get_chart_songs(session=session, since=since, skip=skip, limit=limit)
+    return SongsPublic(data=songs, count=len(songs))
+
+
 @router.get("/featured-playlists", response_model=PlaylistsPublic)
 def get_featured_playlists(
     *, session: SessionDep, skip: int = 0, limit: int = 50
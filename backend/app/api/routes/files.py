@@ -2,143 +2,425 @@
 File upload and management API routes
 """
 
+import mimetypes
+import re
 import uuid
-import os
+from dataclasses import asdict
+from datetime import datetime, timedelta
 from typing import Any
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import RedirectResponse, Response
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app.api.deps import CurrentUser, SessionDep, StorageDep, get_current_active_superuser
 from app import crud
-from app.models import Message
+from app.models import (
+    Message,
+    UploadSession, UploadSessionCreate, UploadSessionPublic, UploadStatus,
+)
 from app.core.config import settings
+from app.services.blobs import (
+    COVERS_PREFIX,
+    DIGEST_PATTERN,
+    IMMUTABLE_CACHE_CONTROL,
+    SONGS_PREFIX,
+    blob_digest,
+    blob_key,
+    collect_derived_garbage,
+    collect_garbage,
+)
+from app.services.packaging import (
+    HLS_PREFIX,
+    MASTER_PLAYLIST,
+    PLAYLIST_CONTENT_TYPE,
+    SEGMENT_CONTENT_TYPE,
+    VARIANT_PLAYLIST,
+    hls_key,
+)
+from app.services.storage import StorageBackend, get_storage
+from app.services.streaming import ranged_object_response
+from app.services.transcoding import (
+    RENDITION_CONTENT_TYPE,
+    RENDITION_SUFFIX,
+    RENDITIONS_PREFIX,
+)
+from app.services.uploads import (
+    FormUpload,
+    InvalidChunk,
+    InvalidForm,
+    UnsupportedContentType,
+    UploadTooLarge,
+    allocate_partial,
+    commit_partial,
+    save_form_upload,
+    write_chunk,
+)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
-# Create upload directories
-UPLOAD_DIR = Path("uploads")
-SONGS_DIR = UPLOAD_DIR / "songs"
-COVERS_DIR = UPLOAD_DIR / "covers"
-AVATARS_DIR = UPLOAD_DIR / "avatars"
+# Uploads are staged on local disk, directories are created on first use.
+# Resumable uploads assemble their chunks here too, so they need sticky
+# routing (or a shared volume) when several replicas serve them.
+SCRATCH_DIR = Path(settings.UPLOAD_SCRATCH_DIR)
+PARTIAL_DIR = SCRATCH_DIR / "partial"
 
-# Ensure directories exist
-for dir_path in [UPLOAD_DIR, SONGS_DIR, COVERS_DIR, AVATARS_DIR]:
-    dir_path.mkdir(parents=True, exist_ok=True)
+SONG_CONTENT_TYPES = ["audio/mpeg", "audio/wav", "audio/flac", "audio/mp4", "audio/ogg"]
+COVER_CONTENT_TYPES = ["image/jpeg", "image/png", "image/webp"]
 
+# Uploads parse the request body themselves rather than take an UploadFile,
+# which Starlette would spool whole before the route runs. This documents
+# the form they expect.
+FILE_FORM_BODY: dict[str, Any] = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                }
+            }
+        },
+    }
+}
+
+RENDITION_FILENAME_PATTERN = re.compile(rf"^\d+k{re.escape(RENDITION_SUFFIX)}$")
+
+# Paths of a package below /files/hls/{digest}/
+HLS_PATH_PATTERN = re.compile(
+    rf"^({re.escape(MASTER_PLAYLIST)}|\d+k/({re.escape(VARIANT_PLAYLIST)}|seg_\d+\.ts))$"
+)
+
+
+async def _save_form_upload(
+    request: Request,
+    storage: StorageBackend,
+    prefix: str,
+    *,
+    content_types: list[str],
+    max_size: int,
+    too_large: str,
+) -> FormUpload:
+    try:
+        return await save_form_upload(
+            request.headers,
+            request.stream(),
+            storage,
+            prefix,
+            field="file",
+            content_types=content_types,
+            scratch_dir=SCRATCH_DIR,
+            max_size=max_size,
+        )
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail=too_large)
+    except UnsupportedContentType:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {', '.join(content_types)}"
+        )
+    except InvalidForm as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-@router.post("/upload/song", response_model=dict)
+
+@router.post("/upload/song", response_model=dict, openapi_extra=FILE_FORM_BODY)
 async def upload_song_file(
     *, 
     session: SessionDep, 
     current_user: CurrentUser,
-    file: UploadFile = File(...)
+    storage: StorageDep,
+    request: Request,
 ) -> Any:
     """
-    Upload a song file (MP3, WAV, FLAC, etc.)
+    Upload a song file (MP3, WAV, FLAC, etc.) in the multipart "file" field.
+    Its metadata is extracted and it is transcoded and packaged for HLS
+    streaming in the background.
     """
-    # Check file type
-    allowed_types = ["audio/mpeg", "audio/wav", "audio/flac", "audio/mp4", "audio/ogg"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"File type not allowed. Allowed types: {', '.join(allowed_types)}"
-        )
-    
-    # Check file size (max 50MB)
+    # Stream to storage (max 50MB), checking the type before any of it is kept
     max_size = 50 * 1024 * 1024  # 50MB
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > max_size:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 50MB")
-    
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = SONGS_DIR / unique_filename
+    upload = await _save_form_upload(
+        request,
+        storage,
+        SONGS_PREFIX,
+        content_types=SONG_CONTENT_TYPES,
+        max_size=max_size,
+        too_large="File too large. Maximum size is 50MB",
+    )
+    stored = upload.stored
     
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
+    await run_in_threadpool(
+        crud.enqueue_media_job,
+        session=session,
+        source_key=stored.key,
+        source_digest=stored.sha256,
+    )
     
     # Return file info
-    file_url = f"/api/v1/files/songs/{unique_filename}"
+    file_url = f"/api/v1/files/songs/{stored.filename}"
     
     return {
-        "filename": unique_filename,
-        "original_filename": file.filename,
+        "filename": stored.filename,
+        "original_filename": upload.original_filename,
         "file_url": file_url,
-        "file_path": str(file_path),
-        "file_size": file_size,
-        "content_type": file.content_type
+        "file_path": stored.key,
+        "file_size": stored.size,
+        "sha256": stored.sha256,
+        "content_type": upload.content_type
     }
 
 
-@router.post("/upload/cover", response_model=dict)
-async def upload_cover_image(
-    *, 
-    session: SessionDep, 
-    current_user: CurrentUser,
-    file: UploadFile = File(...)
+# ===== RESUMABLE UPLOADS =====
+
+def _upload_session_public(upload: UploadSession) -> UploadSessionPublic:
+    return UploadSessionPublic.model_validate(
+        upload,
+        update={
+            "received_bytes": crud.get_upload_received_bytes(upload),
+            "missing_offsets": crud.get_upload_missing_offsets(upload),
+        },
+    )
+
+
+def _get_active_upload(
+    session: SessionDep, current_user: CurrentUser, upload_id: uuid.UUID
+) -> UploadSession:
+    upload = crud.get_upload_session(session=session, upload_id=upload_id)
+    if not upload or upload.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if upload.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if upload.status != UploadStatus.ACTIVE:
+        raise HTTPException(status_code=409, detail="Upload session already completed")
+    return upload
+
+
+@router.post("/upload/sessions", response_model=UploadSessionPublic)
+def create_upload_session(
+    *, session: SessionDep, current_user: CurrentUser, upload_in: UploadSessionCreate
 ) -> Any:
     """
-    Upload album/song cover image
+    Start a resumable song upload. Send the file with PUT requests of
+    ``chunk_size`` bytes at the returned offsets, then complete the session.
     """
-    # Check file type
-    allowed_types = ["image/jpeg", "image/png", "image/webp"]
-    if file.content_type not in allowed_types:
+    if upload_in.content_type not in SONG_CONTENT_TYPES:
         raise HTTPException(
-            status_code=400, 
-            detail=f"File type not allowed. Allowed types: {', '.join(allowed_types)}"
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {', '.join(SONG_CONTENT_TYPES)}"
+        )
+    if upload_in.total_size > settings.UPLOAD_SESSION_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size is {settings.UPLOAD_SESSION_MAX_SIZE // (1024 * 1024)}MB"
+        )
+    open_sessions = crud.count_open_upload_sessions(session=session, owner_id=current_user.id)
+    if open_sessions >= settings.UPLOAD_SESSION_MAX_OPEN_PER_USER:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many open upload sessions. Complete or delete one of the {open_sessions} first"
         )
     
-    # Check file size (max 5MB)
-    max_size = 5 * 1024 * 1024  # 5MB
-    content = await file.read()
-    file_size = len(content)
-    
-    if file_size > max_size:
-        raise HTTPException(status_code=400, detail="File too large. Maximum size is 5MB")
+    upload = crud.create_upload_session(
+        session=session,
+        upload_create=upload_in,
+        owner_id=current_user.id,
+        chunk_size=settings.UPLOAD_SESSION_CHUNK_SIZE,
+        expires_in=timedelta(hours=settings.UPLOAD_SESSION_EXPIRE_HOURS),
+    )
+    allocate_partial(PARTIAL_DIR / f"{upload.id}.part", upload.total_size)
+    return _upload_session_public(upload)
+
+
+@router.get("/upload/sessions/{upload_id}", response_model=UploadSessionPublic)
+def read_upload_session(
+    *, session: SessionDep, current_user: CurrentUser, upload_id: uuid.UUID
+) -> Any:
+    """
+    Get upload progress and the offsets of chunks still missing.
+    """
+    upload = _get_active_upload(session, current_user, upload_id)
+    return _upload_session_public(upload)
+
+
+@router.put("/upload/sessions/{upload_id}", response_model=UploadSessionPublic)
+async def upload_session_chunk(
+    *,
+    request: Request,
+    session: SessionDep,
+    current_user: CurrentUser,
+    upload_id: uuid.UUID,
+    offset: int
+) -> Any:
+    """
+    Upload one chunk as the raw request body. ``offset`` must be a multiple
+    of the session's chunk size; re-sending a chunk overwrites it.
+    """
+    upload = await run_in_threadpool(_get_active_upload, session, current_user, upload_id)
+    if offset < 0 or offset >= upload.total_size or offset % upload.chunk_size:
+        raise HTTPException(status_code=400, detail="Invalid chunk offset")
+
+    index = offset // upload.chunk_size
+    try:
+        await write_chunk(
+            PARTIAL_DIR / f"{upload.id}.part",
+            offset=offset,
+            length=crud.upload_chunk_length(upload, index),
+            body=request.stream(),
+        )
+    except InvalidChunk as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Generate unique filename
-    file_extension = Path(file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = COVERS_DIR / unique_filename
+    marked = await run_in_threadpool(
+        crud.mark_upload_chunk_received, session=session, upload_id=upload.id, index=index
+    )
+    # Deleted or completed while the chunk was being written
+    if marked is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return _upload_session_public(marked)
+
+
+@router.post("/upload/sessions/{upload_id}/complete", response_model=dict)
+async def complete_upload_session(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    storage: StorageDep,
+    upload_id: uuid.UUID
+) -> Any:
+    """
+    Assemble a fully received upload into a song file.
+    """
+    upload = await run_in_threadpool(_get_active_upload, session, current_user, upload_id)
+    missing = crud.get_upload_missing_offsets(upload)
+    if missing:
+        raise HTTPException(
+            status_code=409, detail=f"Upload incomplete, {len(missing)} chunks missing"
+        )
+    # Claimed before the partial file is hashed and moved, concurrent
+    # completions of the same session stop here
+    claimed = await run_in_threadpool(
+        crud.start_upload_completion, session=session, upload_id=upload.id
+    )
+    if claimed is None:
+        raise HTTPException(status_code=409, detail="Upload session already completed")
+    upload = claimed
+    try:
+        stored = await commit_partial(
+            PARTIAL_DIR / f"{upload.id}.part",
+            storage,
+            SONGS_PREFIX,
+            suffix=Path(upload.filename).suffix,
+            content_type=upload.content_type,
+        )
+        await run_in_threadpool(
+            crud.complete_upload_session, session=session, upload=upload
+        )
+    except BaseException:
+        # The partial file is kept until the blob is stored, so the client
+        # can complete the session again
+        await run_in_threadpool(
+            crud.reopen_upload_session, session=session, upload_id=upload.id
+        )
+        raise
+    await run_in_threadpool(
+        crud.enqueue_media_job,
+        session=session,
+        source_key=stored.key,
+        source_digest=stored.sha256,
+    )
     
-    # Save file
-    with open(file_path, "wb") as f:
-        f.write(content)
+    return {
+        "filename": stored.filename,
+        "original_filename": upload.filename,
+        "file_url": f"/api/v1/files/songs/{stored.filename}",
+        "file_path": stored.key,
+        "file_size": stored.size,
+        "sha256": stored.sha256,
+        "content_type": upload.content_type
+    }
+
+
+@router.delete("/upload/sessions/{upload_id}")
+def delete_upload_session(
+    *, session: SessionDep, current_user: CurrentUser, upload_id: uuid.UUID
+) -> Message:
+    """
+    Abort a resumable upload and discard its chunks.
+    """
+    upload = _get_active_upload(session, current_user, upload_id)
+    crud.delete_upload_session(session=session, upload_id=upload.id)
+    (PARTIAL_DIR / f"{upload.id}.part").unlink(missing_ok=True)
+    return Message(message="Upload session deleted successfully")
+
+
+@router.post("/upload/cover", response_model=dict, openapi_extra=FILE_FORM_BODY)
+async def upload_cover_image(
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    storage: StorageDep,
+    request: Request,
+) -> Any:
+    """
+    Upload album/song cover image in the multipart "file" field
+    """
+    # Stream to storage (max 5MB), checking the type before any of it is kept
+    max_size = 5 * 1024 * 1024  # 5MB
+    upload = await _save_form_upload(
+        request,
+        storage,
+        COVERS_PREFIX,
+        content_types=COVER_CONTENT_TYPES,
+        max_size=max_size,
+        too_large="File too large. Maximum size is 5MB",
+    )
+    stored = upload.stored
     
     # Return file info
-    file_url = f"/api/v1/files/covers/{unique_filename}"
+    file_url = f"/api/v1/files/covers/{stored.filename}"
     
     return {
-        "filename": unique_filename,
-        "original_filename": file.filename,
+        "filename": stored.filename,
+        "original_filename": upload.original_filename,
         "file_url": file_url,
-        "file_path": str(file_path),
-        "file_size": file_size,
-        "content_type": file.content_type
+        "file_path": stored.key,
+        "file_size": stored.size,
+        "sha256": stored.sha256,
+        "content_type": upload.content_type
     }
 
 
+def _delivery_headers(filename: str, headers: dict[str, str]) -> tuple[dict[str, str], str | None]:
+    """Content-addressed files never change: cache them forever, ETag is the digest"""
+    digest = blob_digest(filename)
+    if digest is None:
+        return headers, None
+    return {**headers, "Cache-Control": IMMUTABLE_CACHE_CONTROL}, f'"{digest}"'
+
+
+def _presigned_redirect(storage: StorageBackend, key: str) -> RedirectResponse | None:
+    """Send the client straight to the object store when the backend supports it"""
+    if not settings.STORAGE_REDIRECT_DOWNLOADS:
+        return None
+    url = storage.presigned_url(key, expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS)
+    if url is None:
+        return None
+    # The signature expires, so the redirect itself must not be cached for long
+    max_age = settings.S3_PRESIGN_EXPIRE_SECONDS // 2
+    return RedirectResponse(url, headers={"Cache-Control": f"private, max-age={max_age}"})
+
+
 @router.get("/songs/{filename}")
-async def stream_song(filename: str) -> StreamingResponse:
+async def stream_song(request: Request, storage: StorageDep, filename: str) -> Response:
     """
-    Stream a song file
+    Stream a song file, honouring Range requests so seeks only fetch what is played
     """
-    file_path = SONGS_DIR / filename
-    
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    def iter_file():
-        with open(file_path, "rb") as f:
-            while chunk := f.read(8192):  # 8KB chunks
-                yield chunk
+    key = blob_key(SONGS_PREFIX, filename)
+    if redirect := _presigned_redirect(storage, key):
+        return redirect
     
     # Determine content type based on file extension
     content_type = "audio/mpeg"  # Default
@@ -151,37 +433,109 @@ async def stream_song(filename: str) -> StreamingResponse:
     elif filename.endswith('.ogg'):
         content_type = "audio/ogg"
     
-    return StreamingResponse(
-        iter_file(),
-        media_type=content_type,
-        headers={
-            "Accept-Ranges": "bytes",
-            "Content-Disposition": f"inline; filename={filename}"
-        }
+    headers, etag = _delivery_headers(
+        filename, {"Content-Disposition": f"inline; filename={filename}"}
     )
+    response = await run_in_threadpool(
+        ranged_object_response,
+        request, storage, key, media_type=content_type, headers=headers, etag=etag
+    )
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
 
 
 @router.get("/covers/{filename}")
-async def get_cover_image(filename: str) -> FileResponse:
+async def get_cover_image(request: Request, storage: StorageDep, filename: str) -> Response:
     """
     Get cover image file
     """
-    file_path = COVERS_DIR / filename
+    key = blob_key(COVERS_PREFIX, filename)
+    if redirect := _presigned_redirect(storage, key):
+        return redirect
+
+    headers, etag = _delivery_headers(
+        filename, {"Cache-Control": "max-age=3600"}  # Cache for 1 hour
+    )
+    response = await run_in_threadpool(
+        ranged_object_response,
+        request,
+        storage,
+        key,
+        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        headers=headers,
+        etag=etag,
+    )
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
+
+
+@router.get("/hls/{digest}/{path:path}")
+async def get_hls_file(
+    request: Request, storage: StorageDep, digest: str, path: str
+) -> Response:
+    """
+    Get an HLS playlist or segment of a packaged song. Packages are keyed by
+    content digest and never change, so everything is cached for good.
+    """
+    if not DIGEST_PATTERN.match(digest) or not HLS_PATH_PATTERN.match(path):
+        raise HTTPException(status_code=404, detail="File not found")
     
-    if not file_path.exists():
+    key = hls_key(digest, *path.split("/"))
+    is_playlist = path.endswith(".m3u8")
+    # Playlists reference segments relatively, so they are always served here
+    if not is_playlist and (redirect := _presigned_redirect(storage, key)):
+        return redirect
+
+    response = await run_in_threadpool(
+        ranged_object_response,
+        request,
+        storage,
+        key,
+        media_type=PLAYLIST_CONTENT_TYPE if is_playlist else SEGMENT_CONTENT_TYPE,
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+        etag=f'"{digest}/{path}"',
+    )
+    if response is None:
         raise HTTPException(status_code=404, detail="File not found")
+    return response
+
+
+@router.get("/renditions/{digest}/{filename}")
+async def get_rendition(
+    request: Request, storage: StorageDep, digest: str, filename: str
+) -> Response:
+    """
+    Get a transcoded rendition of a song file
+    """
+    if not DIGEST_PATTERN.match(digest) or not RENDITION_FILENAME_PATTERN.match(filename):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    key = f"{RENDITIONS_PREFIX}/{digest}/{filename}"
+    if redirect := _presigned_redirect(storage, key):
+        return redirect
     
-    return FileResponse(
-        file_path,
-        headers={"Cache-Control": "max-age=3600"}  # Cache for 1 hour
+    response = await run_in_threadpool(
+        ranged_object_response,
+        request,
+        storage,
+        key,
+        media_type=RENDITION_CONTENT_TYPE,
+        headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL},
+        etag=f'"{digest}/{filename}"',
     )
+    if response is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return response
 
 
 @router.delete("/songs/{filename}")
-async def delete_song_file(
+def delete_song_file(
     *, 
     session: SessionDep, 
     current_user: CurrentUser,
+    storage: StorageDep,
     filename: str
 ) -> Message:
     """
@@ -190,38 +544,103 @@ async def delete_song_file(
     if not current_user.is_superuser:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    file_path = SONGS_DIR / filename
+    key = blob_key(SONGS_PREFIX, filename)
     
-    if not file_path.exists():
+    if not storage.exists(key):
         raise HTTPException(status_code=404, detail="File not found")
     
+    # Content-addressed files may be shared by several songs
+    digest = blob_digest(filename)
+    if digest and crud.get_song_blob_reference_counts(session=session)[digest]:
+        raise HTTPException(status_code=409, detail="File is still used by songs")
+
     # Remove file
-    os.remove(file_path)
+    storage.delete(key)
     
     return Message(message="File deleted successfully")
 
 
 @router.get("/info/{filename}")
-async def get_file_info(filename: str, file_type: str = "song") -> dict:
+def get_file_info(
+    session: SessionDep, storage: StorageDep, filename: str, file_type: str = "song"
+) -> dict[str, Any]:
     """
     Get file information
     """
     if file_type == "song":
-        file_path = SONGS_DIR / filename
+        key = blob_key(SONGS_PREFIX, filename)
     elif file_type == "cover":
-        file_path = COVERS_DIR / filename
+        key = blob_key(COVERS_PREFIX, filename)
     else:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    if not file_path.exists():
+    info = storage.stat(key)
+    if info is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    stat = file_path.stat()
+    digest = blob_digest(filename)
+    reference_count = None
+    if digest:
+        counts = (
+            crud.get_song_blob_reference_counts(session=session)
+            if file_type == "song"
+            else crud.get_cover_blob_reference_counts(session=session)
+        )
+        reference_count = counts[digest]
     
     return {
         "filename": filename,
-        "file_size": stat.st_size,
-        "created_at": stat.st_ctime,
-        "modified_at": stat.st_mtime,
-        "file_path": str(file_path)
+        "file_size": info.size,
+        # Objects are immutable, only their last write time is tracked
+        "created_at": info.modified,
+        "modified_at": info.modified,
+        "file_path": key,
+        "sha256": digest,
+        "reference_count": reference_count,
     }
+
+
+def collect_blob_garbage(session: Session) -> dict[str, Any]:
+    """
+    Delete song and cover blobs, and the renditions and HLS packages derived
+    from songs, that nothing references any more
+    """
+    storage = get_storage()
+    grace = timedelta(hours=settings.BLOB_GC_GRACE_HOURS)
+    referenced_songs = set(crud.get_song_blob_reference_counts(session=session))
+    songs = collect_garbage(storage, SONGS_PREFIX, referenced_songs, grace=grace)
+    covers = collect_garbage(
+        storage,
+        COVERS_PREFIX,
+        set(crud.get_cover_blob_reference_counts(session=session)),
+        grace=grace,
+    )
+
+    def forget(digest: str) -> None:
+        crud.delete_media_records(session=session, source_digest=digest)
+
+    renditions = collect_derived_garbage(
+        storage, RENDITIONS_PREFIX, referenced_songs, grace=grace, on_delete=forget
+    )
+    hls = collect_derived_garbage(
+        storage,
+        HLS_PREFIX,
+        referenced_songs,
+        grace=grace,
+        marker=MASTER_PLAYLIST,
+        on_delete=forget,
+    )
+    return {
+        "songs": asdict(songs),
+        "covers": asdict(covers),
+        "renditions": asdict(renditions),
+        "hls": asdict(hls),
+    }
+
+
+@router.post("/blobs/gc", dependencies=[Depends(get_current_active_superuser)])
+def run_blob_garbage_collection(session: SessionDep) -> dict[str, Any]:
+    """
+    Delete unreferenced song and cover blobs, renditions and HLS packages (Admin only).
+    """
+    return collect_blob_garbage(session)
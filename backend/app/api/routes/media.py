@@ -0,0 +1,96 @@
+"""
+Media processing API routes (Admin only)
+"""
+
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app import crud
+from app.api.deps import SessionDep, get_current_active_superuser
+from app.models import (
+    MediaJob,
+    MediaJobPublic,
+    MediaJobsPublic,
+    MediaJobStatus,
+)
+from app.services.blobs import SONGS_PREFIX, blob_digest, blob_key
+
+router = APIRouter(
+    prefix="/media",
+    tags=["media"],
+    dependencies=[Depends(get_current_active_superuser)],
+)
+
+
+def _media_job_public(job: MediaJob) -> MediaJobPublic:
+    return MediaJobPublic.model_validate(
+        job, update={"progress": crud.media_job_progress(job)}
+    )
+
+
+@router.get("/jobs", response_model=MediaJobsPublic)
+def read_media_jobs(
+    session: SessionDep,
+    status: MediaJobStatus | None = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> Any:
+    """
+    Retrieve media jobs, newest first.
+    """
+    jobs, count = crud.get_media_jobs(
+        session=session, status=status, skip=skip, limit=limit
+    )
+    return MediaJobsPublic(data=[_media_job_public(job) for job in jobs], count=count)
+
+
+@router.get("/jobs/{job_id}", response_model=MediaJobPublic)
+def read_media_job(session: SessionDep, job_id: uuid.UUID) -> Any:
+    """
+    Get a media job with its progress and errors.
+    """
+    job = crud.get_media_job(session=session, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Media job not found")
+    return _media_job_public(job)
+
+
+@router.post("/jobs/{job_id}/retry", response_model=MediaJobPublic)
+def retry_media_job(session: SessionDep, job_id: uuid.UUID) -> Any:
+    """
+    Queue a failed media job again.
+    """
+    job = crud.get_media_job(session=session, job_id=job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Media job not found")
+    if job.status != MediaJobStatus.FAILED:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    job = crud.retry_media_job(session=session, job=job)
+    return _media_job_public(job)
+
+
+@router.post("/songs/{song_id}/jobs", response_model=MediaJobPublic)
+def create_song_media_job(session: SessionDep, song_id: uuid.UUID) -> Any:
+    """
+    Queue processing of a song's file, e.g. for songs uploaded before
+    transcoding existed. Returns the existing job if there is one.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    filename = crud.get_song_blob_filename(song)
+    digest = blob_digest(filename) if filename else None
+    if not filename or not digest:
+        raise HTTPException(
+            status_code=400, detail="Song has no uploaded file to process"
+        )
+
+    job = crud.enqueue_media_job(
+        session=session,
+        source_key=blob_key(SONGS_PREFIX, filename),
+        source_digest=digest,
+    )
+    return _media_job_public(job)
@@ -5,17 +5,18 @@ Albums API routes
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException
 from sqlmodel import select
 
 from app.api.deps import CurrentUser, SessionDep
 from app import crud
 from app.models import (
     Album, AlbumCreate, AlbumUpdate, AlbumPublic, AlbumsPublic,
-    Song, SongsPublic,
-    Artist,
+    SongsPublic,
     Message,
+    TargetType,
 )
+from app.services.autocomplete import autocomplete
 
 router = APIRouter(prefix="/albums", tags=["albums"])
 
@@ -63,6 +64,7 @@ def create_album(
         )
     
     album = crud.create_album(session=session, album_create=album_in)
+    autocomplete.put(album)
     return album
 
 
@@ -94,8 +96,9 @@ def update_album(
         )
     
     album = crud.update_album(
-        session=session, db_album=album, album_in=album_in
+        session=session, db_album=album, album_update=album_in
     )
+    autocomplete.put(album)
     return album
 
 
@@ -125,6 +128,7 @@ def delete_album(
     success = crud.delete_album(session=session, album_id=album_id)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to delete album")
+    autocomplete.remove(TargetType.ALBUM, album_id)
     
     return Message(message="Album deleted successfully")
 
@@ -168,12 +172,6 @@ def search_albums(
     """
     Search albums by title.
     """
-    statement = (
-        select(Album)
-        .where(Album.title.ilike(f"%{q}%"))
-        .where(Album.is_public == True)
-        .limit(limit)
-    )
-    albums = list(session.exec(statement))
+    albums = crud.search_albums(session=session, query=q, public_only=True, limit=limit)
     count = len(albums)
     return AlbumsPublic(data=albums, count=count)
@@ -5,18 +5,18 @@ Artists API routes
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException
 
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
-from app.api.permissions import check_artist_ownership
+from app.api.deps import CurrentUser, SessionDep
 from app import crud
 from app.models import (
-    Artist, ArtistCreate, ArtistUpdate, ArtistPublic, ArtistsPublic,
-    Album, AlbumsPublic,
-    Song, SongsPublic,
+    ArtistCreate, ArtistUpdate, ArtistPublic, ArtistsPublic,
+    AlbumsPublic,
+    SongsPublic,
     Message,
+    TargetType,
 )
+from app.services.autocomplete import autocomplete
 
 router = APIRouter(prefix="/artists", tags=["artists"])
 
@@ -63,6 +63,7 @@ def create_artist(
     artist = crud.create_artist(
         session=session, artist_create=artist_in, user_id=current_user.id
     )
+    autocomplete.put(artist)
     return artist
 
 
@@ -90,8 +91,9 @@ def update_artist(
         )
     
     artist = crud.update_artist(
-        session=session, db_artist=artist, artist_in=artist_in
+        session=session, db_artist=artist, artist_update=artist_in
     )
+    autocomplete.put(artist)
     return artist
 
 
@@ -117,6 +119,7 @@ def delete_artist(
     success = crud.delete_artist(session=session, artist_id=artist_id)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to delete artist")
+    autocomplete.remove(TargetType.ARTIST, artist_id)
     
     return Message(message="Artist deleted successfully")
 
@@ -156,11 +159,6 @@ def search_artists(
     """
     Search artists by name.
     """
-    statement = (
-        select(Artist)
-        .where(Artist.stage_name.ilike(f"%{q}%"))
-        .limit(limit)
-    )
-    artists = list(session.exec(statement))
+    artists = crud.search_artists(session=session, query=q, limit=limit)
     count = len(artists)
     return ArtistsPublic(data=artists, count=count)
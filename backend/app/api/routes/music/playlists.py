@@ -5,16 +5,18 @@ Playlists API routes
 import uuid
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlmodel import select
+from fastapi import APIRouter, HTTPException
 
 from app.api.deps import CurrentUser, SessionDep
 from app import crud
 from app.models import (
-    Playlist, PlaylistCreate, PlaylistUpdate, PlaylistPublic, PlaylistsPublic,
-    Song, SongsPublic,
+    PlaylistCreate, PlaylistUpdate, PlaylistPublic, PlaylistsPublic,
+    SongsPublic,
     Message,
+    TargetType,
 )
+from app.services.autocomplete import autocomplete
+from app.services.user_stats import user_stats
 
 router = APIRouter(prefix="/playlists", tags=["playlists"])
 
@@ -52,6 +54,8 @@ def create_playlist(
     playlist = crud.create_playlist(
         session=session, playlist_create=playlist_in, owner_id=current_user.id
     )
+    user_stats.invalidate(current_user.id)
+    autocomplete.put(playlist)
     return playlist
 
 
@@ -79,8 +83,9 @@ def update_playlist(
         )
     
     playlist = crud.update_playlist(
-        session=session, db_playlist=playlist, playlist_in=playlist_in
+        session=session, db_playlist=playlist, playlist_update=playlist_in
     )
+    autocomplete.put(playlist)
     return playlist
 
 
@@ -106,6 +111,8 @@ def delete_playlist(
     success = crud.delete_playlist(session=session, playlist_id=playlist_id)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to delete playlist")
+    user_stats.invalidate(playlist.owner_id)
+    autocomplete.remove(TargetType.PLAYLIST, playlist_id)
     
     return Message(message="Playlist deleted successfully")
 
@@ -219,6 +226,7 @@ def follow_playlist(
         following_id=playlist_id,
         following_type="playlist"
     )
+    user_stats.invalidate(current_user.id)
     
     return Message(message="Playlist followed successfully")
 
@@ -241,6 +249,7 @@ def unfollow_playlist(
     )
     if not success:
         raise HTTPException(status_code=404, detail="Not following this playlist")
+    user_stats.invalidate(current_user.id)
     
     return Message(message="Playlist unfollowed successfully")
 
@@ -252,12 +261,6 @@ def search_playlists(
     """
     Search public playlists by name.
     """
-    statement = (
-        select(Playlist)
-        .where(Playlist.name.ilike(f"%{q}%"))
-        .where(Playlist.is_public == True)
-        .limit(limit)
-    )
-    playlists = list(session.exec(statement))
+    playlists = crud.search_playlists(session=session, query=q, limit=limit)
     count = len(playlists)
     return PlaylistsPublic(data=playlists, count=count)
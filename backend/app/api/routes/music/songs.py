@@ -3,19 +3,39 @@ Songs API routes
 """
 
 import uuid
-from typing import Any
-from pathlib import Path
+from datetime import datetime, time, timedelta
+from typing import Any, Literal
 
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import StreamingResponse, RedirectResponse
-from sqlmodel import select, func
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, Response
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, SessionDep, StorageDep
+from app.api.routes.play import record_play
 from app import crud
+from app.core.config import settings
+from app.services.blobs import SONGS_PREFIX, blob_digest, blob_key
+from app.services.hll import relative_error
+from app.services.analysis import select_resolution, split_peaks
+from app.services.autocomplete import autocomplete
+from app.services.packaging import MASTER_PLAYLIST, is_packaged
+from app.services.transcoding import (
+    CLIENT_HINT_HEADERS,
+    QUALITY_ORIGINAL,
+    rendition_filename,
+    requested_quality,
+    select_rendition,
+)
+from app.services.trending import trending
 from app.models import (
-    Song, SongCreate, SongUpdate, SongPublic, SongsPublic,
-    Artist, Album,
+    SongCreate, SongUpdate, SongPublic, SongsPublic,
     Message,
+    RenditionPublic,
+    AudioMetadataPublic,
+    PlayHistory,
+    PlaySeriesPoint,
+    PlaySeriesPublic,
+    ListenersPublic,
+    TargetType,
 )
 
 router = APIRouter(prefix="/songs", tags=["songs"])
@@ -76,6 +96,7 @@ def create_song(
         )
     
     song = crud.create_song(session=session, song_create=song_in)
+    autocomplete.put(song)
     return song
 
 
@@ -107,8 +128,9 @@ def update_song(
         )
     
     song = crud.update_song(
-        session=session, db_song=song, song_in=song_in
+        session=session, db_song=song, song_update=song_in
     )
+    autocomplete.put(song)
     return song
 
 
@@ -138,6 +160,7 @@ def delete_song(
     success = crud.delete_song(session=session, song_id=song_id)
     if not success:
         raise HTTPException(status_code=400, detail="Failed to delete song")
+    autocomplete.remove(TargetType.SONG, song_id)
     
     return Message(message="Song deleted successfully")
 
@@ -155,7 +178,7 @@ def read_song_lyrics(session: SessionDep, song_id: uuid.UUID) -> Any:
 
 
 @router.post("/{song_id}/play")
-async def play_song(
+def play_song(
     *, session: SessionDep, current_user: CurrentUser, song_id: uuid.UUID
 ) -> Message:
     """
@@ -165,10 +188,15 @@ async def play_song(
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
     
-    # Increment play count
-    crud.increment_play_count(session=session, song_id=song_id)
-    
-    # TODO: Record in play history when implemented
+    # Queued and written in batches, like the play count
+    recorded = record_play(
+        PlayHistory(
+            user_id=current_user.id, song_id=song_id, duration_played_ms=song.duration_ms
+        ),
+        song.duration_ms,
+    )
+    if not recorded:
+        return Message(message="Repeated play ignored")
     
     return Message(message="Play recorded successfully")
 
@@ -180,14 +208,11 @@ def read_trending_songs(
     """
     Get trending songs (most played recently).
     """
-    statement = (
-        select(Song)
-        .order_by(Song.play_count.desc(), Song.popularity_score.desc())
-        .limit(limit)
-    )
-    songs = list(session.exec(statement))
-    count = len(songs)
-    return SongsPublic(data=songs, count=count)
+    songs = crud.get_songs_by_ids(session=session, song_ids=trending.top(limit=limit))
+    if not songs:
+        # Nothing played lately
+        songs = crud.get_popular_songs(session=session, limit=limit)
+    return SongsPublic(data=songs, count=len(songs))
 
 
 @router.get("/search/", response_model=SongsPublic)
@@ -197,21 +222,26 @@ def search_songs(
     """
     Search songs by title.
     """
-    statement = (
-        select(Song)
-        .where(Song.title.ilike(f"%{q}%"))
-        .limit(limit)
-    )
-    songs = list(session.exec(statement))
+    songs = crud.search_songs(session=session, query=q, limit=limit)
     count = len(songs)
     return SongsPublic(data=songs, count=count)
 
 
 @router.get("/{song_id}/stream")
-async def stream_song(song_id: uuid.UUID, session: SessionDep) -> Any:
+def stream_song(
+    request: Request,
+    song_id: uuid.UUID,
+    session: SessionDep,
+    storage: StorageDep,
+    quality: str | None = None
+) -> Any:
     """
-    Stream a song file
+    Stream a song file. ``quality`` (low, medium, high or original) picks a
+    transcoded rendition; without it the Save-Data and ECT client hints do.
     """
+    if quality and quality != QUALITY_ORIGINAL and quality not in settings.TRANSCODE_QUALITY_KBPS:
+        raise HTTPException(status_code=400, detail="Invalid quality")
+
     song = crud.get_song(session=session, song_id=song_id)
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
@@ -219,13 +249,201 @@ async def stream_song(song_id: uuid.UUID, session: SessionDep) -> Any:
     if not song.file_url:
         raise HTTPException(status_code=404, detail="Song file not available")
     
-    # If it's a local API file URL, redirect to files endpoint
-    if song.file_url.startswith("/api/v1/files/songs/"):
-        filename = song.file_url.split("/")[-1]
-        return RedirectResponse(f"/api/v1/files/songs/{filename}")
-    
     # If it's an external URL, redirect directly
-    return RedirectResponse(song.file_url)
+    filename = crud.get_song_blob_filename(song)
+    if not filename:
+        return RedirectResponse(song.file_url)
+
+    # Pick a rendition, falling back to the original until one is transcoded
+    digest = blob_digest(filename)
+    level = requested_quality(
+        quality, save_data=request.headers.get("save-data"), ect=request.headers.get("ect")
+    )
+    rendition = None
+    if digest and level != QUALITY_ORIGINAL:
+        renditions = crud.get_renditions(session=session, source_digest=digest)
+        rendition = select_rendition(renditions, level)
+    if rendition:
+        key = rendition.key
+        url = f"/api/v1/files/renditions/{digest}/{rendition_filename(rendition.bitrate_kbps)}"
+    else:
+        key = blob_key(SONGS_PREFIX, filename)
+        url = f"/api/v1/files/songs/{filename}"
+
+    # Go straight to the object store when it can serve the file itself
+    if settings.STORAGE_REDIRECT_DOWNLOADS:
+        url = storage.presigned_url(key, expires_in=settings.S3_PRESIGN_EXPIRE_SECONDS) or url
+    return RedirectResponse(
+        url, headers={"Accept-CH": CLIENT_HINT_HEADERS, "Vary": CLIENT_HINT_HEADERS}
+    )
+
+
+@router.get("/{song_id}/renditions", response_model=list[RenditionPublic])
+def read_song_renditions(song_id: uuid.UUID, session: SessionDep) -> Any:
+    """
+    Get the transcoded renditions available for a song.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    filename = crud.get_song_blob_filename(song)
+    digest = blob_digest(filename) if filename else None
+    if not digest:
+        return []
+    return [
+        RenditionPublic(
+            bitrate_kbps=rendition.bitrate_kbps,
+            content_type=rendition.content_type,
+            size=rendition.size,
+            url=f"/api/v1/files/renditions/{digest}/{rendition_filename(rendition.bitrate_kbps)}",
+        )
+        for rendition in crud.get_renditions(session=session, source_digest=digest)
+    ]
+
+
+@router.get("/{song_id}/metadata", response_model=AudioMetadataPublic)
+def read_song_metadata(song_id: uuid.UUID, session: SessionDep) -> Any:
+    """
+    Get the audio metadata extracted from a song's uploaded file.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    filename = crud.get_song_blob_filename(song)
+    digest = blob_digest(filename) if filename else None
+    metadata = crud.get_audio_metadata(session=session, source_digest=digest) if digest else None
+    if not metadata:
+        raise HTTPException(status_code=404, detail="Song metadata not available")
+    cover_url = (
+        f"/api/v1/files/covers/{metadata.cover_filename}" if metadata.cover_filename else None
+    )
+    return AudioMetadataPublic.model_validate(metadata, update={"cover_url": cover_url})
+
+
+@router.get("/{song_id}/plays", response_model=PlaySeriesPublic)
+def read_song_plays(
+    song_id: uuid.UUID,
+    session: SessionDep,
+    days: int = Query(default=7, ge=1, le=365),
+    interval: Literal["hour", "day"] = "day",
+) -> Any:
+    """
+    Get a song's plays per hour or day over the last ``days`` days, from
+    the play rollups. Periods without plays are left out, hourly plays are
+    only kept for the last PLAY_ROLLUP_HOURLY_RETENTION_DAYS days.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    since = datetime.utcnow() - timedelta(days=days)
+    if interval == "hour":
+        points = [
+            PlaySeriesPoint.model_validate(rollup, update={"period_start": rollup.hour})
+            for rollup in crud.get_song_hourly_plays(session=session, song_id=song_id, since=since)
+        ]
+    else:
+        points = [
+            PlaySeriesPoint.model_validate(
+                rollup, update={"period_start": datetime.combine(rollup.day, time())}
+            )
+            for rollup in crud.get_song_daily_plays(
+                session=session, song_id=song_id, since=since.date()
+            )
+        ]
+    return PlaySeriesPublic(data=points, count=len(points))
+
+
+@router.get("/{song_id}/listeners", response_model=ListenersPublic)
+def read_song_listeners(
+    song_id: uuid.UUID,
+    session: SessionDep,
+    days: int = Query(default=28, ge=1, le=settings.LISTENER_SKETCH_RETENTION_DAYS),
+) -> Any:
+    """
+    Get the estimated number of distinct listeners of a song over the last
+    ``days`` days. Plays count a few minutes after they are recorded.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    listeners = crud.get_listener_count(
+        session=session,
+        target_type=TargetType.SONG,
+        target_id=song_id,
+        since=datetime.utcnow().date() - timedelta(days=days - 1),
+    )
+    return ListenersPublic(
+        listeners=listeners,
+        days=days,
+        relative_error=relative_error(settings.LISTENER_SKETCH_PRECISION),
+    )
+
+
+@router.get(
+    "/{song_id}/waveform",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+def read_song_waveform(
+    request: Request,
+    song_id: uuid.UUID,
+    session: SessionDep,
+    resolution: int | None = Query(default=None, ge=1)
+) -> Any:
+    """
+    Get a song's waveform as one byte (0-255) per bucket of peak amplitude.
+    ``resolution`` asks for a number of buckets, the closest precomputed
+    one is served. Loudness and ReplayGain style gain are sent as headers.
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    filename = crud.get_song_blob_filename(song)
+    digest = blob_digest(filename) if filename else None
+    analysis = crud.get_audio_analysis(session=session, source_digest=digest) if digest else None
+    buckets = select_resolution(analysis.resolutions, resolution) if analysis else None
+    if not analysis or not buckets:
+        raise HTTPException(status_code=404, detail="Song waveform not available")
+
+    # The analysis never changes for a file, but the song's file might
+    headers = {
+        "ETag": f'"{digest}/{buckets}"',
+        "Cache-Control": "public, max-age=3600",
+        "X-Waveform-Resolution": str(buckets),
+        "X-Track-Peak": f"{analysis.peak:.6f}",
+    }
+    if analysis.loudness_lufs is not None and analysis.gain_db is not None:
+        headers["X-Loudness-LUFS"] = f"{analysis.loudness_lufs:.2f}"
+        headers["X-Replay-Gain"] = f"{analysis.gain_db:+.2f} dB"
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return Response(
+        split_peaks(analysis.peaks, analysis.resolutions)[buckets],
+        media_type="application/octet-stream",
+        headers=headers,
+    )
+
+
+@router.get("/{song_id}/hls")
+def stream_song_hls(song_id: uuid.UUID, session: SessionDep, storage: StorageDep) -> Any:
+    """
+    Redirect to the song's HLS master playlist for adaptive streaming
+    """
+    song = crud.get_song(session=session, song_id=song_id)
+    if not song:
+        raise HTTPException(status_code=404, detail="Song not found")
+
+    filename = crud.get_song_blob_filename(song)
+    digest = blob_digest(filename) if filename else None
+    if not digest or not is_packaged(storage, digest):
+        raise HTTPException(status_code=404, detail="Song is not available for HLS streaming")
+
+    return RedirectResponse(f"/api/v1/files/hls/{digest}/{MASTER_PLAYLIST}")
 
 
 @router.patch("/{song_id}/lyrics")
@@ -247,8 +465,7 @@ def update_song_lyrics(
     if not current_user.is_superuser and song.artist_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    song.lyrics = lyrics
-    session.add(song)
-    session.commit()
+    # Through crud, which keeps the song's search vector up to date
+    crud.update_song(session=session, db_song=song, song_update=SongUpdate(lyrics=lyrics))
     
     return Message(message="Lyrics updated successfully")
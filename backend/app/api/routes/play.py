@@ -2,22 +2,129 @@
 Play history and user activity API routes
 """
 
+import base64
+import binascii
 import uuid
+from collections import Counter
 from typing import Any
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field, field_validator
 
 from app.api.deps import CurrentUser, SessionDep
 from app import crud
-from app.models import PlayHistory, Message, Song
+from app.core.config import settings
+from app.models import (
+    PlayHistory, PlayHistoryPublic, PlayHistoriesPublic, Message, SongsPublic,
+    UserStatsPublic, ListeningReportPublic,
+)
+from app.services.play_counts import play_counts
+from app.services.play_dedup import get_play_deduplicator, play_window
+from app.services.play_history import PlayHistoryOverloaded, play_history
+from app.services.trending import trending
+from app.services.user_stats import user_stats
 
 router = APIRouter(prefix="/play", tags=["play"])
 
+# Seconds clients are asked to wait when the play history queue is full
+OVERLOADED_RETRY_AFTER = 5
+
+
+def _utc_naive(value: datetime) -> datetime:
+    """Played-at times are stored as naive UTC"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
 
 class PlayTrackRequest(BaseModel):
     song_id: uuid.UUID
+    # How much of the song was listened to, the whole song if not given
+    duration_played_ms: int | None = None
+    device_type: str | None = None
+    skip_reason: str | None = None
+
+
+class PlayEvent(PlayTrackRequest):
+    # When the client played the song, possibly long before it reports it
+    played_at: datetime
+
+    @field_validator("played_at")
+    @classmethod
+    def played_at_in_window(cls, value: datetime) -> datetime:
+        """Plays can be reported for a while, but not from the future"""
+        try:
+            played_at = _utc_naive(value)
+        except OverflowError:
+            raise ValueError("Play time is out of range")
+        now = datetime.utcnow()
+        if played_at > now + timedelta(seconds=settings.PLAY_BATCH_CLOCK_SKEW_SECONDS):
+            raise ValueError("Play time is in the future")
+        if played_at < now - timedelta(days=settings.PLAY_BATCH_MAX_AGE_DAYS):
+            raise ValueError(
+                f"Plays older than {settings.PLAY_BATCH_MAX_AGE_DAYS} days can't be reported"
+            )
+        return value
+
+
+class PlayBatchRequest(BaseModel):
+    plays: list[PlayEvent] = Field(max_length=settings.PLAY_BATCH_MAX_EVENTS)
+
+
+class PlayBatchResult(BaseModel):
+    # Plays recorded now, plays recorded by an earlier delivery of the same
+    # batch, plays of a song too soon after the previous one in the batch,
+    # and plays of songs that don't exist (any more)
+    recorded: int
+    duplicates: int
+    repeats: int = 0
+    unknown_song_ids: list[uuid.UUID]
+
+
+# Plays reported in batches get IDs derived from what identifies them, so a
+# client resending a batch whose response it missed doesn't record it twice
+PLAY_EVENT_NAMESPACE = uuid.UUID("a27dc003-3c7d-4c08-9897-a2a866a71313")
+
+
+def _play_event_id(user_id: uuid.UUID, song_id: uuid.UUID, played_at: datetime) -> uuid.UUID:
+    return uuid.uuid5(PLAY_EVENT_NAMESPACE, f"{user_id}|{song_id}|{played_at.isoformat()}")
+
+
+def record_play(play: PlayHistory, song_duration_ms: int) -> bool:
+    """
+    Count a play and queue it for the history writer, unless the user
+    played the song moments ago. 503 when the writer is falling behind.
+    """
+    deduplicator = get_play_deduplicator()
+    if not deduplicator.accept(play.user_id, play.song_id, play_window(song_duration_ms)):
+        return False
+    try:
+        play_history.submit(play)
+    except PlayHistoryOverloaded:
+        # Not a repeat when the client retries
+        deduplicator.release(play.user_id, play.song_id)
+        raise HTTPException(
+            status_code=503,
+            detail="Too many plays are being recorded, try again later",
+            headers={"Retry-After": str(OVERLOADED_RETRY_AFTER)},
+        )
+    play_counts.add(play.song_id)
+    trending.add(play.song_id)
+    return True
+
+
+def _encode_cursor(play: PlayHistory) -> str:
+    raw = f"{play.played_at.isoformat()}|{play.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        played_at, play_id = base64.urlsafe_b64decode(cursor).decode().split("|")
+        return datetime.fromisoformat(played_at), uuid.UUID(play_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.post("/track", response_model=Message)
@@ -32,66 +139,196 @@ def play_track(
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
     
-    # Increment play count
-    crud.increment_play_count(session=session, song_id=play_data.song_id)
+    # Queued and written in batches, like the play count
+    recorded = record_play(
+        PlayHistory(
+            user_id=current_user.id,
+            song_id=song.id,
+            duration_played_ms=(
+                play_data.duration_played_ms
+                if play_data.duration_played_ms is not None
+                else song.duration_ms
+            ),
+            device_type=play_data.device_type,
+            skip_reason=play_data.skip_reason,
+        ),
+        song.duration_ms,
+    )
+    if not recorded:
+        return Message(message="Repeated play ignored")
     
-    # Record play in history (you would implement this in analytics CRUD)
-    # For now, just return success
     return Message(message="Play recorded successfully")
 
 
-@router.get("/history")
+@router.post("/batch", response_model=PlayBatchResult)
+def play_batch(
+    *, session: SessionDep, current_user: CurrentUser, batch: PlayBatchRequest
+) -> Any:
+    """
+    Record plays a client buffered, e.g. while offline. Resending a batch
+    is safe, plays already recorded are reported as duplicates. Plays of a
+    song too close to another one of it, in the batch, already recorded or
+    just reported, are repeats.
+    """
+    durations = crud.get_song_durations(
+        session=session, song_ids={event.song_id for event in batch.plays}
+    )
+    events = sorted(batch.plays, key=lambda event: _utc_naive(event.played_at))
+    # Plays already stored close to the batch's, whichever way they came
+    known = [event for event in events if event.song_id in durations]
+    longest = timedelta(seconds=max((play_window(durations[e.song_id]) for e in known), default=0))
+    stored_ids: set[uuid.UUID] = set()
+    stored_times: dict[uuid.UUID, list[datetime]] = {}
+    if known:
+        for play_id, song_id, played_at in crud.get_user_song_plays(
+            session=session,
+            user_id=current_user.id,
+            song_ids={event.song_id for event in known},
+            start=_utc_naive(known[0].played_at) - longest,
+            end=_utc_naive(known[-1].played_at) + longest,
+        ):
+            stored_ids.add(play_id)
+            stored_times.setdefault(song_id, []).append(played_at)
+    deduplicator = get_play_deduplicator()
+    now = datetime.utcnow()
+    # Windows this batch opened in the shared store, as (song, played at)
+    opened: list[tuple[uuid.UUID, datetime]] = []
+    unknown_song_ids: set[uuid.UUID] = set()
+    unknown_plays = 0
+    repeats = 0
+    # Keyed on play ID, which also drops plays repeated within the batch
+    plays: dict[uuid.UUID, PlayHistory] = {}
+    # Plays of a song start a window in which later ones are repeats, as
+    # they do when reported one at a time
+    window_ends: dict[uuid.UUID, datetime] = {}
+    for event in events:
+        if event.song_id not in durations:
+            unknown_song_ids.add(event.song_id)
+            unknown_plays += 1
+            continue
+        played_at = _utc_naive(event.played_at)
+        play_id = _play_event_id(current_user.id, event.song_id, played_at)
+        window = play_window(durations[event.song_id])
+        # Plays resent by the client are duplicates, not repeats
+        if play_id not in plays and play_id not in stored_ids:
+            window_end = window_ends.get(event.song_id)
+            if window_end is not None and played_at < window_end:
+                repeats += 1
+                continue
+            if any(
+                abs(played_at - stored).total_seconds() < window
+                for stored in stored_times.get(event.song_id, [])
+            ):
+                repeats += 1
+                continue
+            # Windows still open are shared with plays reported one at a time
+            remaining = (played_at - now).total_seconds() + window
+            if remaining > 0:
+                if not deduplicator.accept(current_user.id, event.song_id, remaining):
+                    repeats += 1
+                    continue
+                opened.append((event.song_id, played_at))
+        window_ends[event.song_id] = played_at + timedelta(seconds=window)
+        plays[play_id] = PlayHistory(
+            id=play_id,
+            user_id=current_user.id,
+            song_id=event.song_id,
+            played_at=played_at,
+            duration_played_ms=(
+                event.duration_played_ms
+                if event.duration_played_ms is not None
+                else durations[event.song_id]
+            ),
+            device_type=event.device_type,
+            skip_reason=event.skip_reason,
+        )
+
+    # Written directly rather than queued, only plays actually inserted
+    # count towards play counts
+    try:
+        recorded = crud.insert_play_history(session=session, plays=list(plays.values()))
+    except Exception:
+        for song_id, _ in opened:
+            deduplicator.release(current_user.id, song_id)
+        raise
+    # Not repeats when plays of deleted songs are sent again
+    for song_id, _ in set(opened) - set(recorded):
+        deduplicator.release(current_user.id, song_id)
+    for song_id, count in Counter(song_id for song_id, _ in recorded).items():
+        play_counts.add(song_id, count)
+    for song_id, played_at in recorded:
+        trending.add(song_id, at=played_at.replace(tzinfo=timezone.utc).timestamp())
+
+    return PlayBatchResult(
+        recorded=len(recorded),
+        duplicates=len(batch.plays) - unknown_plays - repeats - len(recorded),
+        repeats=repeats,
+        unknown_song_ids=sorted(unknown_song_ids),
+    )
+
+
+@router.get("/history", response_model=PlayHistoriesPublic)
 def get_play_history(
-    *, session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    before: str | None = None,
+    limit: int = Query(default=100, ge=1, le=500),
 ) -> Any:
     """
-    Get user's play history.
+    Get user's play history, newest first. Pass ``next_cursor`` of a page as
+    ``before`` to get the next one.
     """
-    # This would use PlayHistory model when implemented
-    # For now return empty
-    return {"data": [], "count": 0}
+    plays = crud.get_play_history(
+        session=session,
+        user_id=current_user.id,
+        before=_decode_cursor(before) if before else None,
+        limit=limit,
+    )
+    return PlayHistoriesPublic(
+        data=[PlayHistoryPublic.model_validate(play) for play in plays],
+        count=len(plays),
+        next_cursor=_encode_cursor(plays[-1]) if len(plays) == limit else None,
+    )
 
 
-@router.get("/recently-played")
+@router.get("/recently-played", response_model=SongsPublic)
 def get_recently_played(
-    *, session: SessionDep, current_user: CurrentUser, limit: int = 50
+    *,
+    session: SessionDep,
+    current_user: CurrentUser,
+    limit: int = Query(default=50, ge=1, le=500),
 ) -> Any:
     """
     Get user's recently played songs.
     """
-    # This would query PlayHistory table when implemented
-    # For now return empty
-    return {"data": [], "count": 0}
+    songs = crud.get_recently_played_songs(
+        session=session, user_id=current_user.id, limit=limit
+    )
+    return SongsPublic(data=songs, count=len(songs))
 
 
-@router.get("/stats")
+@router.get("/stats", response_model=UserStatsPublic)
 def get_user_stats(
     *, session: SessionDep, current_user: CurrentUser
 ) -> Any:
     """
-    Get user's listening statistics.
+    Get user's listening statistics. Plays are counted from the daily play
+    rollups, a minute or two behind.
     """
-    # Get user's likes count
-    likes_count = len(crud.get_user_likes(session=session, user_id=current_user.id, limit=1000))
-    
-    # Get user's library count
-    library_count = len(crud.get_user_library(session=session, user_id=current_user.id, limit=1000))
-    
-    # Get user's following count
-    following_count = len(crud.get_user_following(session=session, follower_id=current_user.id, limit=1000))
-    
-    # Get user's followers count
-    followers_count = len(crud.get_user_followers(session=session, following_id=current_user.id, limit=1000))
-    
-    # Get user's playlists count
-    playlists_count = len(crud.get_playlists_by_user(session=session, user_id=current_user.id, limit=1000))
-    
-    return {
-        "likes_count": likes_count,
-        "library_count": library_count,
-        "following_count": following_count,
-        "followers_count": followers_count,
-        "playlists_count": playlists_count,
-        "total_plays": 0,  # Would come from PlayHistory when implemented
-        "total_listening_time": 0  # Would be calculated from PlayHistory
-    }
+    return user_stats.get(session, current_user.id)
+
+
+@router.get("/report/{year}", response_model=ListeningReportPublic)
+def get_listening_report(
+    *, session: SessionDep, current_user: CurrentUser, year: int
+) -> Any:
+    """
+    Get user's listening report of a year: top songs, artists and genres
+    and time listened. Reports are computed by a batch job, see
+    app/listening_reports.py.
+    """
+    report = crud.get_listening_report(session=session, user_id=current_user.id, year=year)
+    if not report:
+        raise HTTPException(status_code=404, detail="No listening report for this year")
+    return report
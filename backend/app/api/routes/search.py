@@ -2,7 +2,7 @@
 Search API routes
 """
 
-from typing import Any
+from typing import Any, Literal
 
 from fastapi import APIRouter, Query
 from sqlmodel import select
@@ -10,45 +10,78 @@ from sqlmodel import select
 from app.api.deps import SessionDep
 from app import crud
 from app.models import (
-    Artist, ArtistsPublic,
-    Album, AlbumsPublic,
-    Song, SongsPublic,
-    Playlist, PlaylistsPublic,
+    ArtistPublic, ArtistsPublic,
+    AlbumPublic, AlbumsPublic,
+    SongPublic, SongsPublic,
+    PlaylistPublic, PlaylistsPublic,
+    SearchAllPublic,
+    SearchHitsPublic,
+    SuggestionPublic,
+    SuggestionsPublic,
+    TargetType,
 )
+from app.services.autocomplete import autocomplete
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 
-@router.get("/all")
+@router.get("/all", response_model=SearchAllPublic)
 def search_all(
-    *, session: SessionDep, q: str = Query(..., min_length=1, description="Search query")
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1, description="Search query"),
+    limit: int = Query(default=10, ge=1, le=50),
 ) -> Any:
     """
-    Search across all content types.
+    Search across all content types in one query. ``hits`` ranks the
+    matches of every type together, the first one is the top result.
     """
-    # Search artists
-    artists = crud.search_artists(session=session, query=q, limit=10)
-    
-    # Search albums
-    albums = crud.search_albums(session=session, query=q, limit=10)
-    
-    # Search songs
-    songs = crud.search_songs(session=session, query=q, limit=10)
-    
-    # Search playlists
-    playlists = crud.search_playlists(session=session, query=q, limit=10)
-    
-    return {
-        "artists": {"data": artists, "count": len(artists)},
-        "albums": {"data": albums, "count": len(albums)},
-        "songs": {"data": songs, "count": len(songs)},
-        "playlists": {"data": playlists, "count": len(playlists)}
-    }
+    results = crud.search_all(session=session, query=q, limit=limit)
+    grouped: dict[TargetType, list[Any]] = {target_type: [] for target_type in TargetType}
+    for hit, row in results:
+        grouped[hit.type].append(row)
+    artists = [ArtistPublic.model_validate(item) for item in grouped[TargetType.ARTIST]]
+    albums = [AlbumPublic.model_validate(item) for item in grouped[TargetType.ALBUM]]
+    songs = [SongPublic.model_validate(item) for item in grouped[TargetType.SONG]]
+    playlists = [PlaylistPublic.model_validate(item) for item in grouped[TargetType.PLAYLIST]]
+    return SearchAllPublic(
+        hits=[hit for hit, _ in results],
+        artists=ArtistsPublic(data=artists, count=len(artists)),
+        albums=AlbumsPublic(data=albums, count=len(albums)),
+        songs=SongsPublic(data=songs, count=len(songs)),
+        playlists=PlaylistsPublic(data=playlists, count=len(playlists)),
+    )
+
+
+@router.get("/suggest", response_model=SuggestionsPublic)
+def suggest(
+    *,
+    q: str = Query(..., min_length=1),
+    type: list[Literal["song", "album", "artist", "playlist"]] | None = Query(default=None),
+    limit: int = Query(default=10, ge=1, le=50),
+) -> Any:
+    """
+    Names of artists, songs, albums and playlists with a word starting with
+    ``q`` as typed so far, most popular first. Served from memory, meant to
+    be called on every keystroke.
+    """
+    suggestions = autocomplete.suggest(
+        q, limit=limit, types=[TargetType(value) for value in type] if type else None
+    )
+    data = [
+        SuggestionPublic(type=suggestion.type, id=suggestion.id, name=suggestion.name)
+        for suggestion in suggestions
+    ]
+    return SuggestionsPublic(data=data, count=len(data))
 
 
 @router.get("/artists", response_model=ArtistsPublic)
 def search_artists(
-    *, session: SessionDep, q: str = Query(..., min_length=1), skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
     Search artists.
@@ -59,7 +92,11 @@ def search_artists(
 
 @router.get("/albums", response_model=AlbumsPublic)
 def search_albums(
-    *, session: SessionDep, q: str = Query(..., min_length=1), skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
     Search albums.
@@ -70,7 +107,11 @@ def search_albums(
 
 @router.get("/songs", response_model=SongsPublic)
 def search_songs(
-    *, session: SessionDep, q: str = Query(..., min_length=1), skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
     Search songs.
@@ -81,10 +122,41 @@ def search_songs(
 
 @router.get("/playlists", response_model=PlaylistsPublic)
 def search_playlists(
-    *, session: SessionDep, q: str = Query(..., min_length=1), skip: int = 0, limit: int = 50
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=100),
 ) -> Any:
     """
     Search public playlists.
     """
     playlists = crud.search_playlists(session=session, query=q, skip=skip, limit=limit)
     return PlaylistsPublic(data=playlists, count=len(playlists))
+
+
+@router.get("/text", response_model=SearchHitsPublic)
+def search_text(
+    *,
+    session: SessionDep,
+    q: str = Query(..., min_length=1),
+    type: Literal["song", "album", "artist", "playlist"] = "song",
+    match: Literal["words", "phrase", "prefix"] = "words",
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    Full-text search of names, artists, albums, genres and lyrics, best
+    matches first. ``words`` takes web search syntax ("quoted phrase", or,
+    -word), ``phrase`` the words in order, and ``prefix`` completes the
+    last word as typed so far. Highlights are escaped HTML with matches in <b>.
+    """
+    hits = crud.search_text(
+        session=session,
+        target_type=TargetType(type),
+        query=q,
+        match=match,
+        skip=skip,
+        limit=limit,
+    )
+    return SearchHitsPublic(data=hits, count=len(hits))
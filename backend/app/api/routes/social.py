@@ -16,6 +16,7 @@ from app.models import (
     UserLibrary, UserLibraryCreate,
     Message,
 )
+from app.services.user_stats import user_stats
 
 router = APIRouter(prefix="/social", tags=["social"])
 
@@ -35,6 +36,7 @@ def like_item(
         target_id=like_data.target_id,
         target_type=like_data.target_type
     )
+    user_stats.invalidate(current_user.id)
     return Message(message="Item liked successfully")
 
 
@@ -53,6 +55,7 @@ def unlike_item(
     )
     if not success:
         raise HTTPException(status_code=404, detail="Like not found")
+    user_stats.invalidate(current_user.id)
     return Message(message="Item unliked successfully")
 
 
@@ -104,6 +107,7 @@ def follow_item(
         following_id=follow_data.following_id,
         following_type=follow_data.following_type
     )
+    user_stats.invalidate(current_user.id, follow_data.following_id)
     return Message(message="Item followed successfully")
 
 
@@ -122,6 +126,7 @@ def unfollow_item(
     )
     if not success:
         raise HTTPException(status_code=404, detail="Follow not found")
+    user_stats.invalidate(current_user.id, following_id)
     return Message(message="Item unfollowed successfully")
 
 
@@ -190,6 +195,7 @@ def save_to_library(
         item_id=library_data.item_id,
         item_type=library_data.item_type
     )
+    user_stats.invalidate(current_user.id)
     return Message(message="Item saved to library successfully")
 
 
@@ -208,6 +214,7 @@ def remove_from_library(
     )
     if not success:
         raise HTTPException(status_code=404, detail="Item not found in library")
+    user_stats.invalidate(current_user.id)
     return Message(message="Item removed from library successfully")
 
 
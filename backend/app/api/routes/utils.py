@@ -3,6 +3,9 @@ from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
 from app.models import Message
+from app.services.play_counts import PlayCountMetrics, play_counts
+from app.services.play_dedup import PlayDedupMetrics, get_play_deduplicator
+from app.services.play_history import PlayHistoryMetrics, play_history
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -26,6 +29,39 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/play-counts/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_play_count_metrics() -> PlayCountMetrics:
+    """
+    Buffer depth and flush latency of this process's play counter.
+    """
+    return play_counts.metrics()
+
+
+@router.get(
+    "/play-history/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_play_history_metrics() -> PlayHistoryMetrics:
+    """
+    Queue depth and batch latency of this process's play history writer.
+    """
+    return play_history.metrics()
+
+
+@router.get(
+    "/play-dedup/",
+    dependencies=[Depends(get_current_active_superuser)],
+)
+def read_play_dedup_metrics() -> PlayDedupMetrics:
+    """
+    Plays counted and repeats dropped by this process.
+    """
+    return get_play_deduplicator().metrics()
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
@@ -91,6 +91,133 @@ class Settings(BaseSettings):
     def emails_enabled(self) -> bool:
         return bool(self.SMTP_HOST and self.EMAILS_FROM_EMAIL)
 
+    # Resumable uploads for large audio masters
+    UPLOAD_SESSION_CHUNK_SIZE: int = 8 * 1024 * 1024
+    UPLOAD_SESSION_MAX_SIZE: int = 2 * 1024 * 1024 * 1024
+    UPLOAD_SESSION_EXPIRE_HOURS: int = 24
+    # Each holds a preallocated partial file of up to UPLOAD_SESSION_MAX_SIZE
+    UPLOAD_SESSION_MAX_OPEN_PER_USER: int = 5
+    UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS: int = 15 * 60
+    # Completions still running after this are taken to have died with their
+    # process, and their sessions are reopened
+    UPLOAD_SESSION_COMPLETION_TIMEOUT_MINUTES: int = 60
+    # Content-addressed blobs nothing references are deleted after the grace period
+    BLOB_GC_GRACE_HOURS: int = 24
+    BLOB_GC_INTERVAL_SECONDS: int = 6 * 60 * 60
+
+    # Where uploaded files live: a local directory or an S3-compatible bucket
+    STORAGE_BACKEND: Literal["local", "s3"] = "local"
+    STORAGE_LOCAL_ROOT: str = "uploads"
+    # Uploads are staged here before they are committed to the backend
+    UPLOAD_SCRATCH_DIR: str = "uploads/.scratch"
+    S3_ENDPOINT_URL: str = "http://localhost:9000"
+    # Host clients reach the object store on, when it differs from the API's
+    S3_PUBLIC_ENDPOINT_URL: str | None = None
+    S3_BUCKET: str = "music"
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_POOL_SIZE: int = 32
+    S3_PRESIGN_EXPIRE_SECONDS: int = 60 * 60
+    # Redirect downloads to presigned URLs instead of proxying them
+    STORAGE_REDIRECT_DOWNLOADS: bool = True
+
+    # Audio processing with ffmpeg; HLS packages are built after song uploads
+    FFMPEG_BINARY: str = "ffmpeg"
+    FFPROBE_BINARY: str = "ffprobe"
+    FFMPEG_TIMEOUT_SECONDS: int = 10 * 60
+    HLS_SEGMENT_SECONDS: int = 6
+    HLS_BITRATES_KBPS: list[int] = [64, 128, 256]
+    # Renditions transcoded for every uploaded song, by quality level
+    TRANSCODE_QUALITY_KBPS: dict[str, int] = {"low": 96, "medium": 160, "high": 320}
+    # Waveform peak buckets computed for every uploaded song
+    WAVEFORM_RESOLUTIONS: list[int] = [256, 1024, 4096]
+    # API processes on a host (fastapi run --workers), the Dockerfile starts
+    # this many. Pools sized from the CPU count divide it between them.
+    API_WORKERS: int = 1
+    # Media job pool size per API process, 0 disables it. None gives each
+    # process an equal share of the CPUs, cpu_count // API_WORKERS, at
+    # least 1, so ffmpeg jobs don't oversubscribe the host.
+    MEDIA_JOB_WORKERS: int | None = None
+    MEDIA_JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    # Running jobs older than this are assumed lost and queued again
+    MEDIA_JOB_TIMEOUT_SECONDS: int = 2 * 60 * 60
+    # Lost jobs are failed instead once they were claimed this many times,
+    # so a song that kills its worker doesn't crash the pool forever
+    MEDIA_JOB_MAX_ATTEMPTS: int = 3
+    # Song durations further than this from the probed one are corrected
+    DURATION_TOLERANCE_MS: int = 1000
+
+    # Play counts are buffered per process and written in batches
+    PLAY_COUNT_FLUSH_INTERVAL_SECONDS: float = 5.0
+    # Distinct songs buffered before a flush is forced
+    PLAY_COUNT_BUFFER_MAX_SONGS: int = 10_000
+    # Plays queued for the play history writer before requests are turned
+    # away with 503, after waiting this long for room
+    PLAY_HISTORY_QUEUE_SIZE: int = 50_000
+    PLAY_HISTORY_SUBMIT_TIMEOUT_SECONDS: float = 0.1
+    PLAY_HISTORY_BATCH_SIZE: int = 5000
+    # How long a shutdown waits for queued plays to be written
+    PLAY_HISTORY_DRAIN_TIMEOUT_SECONDS: float = 30.0
+    # Monthly play history partitions kept ahead of the current month, and
+    # months of plays kept before they are rolled up into monthly totals
+    PLAY_HISTORY_PARTITIONS_AHEAD: int = 3
+    PLAY_HISTORY_RETENTION_MONTHS: int = 13
+    PLAY_HISTORY_MAINTENANCE_INTERVAL_SECONDS: int = 60 * 60
+    # Plays are added to hourly and daily rollups once they are this old,
+    # hourly rollups are kept for this many days
+    PLAY_ROLLUP_INTERVAL_SECONDS: float = 60.0
+    PLAY_ROLLUP_SETTLE_SECONDS: int = 60
+    PLAY_ROLLUP_HOURLY_RETENTION_DAYS: int = 14
+    # Trending songs rank plays by age, a play this old counts half. The
+    # top songs are ranked every refresh, and scores reloaded from the play
+    # rollups of all processes every reload
+    TRENDING_HALF_LIFE_HOURS: float = 24.0
+    TRENDING_SIZE: int = 1000
+    TRENDING_REFRESH_INTERVAL_SECONDS: float = 10.0
+    TRENDING_RELOAD_INTERVAL_SECONDS: float = 10 * 60
+    # Distinct listeners are estimated from daily HyperLogLog sketches,
+    # within 1.04 / sqrt(2 ** precision) of the true count (1.6% at 12).
+    # The precision can't change once sketches are stored.
+    LISTENER_SKETCH_PRECISION: int = 12
+    LISTENER_SKETCH_INTERVAL_SECONDS: float = 5 * 60
+    LISTENER_SKETCH_RETENTION_DAYS: int = 90
+    MONTHLY_LISTENERS_DAYS: int = 28
+    MONTHLY_LISTENERS_INTERVAL_SECONDS: float = 60 * 60
+    # Repeat plays of a song by a user are dropped for this long, or the
+    # song's duration when longer. Windows are kept per process in memory,
+    # or shared between processes in postgres. None uses postgres with
+    # several API_WORKERS, whose plays would each get their own windows in
+    # memory, and memory otherwise.
+    PLAY_DEDUP_WINDOW_SECONDS: float = 30.0
+    PLAY_DEDUP_BACKEND: Literal["memory", "postgres"] | None = None
+    # Open windows kept in memory, the oldest are forgotten beyond this
+    PLAY_DEDUP_MAX_WINDOWS: int = 100_000
+    PLAY_DEDUP_PRUNE_INTERVAL_SECONDS: float = 60.0
+    # Users' stats are cached per process for this long
+    USER_STATS_CACHE_SECONDS: float = 30.0
+    USER_STATS_CACHE_MAX_USERS: int = 10_000
+    # Yearly listening reports list this many top songs, artists and genres.
+    # The job computes them for chunks of users on a process pool, None
+    # workers uses the CPU count.
+    LISTENING_REPORT_TOP_N: int = 5
+    LISTENING_REPORT_CHUNK_USERS: int = 500
+    LISTENING_REPORT_WORKERS: int | None = None
+    # Full-text search covers song lyrics, for vectors refreshed from then
+    # on. Search ranks are multiplied by 1 + weight * ln(1 + popularity).
+    SEARCH_LYRICS: bool = True
+    SEARCH_POPULARITY_WEIGHT: float = 0.1
+    # Suggestions are served from an index of the catalog's names in each
+    # process, rebuilt this often to pick up other processes' changes and
+    # new popularity
+    AUTOCOMPLETE_REBUILD_INTERVAL_SECONDS: float = 15 * 60
+    # Plays a client may report in one POST /play/batch, and how old they
+    # may be. Older plays would land outside the play history partitions
+    # and rollups. Clocks up to the skew ahead of the server's are allowed.
+    PLAY_BATCH_MAX_EVENTS: int = 1000
+    PLAY_BATCH_MAX_AGE_DAYS: int = 30
+    PLAY_BATCH_CLOCK_SKEW_SECONDS: int = 5 * 60
+
     EMAIL_TEST_USER: EmailStr = "test@example.com"
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PASSWORD: str
@@ -6,6 +6,9 @@ CRUD operations package for Music App
 from .user import *
 from .music import *
 from .social import *
+from .files import *
+from .media import *
+from .analytics import *
 
 __all__ = [
     # User CRUD
@@ -46,15 +49,19 @@ __all__ = [
     # Music CRUD - Song
     "create_song",
     "get_song",
+    "get_songs_by_ids",
+    "get_song_durations",
     "get_songs",
     "get_songs_by_album",
     "get_songs_by_artist",
     "get_songs_by_genre",
     "search_songs",
     "get_popular_songs",
+    "add_play_counts",
     "increment_play_count",
     "update_song",
     "delete_song",
+    "apply_audio_metadata",
     
     # Music CRUD - Playlist
     "create_playlist",
@@ -62,6 +69,9 @@ __all__ = [
     "get_playlists_by_user",
     "get_public_playlists",
     "search_playlists",
+    "search_text",
+    "search_all",
+    "stream_catalog_names",
     "add_song_to_playlist",
     "remove_song_from_playlist",
     "get_playlist_songs",
@@ -76,4 +86,70 @@ __all__ = [
     "unfollow_item",
     "save_to_library",
     "remove_from_library",
+
+    # File storage CRUD
+    "upload_chunk_count",
+    "upload_chunk_length",
+    "is_upload_chunk_received",
+    "get_upload_missing_offsets",
+    "get_upload_received_bytes",
+    "create_upload_session",
+    "get_upload_session",
+    "mark_upload_chunk_received",
+    "start_upload_completion",
+    "reopen_upload_session",
+    "reopen_stalled_upload_sessions",
+    "count_open_upload_sessions",
+    "complete_upload_session",
+    "delete_upload_session",
+    "delete_expired_upload_sessions",
+    "get_song_blob_filename",
+    "get_song_blob_reference_counts",
+    "get_cover_blob_reference_counts",
+
+    # Media processing CRUD
+    "media_job_progress",
+    "enqueue_media_job",
+    "get_media_job",
+    "get_media_jobs",
+    "claim_media_jobs",
+    "record_media_task",
+    "requeue_media_jobs",
+    "retry_media_job",
+    "save_rendition",
+    "get_renditions",
+    "save_audio_metadata",
+    "get_audio_metadata",
+    "save_audio_analysis",
+    "get_audio_analysis",
+    "delete_media_records",
+
+    # Analytics CRUD
+    "insert_play_history",
+    "get_play_history",
+    "get_user_song_plays",
+    "get_recently_played_songs",
+    "add_months",
+    "get_play_history_partitions",
+    "create_play_history_partition",
+    "roll_up_play_history",
+    "roll_up_recorded_plays",
+    "delete_hourly_song_plays",
+    "get_song_hourly_plays",
+    "get_song_daily_plays",
+    "get_decayed_song_plays",
+    "get_play_rollup_watermark",
+    "get_chart_songs",
+    "get_chart_artists",
+    "get_user_stats",
+    "roll_up_listener_sketches",
+    "get_listener_count",
+    "update_monthly_listeners",
+    "delete_listener_sketches",
+    "stream_user_song_plays",
+    "get_report_names",
+    "start_listening_report_run",
+    "save_listening_reports",
+    "finish_listening_report_run",
+    "get_listening_report",
 ]
@@ -0,0 +1,841 @@
+"""
+Analytics CRUD operations (PlayHistory)
+"""
+
+import re
+import uuid
+from collections.abc import Collection, Iterator, Sequence
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, cast
+
+import psycopg
+import sqlalchemy as sa
+from sqlalchemy import (
+    CursorResult,
+    Integer,
+    Uuid,
+    column,
+    delete,
+    exists,
+    text,
+    tuple_,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, func, select
+
+from app.models import (
+    Artist,
+    ArtistPlaysDaily,
+    Follow,
+    Genre,
+    Like,
+    ListenerSketch,
+    ListeningReport,
+    ListeningReportRun,
+    PlayHistory,
+    PlayHistoryMonthly,
+    Playlist,
+    RollupWatermark,
+    Song,
+    SongPlaysDaily,
+    SongPlaysHourly,
+    TargetType,
+    UserLibrary,
+    UserPlaysDaily,
+    UserStatsPublic,
+)
+from app.services.hll import HyperLogLog
+
+PLAY_HISTORY_COLUMNS = (
+    "id",
+    "user_id",
+    "song_id",
+    "played_at",
+    "duration_played_ms",
+    "device_type",
+    "skip_reason",
+)
+
+# Plays scanned to find a user's recently played songs
+RECENT_PLAYS_WINDOW = 1000
+
+# Monthly partitions of playhistory, plays outside of them go to the default one
+PLAY_HISTORY_PARTITION = "playhistory_y{:%Y}m{:%m}"
+PLAY_HISTORY_PARTITION_PATTERN = re.compile(r"playhistory_y(\d{4})m(\d{2})")
+PLAY_HISTORY_DEFAULT_PARTITION = "playhistory_default"
+# Serialises partition changes between API processes
+PLAY_HISTORY_PARTITION_LOCK = 0x706C6179
+
+PLAY_ROLLUP_WATERMARK = "play_rollups"
+LISTENER_SKETCH_WATERMARK = "listener_sketches"
+# Rollup tables with the column plays are grouped by and their period
+PLAY_ROLLUPS = {
+    "songplayshourly": ("song_id", "hour", "date_trunc('hour', played_at)"),
+    "songplaysdaily": ("song_id", "day", "played_at::date"),
+    "artistplaysdaily": ("artist_id", "day", "played_at::date"),
+    "userplaysdaily": ("user_id", "day", "played_at::date"),
+}
+
+
+# ===== PLAY HISTORY CRUD =====
+
+
+def insert_play_history(
+    *, session: Session, plays: Sequence[PlayHistory]
+) -> list[tuple[uuid.UUID, datetime]]:
+    """
+    Bulk insert plays with COPY, returns the song and time of the plays
+    inserted. Plays are staged in a temp table first so plays of songs or users
+    deleted in the meantime, and plays already recorded, are dropped instead
+    of failing the whole batch.
+    """
+    if not plays:
+        return []
+    columns = ", ".join(PLAY_HISTORY_COLUMNS)
+    session.execute(
+        text(
+            "CREATE TEMP TABLE playhistory_staging "
+            "(LIKE playhistory INCLUDING DEFAULTS) ON COMMIT DROP"
+        )
+    )
+    connection = cast(
+        psycopg.Connection[Any], session.connection().connection.driver_connection
+    )
+    with (
+        connection.cursor() as cursor,
+        cursor.copy(f"COPY playhistory_staging ({columns}) FROM STDIN") as copy,
+    ):
+        for play in plays:
+            copy.write_row([getattr(play, column) for column in PLAY_HISTORY_COLUMNS])
+    result = session.execute(
+        text(
+            f"INSERT INTO playhistory ({columns}) "
+            f"SELECT {columns} FROM playhistory_staging AS staged "
+            "WHERE EXISTS (SELECT 1 FROM song WHERE song.id = staged.song_id) "
+            'AND EXISTS (SELECT 1 FROM "user" WHERE "user".id = staged.user_id) '
+            "ON CONFLICT DO NOTHING RETURNING song_id, played_at"
+        )
+    )
+    inserted = [(row.song_id, row.played_at) for row in result]
+    session.commit()
+    return inserted
+
+
+def get_play_history(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    before: tuple[datetime, uuid.UUID] | None = None,
+    limit: int = 50,
+) -> list[PlayHistory]:
+    """
+    Get a user's plays, newest first. Pages are keyed on (played_at, id):
+    pass the last play of a page as ``before`` to get the next one.
+    """
+    statement = select(PlayHistory).where(PlayHistory.user_id == user_id)
+    if before is not None:
+        statement = statement.where(
+            tuple_(col(PlayHistory.played_at), col(PlayHistory.id)) < before
+        )
+    statement = statement.order_by(
+        col(PlayHistory.played_at).desc(), col(PlayHistory.id).desc()
+    ).limit(limit)
+    return list(session.exec(statement))
+
+
+def get_user_song_plays(
+    *,
+    session: Session,
+    user_id: uuid.UUID,
+    song_ids: Collection[uuid.UUID],
+    start: datetime,
+    end: datetime,
+) -> list[tuple[uuid.UUID, uuid.UUID, datetime]]:
+    """Get the ID, song and time of a user's plays of ``song_ids`` from ``start`` to ``end``"""
+    if not song_ids:
+        return []
+    statement = select(
+        PlayHistory.id, PlayHistory.song_id, PlayHistory.played_at
+    ).where(
+        PlayHistory.user_id == user_id,
+        col(PlayHistory.song_id).in_(song_ids),
+        PlayHistory.played_at >= start,
+        PlayHistory.played_at <= end,
+    )
+    return list(session.exec(statement))
+
+
+def get_recently_played_songs(
+    *, session: Session, user_id: uuid.UUID, limit: int = 50
+) -> list[Song]:
+    """Get the songs a user played last, most recent first, each once"""
+    recent = (
+        select(PlayHistory.song_id, PlayHistory.played_at)
+        .where(PlayHistory.user_id == user_id)
+        .order_by(col(PlayHistory.played_at).desc())
+        .limit(RECENT_PLAYS_WINDOW)
+        .subquery()
+    )
+    last_played = (
+        select(recent.c.song_id, func.max(recent.c.played_at).label("last_played"))
+        .group_by(recent.c.song_id)
+        .subquery()
+    )
+    statement = (
+        select(Song)
+        .join(last_played, col(Song.id) == last_played.c.song_id)
+        .order_by(last_played.c.last_played.desc())
+        .limit(limit)
+    )
+    return list(session.exec(statement))
+
+
+# ===== PLAY HISTORY PARTITIONS =====
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month ``months`` after that of ``month``"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def get_play_history_partitions(*, session: Session) -> list[date]:
+    """Get the months that have a play history partition, in order"""
+    names = session.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class AS child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = 'playhistory'::regclass"
+        )
+    ).scalars()
+    months = []
+    for name in names:
+        match = PLAY_HISTORY_PARTITION_PATTERN.fullmatch(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def _lock_play_history_partitions(session: Session) -> None:
+    session.execute(
+        text("SELECT pg_advisory_xact_lock(:lock)"),
+        {"lock": PLAY_HISTORY_PARTITION_LOCK},
+    )
+
+
+def create_play_history_partition(*, session: Session, month: date) -> bool:
+    """
+    Create the partition of ``month`` unless it exists, returns whether it
+    was created. Plays of that month in the default partition are moved
+    into it.
+    """
+    month = month.replace(day=1)
+    _lock_play_history_partitions(session)
+    if month in get_play_history_partitions(session=session):
+        session.commit()
+        return False
+    name = PLAY_HISTORY_PARTITION.format(month, month)
+    end = add_months(month, 1)
+    # Filled before it is attached, attaching a range the default partition
+    # still has rows of fails
+    session.execute(
+        text(
+            f"CREATE TABLE {name} (LIKE playhistory INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+    )
+    session.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {PLAY_HISTORY_DEFAULT_PARTITION} "
+            "WHERE played_at >= :start AND played_at < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {"start": month, "end": end},
+    )
+    session.execute(
+        text(
+            f"ALTER TABLE playhistory ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month}') TO ('{end}')"
+        )
+    )
+    session.commit()
+    return True
+
+
+def _roll_up_plays(session: Session, table: str, before: date) -> int:
+    rolled_up: int = session.execute(
+        text(
+            "WITH totals AS ("
+            "SELECT date_trunc('month', played_at)::date AS month, user_id, song_id, "
+            "count(*) AS plays, count(skip_reason) AS skips, "
+            "sum(duration_played_ms) AS duration_played_ms "
+            f"FROM {table} WHERE played_at < :before GROUP BY 1, 2, 3"
+            "), upserted AS ("
+            "INSERT INTO playhistorymonthly "
+            "(month, user_id, song_id, plays, skips, duration_played_ms) "
+            "SELECT * FROM totals "
+            "ON CONFLICT (month, user_id, song_id) DO UPDATE SET "
+            "plays = playhistorymonthly.plays + excluded.plays, "
+            "skips = playhistorymonthly.skips + excluded.skips, "
+            "duration_played_ms = playhistorymonthly.duration_played_ms + excluded.duration_played_ms"
+            ") SELECT coalesce(sum(plays), 0) FROM totals"
+        ),
+        {"before": before},
+    ).scalar_one()
+    return rolled_up
+
+
+def roll_up_play_history(*, session: Session, before: date) -> int:
+    """
+    Roll plays before the month of ``before`` up into monthly totals per
+    user and song, then drop them with their partitions. Returns how many
+    plays were rolled up. Each partition is rolled up and dropped in one
+    transaction, so an interrupted run can simply be repeated.
+    """
+    before = before.replace(day=1)
+    rolled_up = 0
+    while True:
+        _lock_play_history_partitions(session)
+        months = get_play_history_partitions(session=session)
+        if not months or add_months(months[0], 1) > before:
+            break
+        name = PLAY_HISTORY_PARTITION.format(months[0], months[0])
+        rolled_up += _roll_up_plays(session, name, before)
+        session.execute(text(f"ALTER TABLE playhistory DETACH PARTITION {name}"))
+        session.execute(text(f"DROP TABLE {name}"))
+        session.commit()
+
+    rolled_up += _roll_up_plays(session, PLAY_HISTORY_DEFAULT_PARTITION, before)
+    session.execute(
+        text(f"DELETE FROM {PLAY_HISTORY_DEFAULT_PARTITION} WHERE played_at < :before"),
+        {"before": before},
+    )
+    session.commit()
+    return rolled_up
+
+
+# ===== PLAY ROLLUPS =====
+
+
+def _upsert_rollup(table: str, key: str, period: str, period_expression: str) -> str:
+    return (
+        f"INSERT INTO {table} ({key}, {period}, plays, skips, duration_played_ms) "
+        f"SELECT {key}, {period_expression}, "
+        "count(*), count(skip_reason), sum(duration_played_ms) "
+        "FROM recorded GROUP BY 1, 2 "
+        f"ON CONFLICT ({key}, {period}) DO UPDATE SET "
+        f"plays = {table}.plays + excluded.plays, "
+        f"skips = {table}.skips + excluded.skips, "
+        f"duration_played_ms = {table}.duration_played_ms + excluded.duration_played_ms"
+    )
+
+
+def _claim_watermark(
+    session: Session, name: str, settle: timedelta
+) -> tuple[datetime, datetime] | None:
+    """
+    Lock the watermark ``name`` and get the range of recorded_at to process
+    next, None if there is nothing to do. Rows recorded less than
+    ``settle`` ago are left for the next run, so slower transactions still
+    inserting rows are not skipped. Concurrent runs take turns on the lock.
+    """
+    session.execute(
+        text(
+            "INSERT INTO rollupwatermark (name, processed_until) VALUES (:name, :epoch) "
+            "ON CONFLICT DO NOTHING"
+        ),
+        {"name": name, "epoch": datetime(1970, 1, 1)},
+    )
+    processed_until = session.execute(
+        text(
+            "SELECT processed_until FROM rollupwatermark WHERE name = :name FOR UPDATE"
+        ),
+        {"name": name},
+    ).scalar_one()
+    until = session.execute(
+        text("SELECT (now() AT TIME ZONE 'utc') - :settle"), {"settle": settle}
+    ).scalar_one()
+    if until <= processed_until:
+        session.commit()
+        return None
+    return processed_until, until
+
+
+def _advance_watermark(session: Session, name: str, until: datetime) -> None:
+    session.execute(
+        text("UPDATE rollupwatermark SET processed_until = :until WHERE name = :name"),
+        {"name": name, "until": until},
+    )
+
+
+def roll_up_recorded_plays(*, session: Session, settle: timedelta) -> int:
+    """
+    Add plays recorded since the last run to the play rollups, returns how
+    many were added. The watermark moves in the same transaction as the
+    rollups, a rerun never counts plays twice.
+    """
+    window = _claim_watermark(session, PLAY_ROLLUP_WATERMARK, settle)
+    if window is None:
+        return 0
+    processed_until, until = window
+
+    upserts = ", ".join(
+        f"upsert_{table} AS ({_upsert_rollup(table, *grouping)})"
+        for table, grouping in PLAY_ROLLUPS.items()
+    )
+    # One scan of the new plays feeds every rollup
+    rolled_up: int = session.execute(
+        text(
+            "WITH recorded AS MATERIALIZED ("
+            "SELECT playhistory.*, song.artist_id FROM playhistory "
+            "JOIN song ON song.id = playhistory.song_id "
+            "WHERE recorded_at > :processed_until AND recorded_at <= :until"
+            f"), {upserts} SELECT count(*) FROM recorded"
+        ),
+        {"processed_until": processed_until, "until": until},
+    ).scalar_one()
+    _advance_watermark(session, PLAY_ROLLUP_WATERMARK, until)
+    session.commit()
+    return rolled_up
+
+
+def delete_hourly_song_plays(*, session: Session, before: datetime) -> int:
+    """Delete hourly song rollups before ``before``, returns how many"""
+    result = cast(
+        CursorResult[Any],
+        session.execute(
+            text("DELETE FROM songplayshourly WHERE hour < :before"), {"before": before}
+        ),
+    )
+    session.commit()
+    return result.rowcount
+
+
+def get_song_hourly_plays(
+    *, session: Session, song_id: uuid.UUID, since: datetime
+) -> list[SongPlaysHourly]:
+    """Get a song's plays per hour since ``since``, hours without plays are left out"""
+    statement = (
+        select(SongPlaysHourly)
+        .where(SongPlaysHourly.song_id == song_id, SongPlaysHourly.hour >= since)
+        .order_by(col(SongPlaysHourly.hour))
+    )
+    return list(session.exec(statement))
+
+
+def get_song_daily_plays(
+    *, session: Session, song_id: uuid.UUID, since: date
+) -> list[SongPlaysDaily]:
+    """Get a song's plays per day since ``since``, days without plays are left out"""
+    statement = (
+        select(SongPlaysDaily)
+        .where(SongPlaysDaily.song_id == song_id, SongPlaysDaily.day >= since)
+        .order_by(col(SongPlaysDaily.day))
+    )
+    return list(session.exec(statement))
+
+
+def get_decayed_song_plays(
+    *, session: Session, reference: float, half_life: float, since: float
+) -> dict[uuid.UUID, float]:
+    """
+    Get hourly song plays since the epoch time ``since``, each weighted by
+    ``2 ** ((played - reference) / half_life)`` and summed per song. Plays
+    are taken to be in the middle of their hour, and no later than
+    ``reference``, the current time.
+    """
+    rows = session.execute(
+        text(
+            "SELECT song_id, sum(plays * power(2, "
+            "(least(extract(epoch FROM hour) + 1800, :reference) - :reference) / :half_life)) "
+            "FROM songplayshourly "
+            "WHERE hour >= to_timestamp(:since) AT TIME ZONE 'utc' "
+            "GROUP BY song_id"
+        ),
+        {"reference": reference, "half_life": half_life, "since": since},
+    )
+    return {song_id: float(score) for song_id, score in rows}
+
+
+def get_play_rollup_watermark(*, session: Session) -> datetime | None:
+    """Time up to which recorded plays are in the rollups, None before the first run"""
+    watermark = session.get(RollupWatermark, PLAY_ROLLUP_WATERMARK)
+    return watermark.processed_until if watermark else None
+
+
+def get_chart_songs(
+    *, session: Session, since: date, skip: int = 0, limit: int = 50
+) -> list[Song]:
+    """Get the most played songs since ``since``"""
+    totals = (
+        select(SongPlaysDaily.song_id, func.sum(SongPlaysDaily.plays).label("plays"))
+        .where(SongPlaysDaily.day >= since)
+        .group_by(col(SongPlaysDaily.song_id))
+        .subquery()
+    )
+    statement = (
+        select(Song)
+        .join(totals, col(Song.id) == totals.c.song_id)
+        .order_by(totals.c.plays.desc(), col(Song.id))
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(session.exec(statement))
+
+
+def get_chart_artists(
+    *, session: Session, since: date, skip: int = 0, limit: int = 50
+) -> list[Artist]:
+    """Get the most played artists since ``since``"""
+    totals = (
+        select(
+            ArtistPlaysDaily.artist_id, func.sum(ArtistPlaysDaily.plays).label("plays")
+        )
+        .where(ArtistPlaysDaily.day >= since)
+        .group_by(col(ArtistPlaysDaily.artist_id))
+        .subquery()
+    )
+    statement = (
+        select(Artist)
+        .join(totals, col(Artist.id) == totals.c.artist_id)
+        .order_by(totals.c.plays.desc(), col(Artist.id))
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(session.exec(statement))
+
+
+def get_user_stats(*, session: Session, user_id: uuid.UUID) -> UserStatsPublic:
+    """
+    Get what a user likes, saved, follows and owns, who follows them, and
+    their plays and listening time from the daily play rollups, all in one
+    query
+    """
+
+    def count(*where: Any) -> Any:
+        return select(func.count()).where(*where).scalar_subquery()
+
+    def total(column: Any) -> Any:
+        return (
+            select(func.coalesce(func.sum(column), 0))
+            .where(UserPlaysDaily.user_id == user_id)
+            .scalar_subquery()
+        )
+
+    # Wider than sqlmodel's select is typed for
+    statement = sa.select(
+        count(Like.user_id == user_id),
+        count(UserLibrary.user_id == user_id),
+        count(Follow.follower_id == user_id),
+        count(Follow.following_id == user_id),
+        count(Playlist.owner_id == user_id),
+        total(UserPlaysDaily.plays),
+        total(UserPlaysDaily.duration_played_ms),
+    )
+    likes, library, following, followers, playlists, plays, duration = session.execute(
+        statement
+    ).one()
+    return UserStatsPublic(
+        likes_count=likes,
+        library_count=library,
+        following_count=following,
+        followers_count=followers,
+        playlists_count=playlists,
+        total_plays=plays,
+        total_listening_time=duration,
+    )
+
+
+# ===== LISTENER SKETCHES =====
+
+
+def roll_up_listener_sketches(
+    *, session: Session, settle: timedelta, precision: int
+) -> int:
+    """
+    Add the listeners of plays recorded since the last run to the daily
+    song and artist sketches, returns how many sketches were updated.
+    Only this job writes sketches and runs take turns on the watermark, so
+    sketches are merged without further locking.
+    """
+    window = _claim_watermark(session, LISTENER_SKETCH_WATERMARK, settle)
+    if window is None:
+        return 0
+    processed_until, until = window
+
+    listens = session.execute(
+        text(
+            "SELECT DISTINCT playhistory.user_id, playhistory.song_id, song.artist_id, "
+            "playhistory.played_at::date FROM playhistory "
+            "JOIN song ON song.id = playhistory.song_id "
+            "WHERE recorded_at > :processed_until AND recorded_at <= :until"
+        ),
+        {"processed_until": processed_until, "until": until},
+    )
+    sketches: dict[tuple[TargetType, uuid.UUID, date], HyperLogLog] = {}
+    for user_id, song_id, artist_id, day in listens:
+        for key in (
+            (TargetType.SONG, song_id, day),
+            (TargetType.ARTIST, artist_id, day),
+        ):
+            if key not in sketches:
+                sketches[key] = HyperLogLog(precision)
+            sketches[key].add(user_id)
+
+    if sketches:
+        stored = session.exec(
+            select(ListenerSketch).where(
+                tuple_(
+                    col(ListenerSketch.target_type),
+                    col(ListenerSketch.target_id),
+                    col(ListenerSketch.day),
+                ).in_(list(sketches))
+            )
+        )
+        for sketch in stored:
+            key = (sketch.target_type, sketch.target_id, sketch.day)
+            sketches[key].merge(HyperLogLog.from_bytes(sketch.sketch))
+        statement = insert(ListenerSketch).values(
+            [
+                {
+                    "target_type": target_type,
+                    "target_id": target_id,
+                    "day": day,
+                    "sketch": sketch.to_bytes(),
+                }
+                for (target_type, target_id, day), sketch in sketches.items()
+            ]
+        )
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["target_type", "target_id", "day"],
+                set_={"sketch": statement.excluded.sketch},
+            )
+        )
+    _advance_watermark(session, LISTENER_SKETCH_WATERMARK, until)
+    session.commit()
+    return len(sketches)
+
+
+def get_listener_count(
+    *, session: Session, target_type: TargetType, target_id: uuid.UUID, since: date
+) -> int:
+    """Get the estimated distinct listeners of a song or artist since ``since``"""
+    statement = select(ListenerSketch.sketch).where(
+        ListenerSketch.target_type == target_type,
+        ListenerSketch.target_id == target_id,
+        ListenerSketch.day >= since,
+    )
+    merged: HyperLogLog | None = None
+    for data in session.exec(statement):
+        sketch = HyperLogLog.from_bytes(data)
+        if merged is None:
+            merged = sketch
+        else:
+            merged.merge(sketch)
+    return merged.count() if merged else 0
+
+
+def update_monthly_listeners(*, session: Session, since: date) -> int:
+    """
+    Set each artist's monthly_listeners from its sketches since ``since``,
+    returns how many artists have listeners. Sketches are streamed artist
+    by artist, so memory stays bounded by the sketches of one artist.
+    """
+    statement = (
+        select(ListenerSketch.target_id, ListenerSketch.sketch)
+        .where(
+            ListenerSketch.target_type == TargetType.ARTIST,
+            ListenerSketch.day >= since,
+        )
+        .order_by(col(ListenerSketch.target_id))
+        .execution_options(yield_per=500)
+    )
+    listeners: list[tuple[uuid.UUID, int]] = []
+    for artist_id, rows in groupby(session.execute(statement), key=itemgetter(0)):
+        sketches = (HyperLogLog.from_bytes(data) for _, data in rows)
+        merged = next(sketches)
+        for sketch in sketches:
+            merged.merge(sketch)
+        listeners.append((artist_id, merged.count()))
+
+    if listeners:
+        counts = values(
+            column("artist_id", Uuid), column("listeners", Integer), name="listeners"
+        ).data(listeners)
+        session.execute(
+            update(Artist)
+            .where(col(Artist.id) == counts.c.artist_id)
+            .values(monthly_listeners=counts.c.listeners)
+        )
+    # Artists nobody listened to in the window
+    session.execute(
+        update(Artist)
+        .where(
+            col(Artist.monthly_listeners) != 0,
+            ~exists().where(
+                col(ListenerSketch.target_type) == TargetType.ARTIST,
+                col(ListenerSketch.target_id) == Artist.id,
+                col(ListenerSketch.day) >= since,
+            ),
+        )
+        .values(monthly_listeners=0)
+    )
+    session.commit()
+    return len(listeners)
+
+
+def delete_listener_sketches(*, session: Session, before: date) -> int:
+    """Delete sketches of days before ``before``, returns how many"""
+    result = cast(
+        CursorResult[Any],
+        session.execute(delete(ListenerSketch).where(col(ListenerSketch.day) < before)),
+    )
+    session.commit()
+    return result.rowcount
+
+
+# ===== LISTENING REPORTS =====
+
+
+def stream_user_song_plays(
+    *,
+    session: Session,
+    start: date,
+    end: date,
+    after_user_id: uuid.UUID | None = None,
+    batch_size: int = 10_000,
+) -> Iterator[tuple[uuid.UUID, uuid.UUID, uuid.UUID, uuid.UUID | None, int, int]]:
+    """
+    Stream each user's plays and listening time in ms per song between
+    ``start`` and ``end``, with the song's artist and genre, ordered by
+    user. Months already rolled up into monthly totals are included.
+    """
+    recent = (
+        select(
+            PlayHistory.user_id,
+            PlayHistory.song_id,
+            func.count().label("plays"),
+            func.sum(col(PlayHistory.duration_played_ms)).label("duration_played_ms"),
+        )
+        .where(PlayHistory.played_at >= start, PlayHistory.played_at < end)
+        .group_by(col(PlayHistory.user_id), col(PlayHistory.song_id))
+    )
+    rolled_up = select(
+        PlayHistoryMonthly.user_id,
+        PlayHistoryMonthly.song_id,
+        PlayHistoryMonthly.plays,
+        PlayHistoryMonthly.duration_played_ms,
+    ).where(PlayHistoryMonthly.month >= start, PlayHistoryMonthly.month < end)
+    plays = union_all(recent, rolled_up).subquery()
+    statement = (
+        sa.select(
+            plays.c.user_id,
+            plays.c.song_id,
+            col(Song.artist_id),
+            col(Song.genre_id),
+            func.sum(plays.c.plays),
+            func.sum(plays.c.duration_played_ms),
+        )
+        .join(Song, col(Song.id) == plays.c.song_id)
+        .group_by(
+            plays.c.user_id, plays.c.song_id, col(Song.artist_id), col(Song.genre_id)
+        )
+        .order_by(plays.c.user_id)
+        .execution_options(yield_per=batch_size)
+    )
+    if after_user_id is not None:
+        statement = statement.where(plays.c.user_id > after_user_id)
+    for user_id, song_id, artist_id, genre_id, count, duration in session.execute(
+        statement
+    ):
+        yield user_id, song_id, artist_id, genre_id, int(count), int(duration)
+
+
+def get_report_names(
+    *,
+    session: Session,
+    song_ids: set[uuid.UUID],
+    artist_ids: set[uuid.UUID],
+    genre_ids: set[uuid.UUID],
+) -> dict[uuid.UUID, str]:
+    """Get the titles of songs and names of artists and genres by ID"""
+    names: dict[uuid.UUID, str] = {}
+    for id_column, name, ids in (
+        (Song.id, Song.title, song_ids),
+        (Artist.id, Artist.stage_name, artist_ids),
+        (Genre.id, Genre.name, genre_ids),
+    ):
+        if ids:
+            names.update(
+                session.execute(select(id_column, name).where(col(id_column).in_(ids)))
+                .tuples()
+                .all()
+            )
+    return names
+
+
+def start_listening_report_run(
+    *, session: Session, year: int, restart: bool = False
+) -> ListeningReportRun:
+    """Get the progress of the reports of ``year``, from scratch if ``restart``"""
+    run = session.get(ListeningReportRun, year)
+    if run is None or restart:
+        run = session.merge(ListeningReportRun(year=year))
+        session.commit()
+        session.refresh(run)
+    return run
+
+
+def save_listening_reports(
+    *, session: Session, year: int, reports: list[dict[str, Any]]
+) -> None:
+    """
+    Write a chunk of reports, ordered by user, and move the year's run past
+    its last user in the same transaction
+    """
+    if not reports:
+        return
+    generated_at = datetime.utcnow()
+    rows = [{**report, "generated_at": generated_at} for report in reports]
+    statement = insert(ListeningReport).values(rows)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["user_id", "year"],
+            set_={
+                name: statement.excluded[name]
+                for name in rows[0]
+                if name not in ("user_id", "year")
+            },
+        )
+    )
+    session.execute(
+        update(ListeningReportRun)
+        .where(col(ListeningReportRun.year) == year)
+        .values(
+            last_user_id=reports[-1]["user_id"],
+            users=ListeningReportRun.users + len(reports),
+        )
+    )
+    session.commit()
+
+
+def finish_listening_report_run(*, session: Session, year: int) -> None:
+    """Mark the reports of ``year`` done, reruns have nothing left to do"""
+    session.execute(
+        update(ListeningReportRun)
+        .where(col(ListeningReportRun.year) == year)
+        .values(finished_at=datetime.utcnow())
+    )
+    session.commit()
+
+
+def get_listening_report(
+    *, session: Session, user_id: uuid.UUID, year: int
+) -> ListeningReport | None:
+    """Get a user's report of ``year``"""
+    return session.get(ListeningReport, (user_id, year))
@@ -0,0 +1,286 @@
+"""
+File storage CRUD operations (resumable UploadSession, blob references)
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlmodel import Session, col, func, select
+
+from app.core.config import settings
+from app.models import (
+    Album,
+    Artist,
+    Playlist,
+    Song,
+    UploadSession,
+    UploadSessionCreate,
+    UploadStatus,
+)
+from app.services.blobs import blob_digest
+
+SONG_FILE_URL_PREFIX = f"{settings.API_V1_STR}/files/songs/"
+COVER_FILE_URL_PREFIX = f"{settings.API_V1_STR}/files/covers/"
+
+
+def upload_chunk_count(upload: UploadSession) -> int:
+    """Number of chunks the upload is split into"""
+    return -(-upload.total_size // upload.chunk_size)
+
+
+def upload_chunk_length(upload: UploadSession, index: int) -> int:
+    """Expected length of chunk ``index``, only the last one may be short"""
+    return min(upload.chunk_size, upload.total_size - index * upload.chunk_size)
+
+
+def is_upload_chunk_received(upload: UploadSession, index: int) -> bool:
+    """Check the received bitmap for chunk ``index``"""
+    return bool(upload.received_chunks[index // 8] & (1 << (index % 8)))
+
+
+def get_upload_missing_offsets(upload: UploadSession) -> list[int]:
+    """Byte offsets of the chunks that still have to be sent"""
+    return [
+        index * upload.chunk_size
+        for index in range(upload_chunk_count(upload))
+        if not is_upload_chunk_received(upload, index)
+    ]
+
+
+def get_upload_received_bytes(upload: UploadSession) -> int:
+    """Total size of the chunks received so far"""
+    return sum(
+        upload_chunk_length(upload, index)
+        for index in range(upload_chunk_count(upload))
+        if is_upload_chunk_received(upload, index)
+    )
+
+
+def create_upload_session(
+    *,
+    session: Session,
+    upload_create: UploadSessionCreate,
+    owner_id: uuid.UUID,
+    chunk_size: int,
+    expires_in: timedelta,
+) -> UploadSession:
+    """Create a new resumable upload session"""
+    db_obj = UploadSession.model_validate(
+        upload_create,
+        update={
+            "owner_id": owner_id,
+            "chunk_size": chunk_size,
+            "expires_at": datetime.utcnow() + expires_in,
+        },
+    )
+    db_obj.received_chunks = bytes(-(-upload_chunk_count(db_obj) // 8))
+    session.add(db_obj)
+    session.commit()
+    session.refresh(db_obj)
+    return db_obj
+
+
+def get_upload_session(
+    *, session: Session, upload_id: uuid.UUID
+) -> UploadSession | None:
+    """Get upload session by ID"""
+    return session.get(UploadSession, upload_id)
+
+
+def mark_upload_chunk_received(
+    *, session: Session, upload_id: uuid.UUID, index: int
+) -> UploadSession | None:
+    """
+    Set the received bit for chunk ``index``. The row is locked so parallel
+    chunk uploads for the same session don't overwrite each other's bits.
+    Returns ``None`` if the session is gone or no longer active.
+    """
+    statement = (
+        select(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .with_for_update()
+        # Read the locked row over a copy the session may have loaded before
+        .execution_options(populate_existing=True)
+    )
+    upload = session.exec(statement).first()
+    if upload is None or upload.status != UploadStatus.ACTIVE:
+        session.rollback()
+        return None
+    bitmap = bytearray(upload.received_chunks)
+    bitmap[index // 8] |= 1 << (index % 8)
+    upload.received_chunks = bytes(bitmap)
+    session.add(upload)
+    session.commit()
+    session.refresh(upload)
+    return upload
+
+
+def start_upload_completion(
+    *, session: Session, upload_id: uuid.UUID
+) -> UploadSession | None:
+    """
+    Move an active upload session to COMPLETING. The row is locked, so of
+    concurrent completions only one gets the session, the others ``None``.
+    """
+    statement = (
+        select(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .with_for_update()
+        # Read the locked row over a copy the session may have loaded before
+        .execution_options(populate_existing=True)
+    )
+    upload = session.exec(statement).first()
+    if upload is None or upload.status != UploadStatus.ACTIVE:
+        session.rollback()
+        return None
+    upload.status = UploadStatus.COMPLETING
+    upload.completion_started_at = datetime.utcnow()
+    session.add(upload)
+    session.commit()
+    session.refresh(upload)
+    return upload
+
+
+def reopen_upload_session(
+    *, session: Session, upload_id: uuid.UUID
+) -> UploadSession | None:
+    """
+    Move a session whose completion failed back to ACTIVE, so the client can
+    complete it again. Whatever the failed completion left pending is rolled
+    back first. Returns ``None`` unless the session was COMPLETING.
+    """
+    session.rollback()
+    statement = (
+        select(UploadSession)
+        .where(UploadSession.id == upload_id)
+        .with_for_update()
+        # Read the locked row over a copy the session may have loaded before
+        .execution_options(populate_existing=True)
+    )
+    upload = session.exec(statement).first()
+    if upload is None or upload.status != UploadStatus.COMPLETING:
+        session.rollback()
+        return None
+    upload.status = UploadStatus.ACTIVE
+    upload.completion_started_at = None
+    session.add(upload)
+    session.commit()
+    session.refresh(upload)
+    return upload
+
+
+def reopen_stalled_upload_sessions(
+    *, session: Session, started_before: datetime
+) -> list[uuid.UUID]:
+    """
+    Move sessions that started completing before ``started_before`` back to
+    ACTIVE and return their IDs. Their completion died with its process.
+    """
+    statement = (
+        select(UploadSession)
+        .where(
+            UploadSession.status == UploadStatus.COMPLETING,
+            col(UploadSession.completion_started_at) < started_before,
+        )
+        .with_for_update(skip_locked=True)
+    )
+    stalled = list(session.exec(statement))
+    for upload in stalled:
+        upload.status = UploadStatus.ACTIVE
+        upload.completion_started_at = None
+        session.add(upload)
+    session.commit()
+    return [upload.id for upload in stalled]
+
+
+def count_open_upload_sessions(
+    *, session: Session, owner_id: uuid.UUID, now: datetime | None = None
+) -> int:
+    """Number of the user's unexpired sessions that are not completed"""
+    statement = select(func.count()).where(
+        UploadSession.owner_id == owner_id,
+        UploadSession.status != UploadStatus.COMPLETED,
+        UploadSession.expires_at >= (now or datetime.utcnow()),
+    )
+    return session.exec(statement).one()
+
+
+def complete_upload_session(
+    *, session: Session, upload: UploadSession
+) -> UploadSession:
+    """Mark an upload session as completed"""
+    upload.status = UploadStatus.COMPLETED
+    session.add(upload)
+    session.commit()
+    session.refresh(upload)
+    return upload
+
+
+def delete_upload_session(*, session: Session, upload_id: uuid.UUID) -> bool:
+    """Delete an upload session"""
+    upload = session.get(UploadSession, upload_id)
+    if upload:
+        session.delete(upload)
+        session.commit()
+        return True
+    return False
+
+
+def delete_expired_upload_sessions(
+    *, session: Session, now: datetime | None = None
+) -> list[uuid.UUID]:
+    """
+    Delete expired upload sessions and return their IDs. Sessions being
+    completed are left to their completion.
+    """
+    statement = select(UploadSession).where(
+        UploadSession.expires_at < (now or datetime.utcnow()),
+        UploadSession.status != UploadStatus.COMPLETING,
+    )
+    expired = list(session.exec(statement))
+    for upload in expired:
+        session.delete(upload)
+    session.commit()
+    return [upload.id for upload in expired]
+
+
+# ===== BLOB REFERENCES =====
+
+
+def get_song_blob_filename(song: Song) -> str | None:
+    """Filename of the song's uploaded file, ``None`` for external URLs"""
+    if song.file_url and song.file_url.startswith(SONG_FILE_URL_PREFIX):
+        return song.file_url[len(SONG_FILE_URL_PREFIX) :]
+    return None
+
+
+def _count_blob_references(session: Session, column: Any, prefix: str) -> Counter[str]:
+    statement = (
+        select(column, func.count()).where(column.startswith(prefix)).group_by(column)
+    )
+    counts: Counter[str] = Counter()
+    for url, count in session.exec(statement):
+        digest = blob_digest(url[len(prefix) :])
+        if digest:
+            counts[digest] += count
+    return counts
+
+
+def get_song_blob_reference_counts(*, session: Session) -> Counter[str]:
+    """Number of songs whose file_url points at each song blob"""
+    return _count_blob_references(session, Song.file_url, SONG_FILE_URL_PREFIX)
+
+
+def get_cover_blob_reference_counts(*, session: Session) -> Counter[str]:
+    """Number of albums, playlists and artists using each cover blob"""
+    counts: Counter[str] = Counter()
+    for column in (
+        Album.cover_image_url,
+        Playlist.cover_image_url,
+        Artist.avatar_url,
+        Artist.banner_url,
+    ):
+        counts += _count_blob_references(session, column, COVER_FILE_URL_PREFIX)
+    return counts
@@ -0,0 +1,264 @@
+"""
+Media processing CRUD operations (MediaJob queue, Rendition, AudioMetadata)
+"""
+
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, col, delete, func, select
+
+from app.models import AudioAnalysis, AudioMetadata, MediaJob, MediaJobStatus, Rendition
+
+# ===== MEDIA JOB CRUD =====
+
+
+def media_job_progress(job: MediaJob) -> float:
+    """Share of the job's tasks that have finished, successfully or not"""
+    if not job.tasks_total:
+        return 0.0
+    return (job.tasks_done + job.tasks_failed) / job.tasks_total
+
+
+def enqueue_media_job(
+    *, session: Session, source_key: str, source_digest: str
+) -> MediaJob:
+    """
+    Queue processing of a song blob. A blob that is queued, being processed
+    or already processed is not queued again.
+    """
+    statement = (
+        select(MediaJob)
+        .where(MediaJob.source_digest == source_digest)
+        .where(MediaJob.status != MediaJobStatus.FAILED)
+    )
+    existing = session.exec(statement).first()
+    if existing:
+        return existing
+    db_obj = MediaJob(source_key=source_key, source_digest=source_digest)
+    session.add(db_obj)
+    session.commit()
+    session.refresh(db_obj)
+    return db_obj
+
+
+def get_media_job(*, session: Session, job_id: uuid.UUID) -> MediaJob | None:
+    """Get media job by ID"""
+    return session.get(MediaJob, job_id)
+
+
+def get_media_jobs(
+    *,
+    session: Session,
+    status: MediaJobStatus | None = None,
+    skip: int = 0,
+    limit: int = 100,
+) -> tuple[list[MediaJob], int]:
+    """Get media jobs, newest first, with the total count"""
+    statement = select(MediaJob)
+    count_statement = select(func.count()).select_from(MediaJob)
+    if status:
+        statement = statement.where(MediaJob.status == status)
+        count_statement = count_statement.where(MediaJob.status == status)
+    statement = (
+        statement.order_by(col(MediaJob.created_at).desc()).offset(skip).limit(limit)
+    )
+    return list(session.exec(statement)), session.exec(count_statement).one()
+
+
+def claim_media_jobs(
+    *, session: Session, limit: int, tasks_total: int
+) -> list[MediaJob]:
+    """
+    Mark up to ``limit`` pending jobs as running and return them, oldest
+    first. Rows claimed by another replica are skipped, not waited for.
+    """
+    statement = (
+        select(MediaJob)
+        .where(MediaJob.status == MediaJobStatus.PENDING)
+        .order_by(col(MediaJob.created_at))
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    jobs = list(session.exec(statement))
+    for job in jobs:
+        job.status = MediaJobStatus.RUNNING
+        job.started_at = datetime.utcnow()
+        job.attempts += 1
+        job.tasks_total = tasks_total
+        job.tasks_done = 0
+        job.tasks_failed = 0
+        job.error = None
+        session.add(job)
+    session.commit()
+    for job in jobs:
+        session.refresh(job)
+    return jobs
+
+
+def record_media_task(
+    *, session: Session, job_id: uuid.UUID, error: str | None = None
+) -> MediaJob | None:
+    """
+    Count one finished task of a running job and settle the job once all of
+    its tasks are done. The row is locked so concurrent completions add up.
+    """
+    statement = select(MediaJob).where(MediaJob.id == job_id).with_for_update()
+    job = session.exec(statement).first()
+    if not job or job.status != MediaJobStatus.RUNNING:
+        return job
+    if error is None:
+        job.tasks_done += 1
+    else:
+        job.tasks_failed += 1
+        job.error = "\n".join(filter(None, [job.error, error]))
+    if job.tasks_done + job.tasks_failed >= job.tasks_total:
+        job.status = (
+            MediaJobStatus.FAILED if job.tasks_failed else MediaJobStatus.SUCCEEDED
+        )
+        job.finished_at = datetime.utcnow()
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def requeue_media_jobs(
+    *,
+    session: Session,
+    job_ids: list[uuid.UUID] | None = None,
+    started_before: datetime | None = None,
+    max_attempts: int | None = None,
+) -> int:
+    """
+    Put running jobs back in the queue: the given ones, or those started
+    before ``started_before`` whose worker presumably died. Jobs that were
+    claimed ``max_attempts`` times already are failed instead.
+    """
+    statement = select(MediaJob).where(MediaJob.status == MediaJobStatus.RUNNING)
+    if job_ids is not None:
+        statement = statement.where(col(MediaJob.id).in_(job_ids))
+    if started_before is not None:
+        statement = statement.where(col(MediaJob.started_at) < started_before)
+    jobs = list(session.exec(statement.with_for_update(skip_locked=True)))
+    for job in jobs:
+        if max_attempts is not None and job.attempts >= max_attempts:
+            job.status = MediaJobStatus.FAILED
+            job.error = f"Lost its worker {job.attempts} times, giving up"
+            job.finished_at = datetime.utcnow()
+        else:
+            job.status = MediaJobStatus.PENDING
+        session.add(job)
+    session.commit()
+    return len(jobs)
+
+
+def retry_media_job(*, session: Session, job: MediaJob) -> MediaJob:
+    """Queue a failed job again"""
+    job.status = MediaJobStatus.PENDING
+    job.finished_at = None
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+# ===== RENDITION CRUD =====
+
+
+def save_rendition(
+    *,
+    session: Session,
+    source_digest: str,
+    bitrate_kbps: int,
+    key: str,
+    content_type: str,
+    size: int,
+) -> None:
+    """Record a rendition, replacing an earlier one of the same bitrate"""
+    statement = insert(Rendition).values(
+        source_digest=source_digest,
+        bitrate_kbps=bitrate_kbps,
+        key=key,
+        content_type=content_type,
+        size=size,
+        created_at=datetime.utcnow(),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["source_digest", "bitrate_kbps"],
+        set_={"key": key, "content_type": content_type, "size": size},
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def get_renditions(*, session: Session, source_digest: str) -> list[Rendition]:
+    """Get the renditions of a song blob, lowest bitrate first"""
+    statement = (
+        select(Rendition)
+        .where(Rendition.source_digest == source_digest)
+        .order_by(col(Rendition.bitrate_kbps))
+    )
+    return list(session.exec(statement))
+
+
+# ===== AUDIO METADATA CRUD =====
+
+
+def save_audio_metadata(
+    *, session: Session, source_digest: str, values: dict[str, Any]
+) -> None:
+    """Record the probed metadata of a song blob, replacing an earlier probe"""
+    statement = insert(AudioMetadata).values(
+        source_digest=source_digest, created_at=datetime.utcnow(), **values
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["source_digest"], set_=values
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def get_audio_metadata(*, session: Session, source_digest: str) -> AudioMetadata | None:
+    """Get the probed metadata of a song blob"""
+    return session.get(AudioMetadata, source_digest)
+
+
+# ===== AUDIO ANALYSIS CRUD =====
+
+
+def save_audio_analysis(
+    *, session: Session, source_digest: str, values: dict[str, Any]
+) -> None:
+    """Record the waveform and loudness of a song blob, replacing an earlier analysis"""
+    statement = insert(AudioAnalysis).values(
+        source_digest=source_digest, created_at=datetime.utcnow(), **values
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["source_digest"], set_=values
+    )
+    session.execute(statement)
+    session.commit()
+
+
+def get_audio_analysis(*, session: Session, source_digest: str) -> AudioAnalysis | None:
+    """Get the waveform and loudness of a song blob"""
+    return session.get(AudioAnalysis, source_digest)
+
+
+def delete_media_records(*, session: Session, source_digest: str) -> None:
+    """Forget the jobs, renditions and analyses of a song blob whose files were deleted"""
+    session.execute(
+        delete(AudioAnalysis).where(col(AudioAnalysis.source_digest) == source_digest)
+    )
+    session.execute(
+        delete(AudioMetadata).where(col(AudioMetadata.source_digest) == source_digest)
+    )
+    session.execute(
+        delete(Rendition).where(col(Rendition.source_digest) == source_digest)
+    )
+    session.execute(
+        delete(MediaJob).where(col(MediaJob.source_digest) == source_digest)
+    )
+    session.commit()
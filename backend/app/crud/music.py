@@ -1,10 +1,22 @@
 """
 CRUD operations for music domain
 """
-from typing import Any
+import logging
+from collections.abc import Collection, Iterator
+from functools import reduce
+from typing import Any, Literal
 from uuid import UUID
-from sqlmodel import Session, select, func, and_, or_, desc, asc
 
+import sqlalchemy as sa
+from sqlalchemy import (
+    Enum, Integer, Uuid, cast, column, false, literal, literal_column, union_all, update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlmodel import Session, select, func, and_, or_, desc, asc, col
+
+from app.core.config import settings
+from app.models.media import AudioMetadata
 from app.models.music import (
     Genre, GenreCreate, GenreUpdate,
     Artist, ArtistCreate, ArtistUpdate,
@@ -12,8 +24,93 @@ from app.models.music import (
     Song, SongCreate, SongUpdate,
     Playlist, PlaylistCreate, PlaylistUpdate,
     PlaylistSong,
+    SearchHit,
 )
+from app.models.base import TargetType
 from app.models.user import User
+from app.services.blobs import blob_digest
+from app.services.normalize import fold_accents, search_key
+
+from .files import COVER_FILE_URL_PREFIX, SONG_FILE_URL_PREFIX
+from .media import get_audio_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def _text_match(column: Any, query: str) -> tuple[Any, Any]:
+    """
+    Condition for ``query`` appearing in the search key ``column`` or nearly
+    matching one of its words, ignoring case, accents and punctuation, and
+    how well it matches to rank by. Both are served by the column's trigram
+    index.
+    """
+    key = search_key(query)
+    if not key:
+        return false(), literal(0)
+    return (
+        or_(
+            col(column).contains(key, autoescape=True),
+            literal(key).op("<%")(column),
+        ),
+        func.word_similarity(key, column),
+    )
+
+
+# Text search configuration of search vectors, without stemming as the
+# catalog mixes languages
+SEARCH_CONFIG = "simple"
+
+
+def _to_tsvector(text: Any, weight: str) -> Any:
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    # Folded like queries, see services.normalize
+    vector = func.to_tsvector(config, func.fold_accents(func.coalesce(text, "")))
+    # Weights are "char", which a bound string parameter doesn't cast to
+    return func.setweight(vector, literal_column(f"'{weight}'"))
+
+
+def _search_vector(model: type) -> Any:
+    """
+    The search vector of a row of ``model``: its name weighted highest,
+    then its artist, album and genre, then lyrics or descriptions
+    """
+    def name_of(column: Any, where: Any) -> Any:
+        return select(column).where(where).scalar_subquery()
+
+    if model is Artist:
+        parts = [(Artist.stage_name, "A"), (Artist.biography, "D")]
+    elif model is Album:
+        parts = [
+            (Album.title, "A"),
+            (name_of(Artist.stage_name, Artist.id == Album.artist_id), "B"),
+            (name_of(Genre.name, Genre.id == Album.genre_id), "C"),
+            (Album.description, "D"),
+        ]
+    elif model is Song:
+        parts = [
+            (Song.title, "A"),
+            (name_of(Artist.stage_name, Artist.id == Song.artist_id), "B"),
+            (name_of(Album.title, Album.id == Song.album_id), "C"),
+            (name_of(Genre.name, Genre.id == Song.genre_id), "C"),
+        ]
+        if settings.SEARCH_LYRICS:
+            parts.append((Song.lyrics, "D"))
+    else:
+        parts = [(Playlist.name, "A"), (Playlist.description, "D")]
+    return reduce(
+        lambda vector, part: vector.op("||")(part),
+        [_to_tsvector(text, weight) for text, weight in parts],
+    )
+
+
+def _refresh_search_vectors(session: Session, model: type, *where: Any) -> None:
+    """Recompute the search vectors of the rows of ``model`` matching ``where``"""
+    session.execute(
+        update(model)
+        .where(*where)
+        .values(search_vector=_search_vector(model))
+        .execution_options(synchronize_session=False)
+    )
 
 
 # ===== GENRE CRUD =====
@@ -53,6 +150,9 @@ def update_genre(
     genre_data = genre_update.model_dump(exclude_unset=True)
     db_genre.sqlmodel_update(genre_data)
     session.add(db_genre)
+    if "name" in genre_data:
+        _refresh_search_vectors(session, Album, Album.genre_id == db_genre.id)
+        _refresh_search_vectors(session, Song, Song.genre_id == db_genre.id)
     session.commit()
     session.refresh(db_genre)
     return db_genre
@@ -74,6 +174,7 @@ def create_artist(*, session: Session, artist_create: ArtistCreate) -> Artist:
     """Create a new artist"""
     db_obj = Artist.model_validate(artist_create)
     session.add(db_obj)
+    _refresh_search_vectors(session, Artist, Artist.id == db_obj.id)
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -94,20 +195,21 @@ def get_artists(
     *, session: Session, skip: int = 0, limit: int = 100
 ) -> list[Artist]:
     """Get all artists with pagination"""
-    statement = select(Artist).offset(skip).limit(limit).order_by(Artist.name)
+    statement = select(Artist).offset(skip).limit(limit).order_by(Artist.stage_name)
     return session.exec(statement).all()
 
 
 def search_artists(
     *, session: Session, query: str, skip: int = 0, limit: int = 50
 ) -> list[Artist]:
-    """Search artists by name"""
+    """Search artists by name, best matches first"""
+    match, rank = _text_match(Artist.search_key, query)
     statement = (
         select(Artist)
-        .where(Artist.name.ilike(f"%{query}%"))
+        .where(match)
         .offset(skip)
         .limit(limit)
-        .order_by(Artist.name)
+        .order_by(desc(rank), Artist.stage_name)
     )
     return session.exec(statement).all()
 
@@ -119,6 +221,10 @@ def update_artist(
     artist_data = artist_update.model_dump(exclude_unset=True)
     db_artist.sqlmodel_update(artist_data)
     session.add(db_artist)
+    _refresh_search_vectors(session, Artist, Artist.id == db_artist.id)
+    if "stage_name" in artist_data:
+        _refresh_search_vectors(session, Album, Album.artist_id == db_artist.id)
+        _refresh_search_vectors(session, Song, Song.artist_id == db_artist.id)
     session.commit()
     session.refresh(db_artist)
     return db_artist
@@ -140,6 +246,7 @@ def create_album(*, session: Session, album_create: AlbumCreate) -> Album:
     """Create a new album"""
     db_obj = Album.model_validate(album_create)
     session.add(db_obj)
+    _refresh_search_vectors(session, Album, Album.id == db_obj.id)
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -173,16 +280,24 @@ def get_albums_by_artist(
 
 
 def search_albums(
-    *, session: Session, query: str, skip: int = 0, limit: int = 50
+    *,
+    session: Session,
+    query: str,
+    public_only: bool = False,
+    skip: int = 0,
+    limit: int = 50,
 ) -> list[Album]:
-    """Search albums by title"""
+    """Search albums by title, best matches first"""
+    match, rank = _text_match(Album.search_key, query)
     statement = (
         select(Album)
-        .where(Album.title.ilike(f"%{query}%"))
+        .where(match)
         .offset(skip)
         .limit(limit)
-        .order_by(Album.title)
+        .order_by(desc(rank), Album.title)
     )
+    if public_only:
+        statement = statement.where(col(Album.is_public))
     return session.exec(statement).all()
 
 
@@ -193,6 +308,9 @@ def update_album(
     album_data = album_update.model_dump(exclude_unset=True)
     db_album.sqlmodel_update(album_data)
     session.add(db_album)
+    _refresh_search_vectors(session, Album, Album.id == db_album.id)
+    if "title" in album_data:
+        _refresh_search_vectors(session, Song, Song.album_id == db_album.id)
     session.commit()
     session.refresh(db_album)
     return db_album
@@ -208,12 +326,62 @@ def delete_album(*, session: Session, album_id: UUID) -> bool:
     return False
 
 
+def _refresh_album_totals(session: Session, album_id: UUID) -> None:
+    """Recount an album's tracks and duration from its songs"""
+    album = session.get(Album, album_id)
+    if not album:
+        return
+    session.flush()
+    statement = (
+        select(func.count(), func.coalesce(func.sum(col(Song.duration_ms)), 0))
+        .where(Song.album_id == album_id)
+    )
+    album.total_tracks, album.duration_ms = session.exec(statement).one()
+    session.add(album)
+
+
 # ===== SONG CRUD =====
 
+def _duration_from_metadata(
+    duration_ms: int | None, metadata: AudioMetadata | None
+) -> int | None:
+    """The probed duration when none was given or the given one is off"""
+    if metadata is None or not metadata.duration_ms:
+        return duration_ms
+    if duration_ms is None or abs(duration_ms - metadata.duration_ms) > settings.DURATION_TOLERANCE_MS:
+        return metadata.duration_ms
+    return duration_ms
+
+
+def _fill_album_cover(session: Session, album_id: UUID, metadata: AudioMetadata) -> None:
+    """Use the cover art embedded in a song file for an album without one"""
+    album = session.get(Album, album_id)
+    if album and not album.cover_image_url and metadata.cover_filename:
+        album.cover_image_url = f"{COVER_FILE_URL_PREFIX}{metadata.cover_filename}"
+        session.add(album)
+
+
+def _file_audio_metadata(session: Session, file_url: str | None) -> AudioMetadata | None:
+    if not file_url or not file_url.startswith(SONG_FILE_URL_PREFIX):
+        return None
+    digest = blob_digest(file_url[len(SONG_FILE_URL_PREFIX):])
+    return get_audio_metadata(session=session, source_digest=digest) if digest else None
+
+
 def create_song(*, session: Session, song_create: SongCreate) -> Song:
-    """Create a new song"""
-    db_obj = Song.model_validate(song_create)
+    """
+    Create a new song. Its duration (and a missing album cover) comes from
+    the uploaded file's metadata when that was extracted already, otherwise
+    once extraction finishes.
+    """
+    metadata = _file_audio_metadata(session, song_create.file_url)
+    duration_ms = _duration_from_metadata(song_create.duration_ms, metadata)
+    db_obj = Song.model_validate(song_create, update={"duration_ms": duration_ms or 0})
     session.add(db_obj)
+    if metadata:
+        _fill_album_cover(session, db_obj.album_id, metadata)
+    _refresh_album_totals(session, db_obj.album_id)
+    _refresh_search_vectors(session, Song, Song.id == db_obj.id)
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -224,6 +392,27 @@ def get_song(*, session: Session, song_id: UUID) -> Song | None:
     return session.get(Song, song_id)
 
 
+def get_songs_by_ids(*, session: Session, song_ids: list[UUID]) -> list[Song]:
+    """Get songs in the order of ``song_ids``, leaving out missing ones"""
+    if not song_ids:
+        return []
+    songs = {
+        song.id: song
+        for song in session.exec(select(Song).where(col(Song.id).in_(song_ids)))
+    }
+    return [songs[song_id] for song_id in song_ids if song_id in songs]
+
+
+def get_song_durations(
+    *, session: Session, song_ids: Collection[UUID]
+) -> dict[UUID, int]:
+    """Get the duration of each existing song among ``song_ids``"""
+    if not song_ids:
+        return {}
+    statement = select(Song.id, Song.duration_ms).where(col(Song.id).in_(song_ids))
+    return dict(session.exec(statement).all())
+
+
 def get_songs(
     *, session: Session, skip: int = 0, limit: int = 100
 ) -> list[Song]:
@@ -277,13 +466,14 @@ def get_songs_by_genre(
 def search_songs(
     *, session: Session, query: str, skip: int = 0, limit: int = 50
 ) -> list[Song]:
-    """Search songs by title"""
+    """Search songs by title, best matches first"""
+    match, rank = _text_match(Song.search_key, query)
     statement = (
         select(Song)
-        .where(Song.title.ilike(f"%{query}%"))
+        .where(match)
         .offset(skip)
         .limit(limit)
-        .order_by(Song.title)
+        .order_by(desc(rank), Song.title)
     )
     return session.exec(statement).all()
 
@@ -301,15 +491,37 @@ def get_popular_songs(
     return session.exec(statement).all()
 
 
+def add_play_counts(*, session: Session, counts: dict[UUID, int]) -> int:
+    """
+    Add plays to songs atomically in one UPDATE, returns the number of songs
+    updated. Rows are locked in ID order first, so concurrent batches from
+    several processes don't deadlock.
+    """
+    if not counts:
+        return 0
+    song_ids = sorted(counts)
+    locked = session.exec(
+        select(Song.id).where(col(Song.id).in_(song_ids)).order_by(col(Song.id)).with_for_update()
+    ).all()
+    plays = values(
+        column("song_id", Uuid), column("plays", Integer), name="plays"
+    ).data([(song_id, counts[song_id]) for song_id in song_ids])
+    statement = (
+        update(Song)
+        .where(col(Song.id) == plays.c.song_id)
+        .values(play_count=col(Song.play_count) + plays.c.plays)
+    )
+    session.execute(statement)
+    session.commit()
+    # Locked rows can't have been deleted in between
+    return len(locked)
+
+
 def increment_play_count(*, session: Session, song_id: UUID) -> Song | None:
     """Increment play count for a song"""
-    song = session.get(Song, song_id)
-    if song:
-        song.play_count += 1
-        session.add(song)
-        session.commit()
-        session.refresh(song)
-    return song
+    if not add_play_counts(session=session, counts={song_id: 1}):
+        return None
+    return session.get(Song, song_id, populate_existing=True)
 
 
 def update_song(
@@ -317,8 +529,15 @@ def update_song(
 ) -> Song:
     """Update a song"""
     song_data = song_update.model_dump(exclude_unset=True)
+    previous_album_id = db_song.album_id
     db_song.sqlmodel_update(song_data)
+    if song_data.keys() & {"file_url", "duration_ms"}:
+        metadata = _file_audio_metadata(session, db_song.file_url)
+        db_song.duration_ms = _duration_from_metadata(db_song.duration_ms, metadata) or 0
     session.add(db_song)
+    for album_id in {previous_album_id, db_song.album_id}:
+        _refresh_album_totals(session, album_id)
+    _refresh_search_vectors(session, Song, Song.id == db_song.id)
     session.commit()
     session.refresh(db_song)
     return db_song
@@ -329,19 +548,75 @@ def delete_song(*, session: Session, song_id: UUID) -> bool:
     song = session.get(Song, song_id)
     if song:
         session.delete(song)
+        _refresh_album_totals(session, song.album_id)
         session.commit()
         return True
     return False
 
 
+def apply_audio_metadata(*, session: Session, metadata: AudioMetadata) -> int:
+    """
+    Correct the duration of every song using the probed blob, fill in a
+    missing album cover with the embedded one and recount the totals of the
+    affected albums and playlists. Returns the number of songs changed.
+    """
+    statement = select(Song).where(
+        col(Song.file_url).startswith(f"{SONG_FILE_URL_PREFIX}{metadata.source_digest}.")
+    )
+    songs = list(session.exec(statement))
+    changed = [
+        song for song in songs
+        if _duration_from_metadata(song.duration_ms, metadata) != song.duration_ms
+    ]
+    for song in changed:
+        logger.info(
+            "Correcting duration of song %s from %d to %d ms",
+            song.id, song.duration_ms, metadata.duration_ms,
+        )
+        song.duration_ms = metadata.duration_ms
+        session.add(song)
+
+    for album_id in {song.album_id for song in songs}:
+        _fill_album_cover(session, album_id, metadata)
+        if changed:
+            _refresh_album_totals(session, album_id)
+    if changed:
+        playlist_statement = (
+            select(PlaylistSong.playlist_id)
+            .where(col(PlaylistSong.song_id).in_([song.id for song in changed]))
+            .distinct()
+        )
+        for playlist_id in session.exec(playlist_statement).all():
+            _refresh_playlist_totals(session, playlist_id)
+    session.commit()
+    return len(changed)
+
+
 # ===== PLAYLIST CRUD =====
 
+def _refresh_playlist_totals(session: Session, playlist_id: UUID) -> None:
+    """Recount a playlist's tracks and duration from its songs"""
+    playlist = session.get(Playlist, playlist_id)
+    if not playlist:
+        return
+    session.flush()
+    statement = (
+        select(func.count(), func.coalesce(func.sum(col(Song.duration_ms)), 0))
+        .select_from(PlaylistSong)
+        .join(Song)
+        .where(PlaylistSong.playlist_id == playlist_id)
+    )
+    playlist.total_tracks, playlist.total_duration_ms = session.exec(statement).one()
+    session.add(playlist)
+
+
 def create_playlist(*, session: Session, playlist_create: PlaylistCreate, owner_id: UUID) -> Playlist:
     """Create a new playlist"""
     playlist_data = playlist_create.model_dump()
     playlist_data["owner_id"] = owner_id
     db_obj = Playlist.model_validate(playlist_data)
     session.add(db_obj)
+    _refresh_search_vectors(session, Playlist, Playlist.id == db_obj.id)
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -383,18 +658,19 @@ def get_public_playlists(
 def search_playlists(
     *, session: Session, query: str, skip: int = 0, limit: int = 50
 ) -> list[Playlist]:
-    """Search public playlists by name"""
+    """Search public playlists by name, best matches first"""
+    match, rank = _text_match(Playlist.search_key, query)
     statement = (
         select(Playlist)
         .where(
             and_(
-                Playlist.name.ilike(f"%{query}%"),
+                match,
                 Playlist.is_public == True
             )
         )
         .offset(skip)
         .limit(limit)
-        .order_by(Playlist.name)
+        .order_by(desc(rank), Playlist.name)
     )
     return session.exec(statement).all()
 
@@ -430,6 +706,7 @@ def add_song_to_playlist(
         position=position
     )
     session.add(playlist_song)
+    _refresh_playlist_totals(session, playlist_id)
     session.commit()
     session.refresh(playlist_song)
     return playlist_song
@@ -448,6 +725,7 @@ def remove_song_from_playlist(
     playlist_song = session.exec(statement).first()
     if playlist_song:
         session.delete(playlist_song)
+        _refresh_playlist_totals(session, playlist_id)
         session.commit()
         return True
     return False
@@ -504,6 +782,7 @@ def update_playlist(
     playlist_data = playlist_update.model_dump(exclude_unset=True)
     db_playlist.sqlmodel_update(playlist_data)
     session.add(db_playlist)
+    _refresh_search_vectors(session, Playlist, Playlist.id == db_playlist.id)
     session.commit()
     session.refresh(db_playlist)
     return db_playlist
@@ -517,3 +796,199 @@ def delete_playlist(*, session: Session, playlist_id: UUID) -> bool:
         session.commit()
         return True
     return False
+
+
+# ===== AUTOCOMPLETE =====
+
+def stream_catalog_names(
+    *, session: Session, batch_size: int = 10_000
+) -> Iterator[tuple[TargetType, UUID, str, int]]:
+    """
+    Stream the type, ID, name and popularity of every artist, song, public
+    album and public playlist. An album's popularity is its songs' plays.
+    """
+    album_plays = (
+        select(Song.album_id, func.sum(Song.play_count).label("plays"))
+        .group_by(col(Song.album_id))
+        .subquery()
+    )
+    statement = union_all(
+        select(literal(TargetType.ARTIST.value), Artist.id, Artist.stage_name, Artist.monthly_listeners),
+        select(
+            literal(TargetType.ALBUM.value),
+            Album.id,
+            Album.title,
+            func.coalesce(album_plays.c.plays, 0),
+        )
+        .outerjoin(album_plays, album_plays.c.album_id == Album.id)
+        .where(col(Album.is_public)),
+        select(literal(TargetType.SONG.value), Song.id, Song.title, Song.play_count),
+        select(
+            literal(TargetType.PLAYLIST.value),
+            Playlist.id,
+            Playlist.name,
+            Playlist.follower_count,
+        ).where(col(Playlist.is_public)),
+    ).execution_options(yield_per=batch_size)
+    for target_type, item_id, name, popularity in session.execute(statement):
+        yield TargetType(target_type), item_id, name, int(popularity)
+
+
+# ===== FULL-TEXT SEARCH =====
+
+def _text_query(query: str, match: Literal["words", "phrase", "prefix"]) -> Any:
+    """
+    The tsquery of ``query``: web search syntax ("quoted phrases", or,
+    -word), the words in order, or all words with the last one a prefix as
+    typed so far. None when there are no words to search for.
+    """
+    config = cast(SEARCH_CONFIG, REGCONFIG)
+    query = fold_accents(query)
+    if match == "phrase":
+        return func.phraseto_tsquery(config, query)
+    if match == "prefix":
+        words = search_key(query).split()
+        if not words:
+            return None
+        return func.to_tsquery(config, " & ".join(words) + ":*")
+    return func.websearch_to_tsquery(config, query)
+
+
+def _text_search_statement(target_type: TargetType, tsquery: Any) -> Any:
+    """
+    Rows of ``target_type`` matching ``tsquery`` with their type, ID, name,
+    rank, text to highlight and the row as JSON, best matches first
+    """
+    model: Any
+    name: Any
+    details: Any
+    popularity: Any
+    if target_type == TargetType.SONG:
+        model, name, details, popularity = Song, Song.title, Song.lyrics, Song.play_count
+    elif target_type == TargetType.ALBUM:
+        model, name, details, popularity = Album, Album.title, Album.description, literal(0)
+    elif target_type == TargetType.ARTIST:
+        model, name, details, popularity = (
+            Artist, Artist.stage_name, Artist.biography, Artist.monthly_listeners
+        )
+    else:
+        model, name, details, popularity = (
+            Playlist, Playlist.name, Playlist.description, Playlist.follower_count
+        )
+    rank = func.ts_rank(model.search_vector, tsquery) * (
+        1 + settings.SEARCH_POPULARITY_WEIGHT * func.ln(1 + popularity)
+    )
+    # Wider than sqlmodel's select is typed for
+    statement = (
+        sa.select(
+            literal(target_type.value).label("type"),
+            model.id,
+            name.label("name"),
+            rank.label("rank"),
+            func.concat_ws(" … ", name, details).label("document"),
+            func.to_jsonb(literal_column(model.__tablename__)).op("-")("search_vector").label("item"),
+        )
+        .where(model.search_vector.op("@@")(tsquery))
+        .order_by(desc("rank"), model.id)
+    )
+    if model in (Album, Playlist):
+        statement = statement.where(col(model.is_public))
+    return statement
+
+
+def _from_json(model: type[Any], item: dict[str, Any]) -> Any:
+    """A detached row from its ``to_jsonb``, which has enums by name"""
+    for table_column in model.__table__.columns:
+        name = table_column.name
+        if isinstance(table_column.type, Enum) and item.get(name) is not None:
+            item[name] = table_column.type.enum_class[item[name]]
+    return model.model_validate(item)
+
+
+# Escaped first in replacements, so entities aren't escaped again
+HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"))
+
+
+def _escape_html(text: Any) -> Any:
+    """SQL expression of ``text`` escaped for HTML"""
+    return reduce(
+        lambda escaped, escape: func.replace(escaped, *escape), HTML_ESCAPES, text
+    )
+
+
+def _search_hits(
+    session: Session, pages: Any, tsquery: Any
+) -> list[tuple[SearchHit, dict[str, Any]]]:
+    """Hits of a page of search rows ranked across types, with highlights"""
+    # Names and lyrics are user text, the <b> around matches must be the only
+    # markup in highlights
+    highlight = func.ts_headline(
+        cast(SEARCH_CONFIG, REGCONFIG),
+        _escape_html(pages.c.document),
+        tsquery,
+        "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=20, MinWords=5",
+    )
+    rows = session.execute(
+        sa.select(pages.c.type, pages.c.id, pages.c.name, pages.c.rank, highlight, pages.c.item)
+        .order_by(desc(pages.c.rank), pages.c.id)
+    )
+    return [
+        (
+            SearchHit(type=type, id=id, name=name, rank=rank, highlight=highlight),
+            item,
+        )
+        for type, id, name, rank, highlight, item in rows
+    ]
+
+
+def search_text(
+    *,
+    session: Session,
+    target_type: TargetType,
+    query: str,
+    match: Literal["words", "phrase", "prefix"] = "words",
+    skip: int = 0,
+    limit: int = 20,
+) -> list[SearchHit]:
+    """
+    Full-text search of songs, albums, artists or public playlists, ranked
+    by how well they match weighted by popularity, with highlighted matches
+    """
+    tsquery = _text_query(query, match)
+    if tsquery is None:
+        return []
+    # Highlights are only computed for the page of results
+    page = _text_search_statement(target_type, tsquery).offset(skip).limit(limit).subquery()
+    return [hit for hit, _ in _search_hits(session, page, tsquery)]
+
+
+def search_all(
+    *,
+    session: Session,
+    query: str,
+    match: Literal["words", "phrase", "prefix"] = "prefix",
+    limit: int = 10,
+) -> list[tuple[SearchHit, Artist | Album | Song | Playlist]]:
+    """
+    The best ``limit`` matches of each of songs, albums, artists and public
+    playlists in one query, ranked across types, each with its row
+    """
+    tsquery = _text_query(query, match)
+    if tsquery is None:
+        return []
+    pages = union_all(*(
+        select(_text_search_statement(target_type, tsquery).limit(limit).subquery())
+        for target_type in (
+            TargetType.ARTIST, TargetType.ALBUM, TargetType.SONG, TargetType.PLAYLIST
+        )
+    )).subquery()
+    models = {
+        TargetType.ARTIST: Artist,
+        TargetType.ALBUM: Album,
+        TargetType.SONG: Song,
+        TargetType.PLAYLIST: Playlist,
+    }
+    return [
+        (hit, _from_json(models[hit.type], item))
+        for hit, item in _search_hits(session, pages, tsquery)
+    ]
@@ -0,0 +1,47 @@
+"""
+Compute the listening reports of a year, e.g. once it is over:
+
+    python app/listening_reports.py 2026 --workers 8
+
+A run that is stopped resumes where it left off, pass --restart to compute
+a year's reports again from scratch.
+"""
+
+import argparse
+import logging
+
+from app.services.listening_reports import generate_listening_reports
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compute the listening reports of a year"
+    )
+    parser.add_argument("year", type=int)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-users", type=int, default=None)
+    parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args()
+
+    progress = generate_listening_reports(
+        args.year,
+        workers=args.workers,
+        chunk_users=args.chunk_users,
+        restart=args.restart,
+    )
+    logger.info(
+        "Computed %d listening reports of %d from %d rows in %.1fs (%.0f users/s, %.0f rows/s)",
+        progress.users,
+        progress.year,
+        progress.rows,
+        progress.elapsed_seconds,
+        progress.users_per_second,
+        progress.rows_per_second,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,29 @@
+import asyncio
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
 import sentry_sdk
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.api.routes.files import PARTIAL_DIR, collect_blob_garbage
 from app.core.config import settings
+from app.core.db import engine
+from app.services.autocomplete import autocomplete
+from app.services.listeners import refresh_monthly_listeners, update_listener_sketches
+from app.services.play_counts import play_counts
+from app.services.play_dedup import get_play_deduplicator
+from app.services.play_history import maintain_play_history, play_history, roll_up_plays
+from app.services.scheduler import run_periodically
+from app.services.transcoding import MediaJobRunner
+from app.services.trending import trending
+from app.services.uploads import sweep_expired_upload_sessions
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,10 +33,140 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+def sweep_upload_sessions() -> None:
+    with Session(engine) as session:
+        sweep_expired_upload_sessions(
+            session,
+            PARTIAL_DIR,
+            timedelta(minutes=settings.UPLOAD_SESSION_COMPLETION_TIMEOUT_MINUTES),
+        )
+
+
+def collect_blobs() -> None:
+    with Session(engine) as session:
+        collect_blob_garbage(session)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    play_history.start()
+    tasks = [
+        asyncio.create_task(
+            run_periodically(
+                settings.UPLOAD_SESSION_SWEEP_INTERVAL_SECONDS,
+                sweep_upload_sessions,
+                "sweep_upload_sessions",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.BLOB_GC_INTERVAL_SECONDS, collect_blobs, "collect_blobs"
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.PLAY_COUNT_FLUSH_INTERVAL_SECONDS,
+                play_counts.flush,
+                "flush_play_counts",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.PLAY_DEDUP_PRUNE_INTERVAL_SECONDS,
+                get_play_deduplicator().prune,
+                "prune_play_dedup_windows",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.PLAY_HISTORY_MAINTENANCE_INTERVAL_SECONDS,
+                maintain_play_history,
+                "maintain_play_history",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.PLAY_ROLLUP_INTERVAL_SECONDS, roll_up_plays, "roll_up_plays"
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.LISTENER_SKETCH_INTERVAL_SECONDS,
+                update_listener_sketches,
+                "update_listener_sketches",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.MONTHLY_LISTENERS_INTERVAL_SECONDS,
+                refresh_monthly_listeners,
+                "refresh_monthly_listeners",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.TRENDING_RELOAD_INTERVAL_SECONDS,
+                trending.reload,
+                "reload_trending",
+                immediately=True,
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.TRENDING_REFRESH_INTERVAL_SECONDS,
+                trending.refresh,
+                "refresh_trending",
+            )
+        ),
+        asyncio.create_task(
+            run_periodically(
+                settings.AUTOCOMPLETE_REBUILD_INTERVAL_SECONDS,
+                autocomplete.rebuild,
+                "rebuild_autocomplete",
+                immediately=True,
+            )
+        ),
+    ]
+    runner = None
+    workers = settings.MEDIA_JOB_WORKERS
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // settings.API_WORKERS)
+    if workers > 0:
+        runner = MediaJobRunner(workers)
+        tasks += [
+            asyncio.create_task(
+                run_periodically(
+                    settings.MEDIA_JOB_POLL_INTERVAL_SECONDS,
+                    runner.dispatch,
+                    "dispatch_media_jobs",
+                )
+            ),
+            asyncio.create_task(
+                run_periodically(
+                    settings.MEDIA_JOB_TIMEOUT_SECONDS / 4,
+                    runner.requeue_stale,
+                    "requeue_stale_media_jobs",
+                )
+            ),
+        ]
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if runner:
+        runner.shutdown()
+    await run_in_threadpool(play_counts.flush)
+    await run_in_threadpool(
+        play_history.stop, settings.PLAY_HISTORY_DRAIN_TIMEOUT_SECONDS
+    )
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
 # Set all CORS enabled origins
@@ -28,6 +177,13 @@ if settings.all_cors_origins:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Loudness and layout of /songs/{song_id}/waveform responses
+        expose_headers=[
+            "X-Waveform-Resolution",
+            "X-Loudness-LUFS",
+            "X-Replay-Gain",
+            "X-Track-Peak",
+        ],
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -8,6 +8,8 @@ from .user import *
 from .music import *
 from .social import *
 from .analytics import *
+from .files import *
+from .media import *
 
 __all__ = [
     # Base models
@@ -59,6 +61,11 @@ __all__ = [
     "PlaylistPublic",
     "PlaylistsPublic",
     "PlaylistSong",
+    "SearchHit",
+    "SearchHitsPublic",
+    "SearchAllPublic",
+    "SuggestionPublic",
+    "SuggestionsPublic",
     
     # Social models
     "Follow",
@@ -70,10 +77,47 @@ __all__ = [
     
     # Analytics models
     "PlayHistory",
+    "PlayHistoryBase",
+    "PlayHistoryPublic",
+    "PlayHistoriesPublic",
+    "PlayHistoryMonthly",
+    "PlayRollupBase",
+    "SongPlaysHourly",
+    "SongPlaysDaily",
+    "ArtistPlaysDaily",
+    "UserPlaysDaily",
+    "RollupWatermark",
+    "ListenerSketch",
+    "ListenersPublic",
+    "PlayDedupWindow",
+    "UserStatsPublic",
+    "ListeningReport",
+    "ListeningReportRun",
+    "ReportEntry",
+    "ListeningReportPublic",
+    "PlaySeriesPoint",
+    "PlaySeriesPublic",
     "SearchHistory", 
     "Recommendation",
     
+    # File storage models
+    "UploadSession",
+    "UploadSessionCreate",
+    "UploadSessionPublic",
+
+    # Media processing models
+    "MediaJob",
+    "MediaJobPublic",
+    "MediaJobsPublic",
+    "Rendition",
+    "RenditionPublic",
+    "AudioMetadata",
+    "AudioMetadataPublic",
+    "AudioAnalysis",
+
     # Enums
     "AlbumType",
     "TargetType",
+    "UploadStatus",
+    "MediaJobStatus",
 ]
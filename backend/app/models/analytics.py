@@ -3,28 +3,205 @@ Analytics and tracking models (PlayHistory, SearchHistory, Recommendations)
 """
 
 import uuid
-from datetime import datetime
-from typing import Optional
+from datetime import date, datetime
+from typing import Any, Optional
 
+from sqlalchemy import JSON, BigInteger, Index, LargeBinary, text
 from sqlmodel import SQLModel, Field, Relationship
 
 from .base import TargetType
 
 
 # Play History
-class PlayHistory(SQLModel, table=True):
-    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    user_id: uuid.UUID = Field(foreign_key="user.id")
+class PlayHistoryBase(SQLModel):
     song_id: uuid.UUID = Field(foreign_key="song.id")
     played_at: datetime = Field(default_factory=datetime.utcnow)
     duration_played_ms: int
     device_type: str | None = Field(default=None)
     skip_reason: str | None = Field(default=None)
+
+
+class PlayHistory(PlayHistoryBase, table=True):
+    # Partitioned by month of played_at (see crud.ensure_play_history_partitions),
+    # so the partition key is part of the primary key
+    __table_args__ = (
+        # A user's history is read newest first, keyed on (played_at, id)
+        Index("ix_playhistory_user_id_played_at", "user_id", "played_at", "id"),
+        Index("ix_playhistory_song_id_played_at", "song_id", "played_at"),
+        Index("ix_playhistory_recorded_at", "recorded_at"),
+        {"postgresql_partition_by": "RANGE (played_at)"},
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    played_at: datetime = Field(default_factory=datetime.utcnow, primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="user.id")
+    # When the play reached the database, set by it so rollups can follow
+    # plays in insertion order whatever their played_at
+    recorded_at: datetime | None = Field(
+        default=None,
+        nullable=False,
+        sa_column_kwargs={"server_default": text("(now() AT TIME ZONE 'utc')")},
+    )
     
     # Relationships
     user: "User" = Relationship(back_populates="play_history")
 
 
+class PlayHistoryPublic(PlayHistoryBase):
+    id: uuid.UUID
+
+
+class PlayHistoriesPublic(SQLModel):
+    data: list[PlayHistoryPublic]
+    count: int
+    # Pass as ``before`` to get the next page, None on the last one
+    next_cursor: str | None = None
+
+
+# Plays per month, user and song, rolled up from play history partitions
+# before they are dropped. Songs and users may have been deleted since.
+class PlayHistoryMonthly(SQLModel, table=True):
+    __table_args__ = (Index("ix_playhistorymonthly_song_id_month", "song_id", "month"),)
+
+    month: date = Field(primary_key=True)
+    user_id: uuid.UUID = Field(primary_key=True)
+    song_id: uuid.UUID = Field(primary_key=True)
+    plays: int
+    skips: int
+    duration_played_ms: int = Field(sa_type=BigInteger)
+
+
+# Play rollups, maintained incrementally from play history by
+# crud.roll_up_recorded_plays
+class PlayRollupBase(SQLModel):
+    plays: int
+    skips: int
+    duration_played_ms: int = Field(sa_type=BigInteger)
+
+
+class SongPlaysHourly(PlayRollupBase, table=True):
+    song_id: uuid.UUID = Field(primary_key=True)
+    hour: datetime = Field(primary_key=True)
+
+
+class SongPlaysDaily(PlayRollupBase, table=True):
+    # Charts rank all songs over a range of days
+    __table_args__ = (Index("ix_songplaysdaily_day", "day"),)
+
+    song_id: uuid.UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+
+
+class ArtistPlaysDaily(PlayRollupBase, table=True):
+    __table_args__ = (Index("ix_artistplaysdaily_day", "day"),)
+
+    artist_id: uuid.UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+
+
+class UserPlaysDaily(PlayRollupBase, table=True):
+    user_id: uuid.UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+
+
+# How far each incremental job has processed its source, e.g. play rollups
+# up to a recorded_at of play history
+class RollupWatermark(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=100)
+    processed_until: datetime
+
+
+# Distinct listeners of a song or artist per day as a HyperLogLog sketch,
+# see app.services.hll
+class ListenerSketch(SQLModel, table=True):
+    target_type: TargetType = Field(primary_key=True)
+    target_id: uuid.UUID = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    sketch: bytes = Field(sa_type=LargeBinary)
+
+
+# Open repeat play windows when they are shared between processes, see
+# app.services.play_dedup. Unlogged, losing them in a crash is harmless.
+class PlayDedupWindow(SQLModel, table=True):
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    user_id: uuid.UUID = Field(primary_key=True)
+    song_id: uuid.UUID = Field(primary_key=True)
+    expires_at: datetime = Field(index=True)
+
+
+class ListenersPublic(SQLModel):
+    listeners: int
+    days: int
+    # Standard error of ``listeners`` relative to the true count
+    relative_error: float
+
+
+class UserStatsPublic(SQLModel):
+    likes_count: int
+    library_count: int
+    following_count: int
+    followers_count: int
+    playlists_count: int
+    total_plays: int
+    # In milliseconds
+    total_listening_time: int
+
+
+# A user's listening in a year, computed offline by the listening report
+# job, see app.services.listening_reports. Top entries are ReportEntry dicts.
+class ListeningReport(SQLModel, table=True):
+    user_id: uuid.UUID = Field(primary_key=True)
+    year: int = Field(primary_key=True)
+    total_plays: int
+    minutes_listened: int
+    distinct_songs: int
+    distinct_artists: int
+    top_songs: list[dict[str, Any]] = Field(default_factory=list, sa_type=JSON)
+    top_artists: list[dict[str, Any]] = Field(default_factory=list, sa_type=JSON)
+    top_genres: list[dict[str, Any]] = Field(default_factory=list, sa_type=JSON)
+    generated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# How far the listening report job got through a year's users, a rerun
+# resumes after the last user whose report was written
+class ListeningReportRun(SQLModel, table=True):
+    year: int = Field(primary_key=True)
+    last_user_id: uuid.UUID | None = Field(default=None)
+    users: int = Field(default=0)
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: datetime | None = Field(default=None)
+
+
+class ReportEntry(SQLModel):
+    id: uuid.UUID
+    name: str
+    plays: int
+    minutes: int
+
+
+class ListeningReportPublic(SQLModel):
+    year: int
+    total_plays: int
+    minutes_listened: int
+    distinct_songs: int
+    distinct_artists: int
+    top_songs: list[ReportEntry]
+    top_artists: list[ReportEntry]
+    top_genres: list[ReportEntry]
+    generated_at: datetime
+
+
+class PlaySeriesPoint(PlayRollupBase):
+    # Start of the hour or day
+    period_start: datetime
+
+
+class PlaySeriesPublic(SQLModel):
+    data: list[PlaySeriesPoint]
+    count: int
+
+
 # Search History
 class SearchHistory(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
@@ -25,6 +25,20 @@ class TargetType(str, Enum):
     USER = "user"
 
 
+class UploadStatus(str, Enum):
+    ACTIVE = "active"
+    # Being assembled into a file by one completion request
+    COMPLETING = "completing"
+    COMPLETED = "completed"
+
+
+class MediaJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 # Generic message
 class Message(SQLModel):
     message: str
@@ -0,0 +1,45 @@
+"""
+File storage models (resumable UploadSession)
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import BigInteger, LargeBinary
+from sqlmodel import Field, SQLModel
+
+from .base import UploadStatus
+
+
+# Resumable upload sessions
+class UploadSessionBase(SQLModel):
+    filename: str = Field(max_length=255)
+    content_type: str = Field(max_length=100)
+    total_size: int = Field(gt=0, sa_type=BigInteger)
+
+
+class UploadSession(UploadSessionBase, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="user.id", ondelete="CASCADE")
+    chunk_size: int
+    # Bitmap of received chunks, bit i set once chunk i is on disk
+    received_chunks: bytes = Field(default=b"", sa_type=LargeBinary)
+    status: UploadStatus = Field(default=UploadStatus.ACTIVE)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    # When the session went COMPLETING, the sweeper reopens stalled ones
+    completion_started_at: datetime | None = None
+    expires_at: datetime = Field(index=True)
+
+
+class UploadSessionCreate(UploadSessionBase):
+    pass
+
+
+class UploadSessionPublic(UploadSessionBase):
+    id: uuid.UUID
+    chunk_size: int
+    status: UploadStatus
+    created_at: datetime
+    expires_at: datetime
+    received_bytes: int
+    missing_offsets: list[int]
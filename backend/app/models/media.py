@@ -0,0 +1,102 @@
+"""
+Media processing models (MediaJob, Rendition, AudioMetadata, AudioAnalysis)
+"""
+
+import uuid
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, LargeBinary, Text
+from sqlmodel import Field, SQLModel
+
+from .base import MediaJobStatus
+
+
+# Background processing of an uploaded song blob
+class MediaJobBase(SQLModel):
+    source_key: str = Field(max_length=500)
+    source_digest: str = Field(max_length=64, index=True)
+
+
+class MediaJob(MediaJobBase, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    status: MediaJobStatus = Field(default=MediaJobStatus.PENDING, index=True)
+    tasks_total: int = Field(default=0)
+    tasks_done: int = Field(default=0)
+    tasks_failed: int = Field(default=0)
+    error: str | None = Field(default=None, sa_type=Text)
+    attempts: int = Field(default=0)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+
+class MediaJobPublic(MediaJobBase):
+    id: uuid.UUID
+    status: MediaJobStatus
+    tasks_total: int
+    tasks_done: int
+    tasks_failed: int
+    progress: float
+    error: str | None
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+
+
+class MediaJobsPublic(SQLModel):
+    data: list[MediaJobPublic]
+    count: int
+
+
+# Transcoded copy of a song blob, shared by every song using that blob
+class Rendition(SQLModel, table=True):
+    source_digest: str = Field(max_length=64, primary_key=True)
+    bitrate_kbps: int = Field(primary_key=True)
+    key: str = Field(max_length=500)
+    content_type: str = Field(max_length=100)
+    size: int = Field(sa_type=BigInteger)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RenditionPublic(SQLModel):
+    bitrate_kbps: int
+    content_type: str
+    size: int
+    url: str
+
+
+# Audio properties probed from a song blob, shared by every song using it
+class AudioMetadataBase(SQLModel):
+    duration_ms: int
+    bitrate_kbps: int | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    codec: str | None = Field(default=None, max_length=50)
+    format_name: str | None = Field(default=None, max_length=100)
+    tags: dict[str, str] = Field(default_factory=dict, sa_type=JSON)
+    cover_filename: str | None = Field(default=None, max_length=255)
+
+
+class AudioMetadata(AudioMetadataBase, table=True):
+    source_digest: str = Field(max_length=64, primary_key=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class AudioMetadataPublic(AudioMetadataBase):
+    source_digest: str
+    cover_url: str | None = None
+
+
+# Waveform peaks and loudness computed from a song blob
+class AudioAnalysis(SQLModel, table=True):
+    source_digest: str = Field(max_length=64, primary_key=True)
+    loudness_lufs: float | None = None
+    # ReplayGain style gain to play the song at the reference loudness
+    gain_db: float | None = None
+    peak: float
+    # Bucket counts of the peak arrays, which are stored one byte per bucket
+    # and concatenated in this order
+    resolutions: list[int] = Field(default_factory=list, sa_type=JSON)
+    peaks: bytes = Field(sa_type=LargeBinary)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
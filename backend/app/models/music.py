@@ -6,15 +6,46 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Column, Computed, Index, String
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import SQLModel, Field, Relationship
 from typing import TYPE_CHECKING
 
-from .base import AlbumType
+from app.services.normalize import SEPARATORS
+
+from .base import AlbumType, TargetType
 
 if TYPE_CHECKING:
     from .user import User
 
 
+def _trigram_index(name: str, column: str) -> Index:
+    """GIN index of ``column``'s trigrams, serves substring and fuzzy search"""
+    return Index(
+        name, column, postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"}
+    )
+
+
+def _search_key_column(name: str) -> Column[str]:
+    """
+    The name column ``name`` without case, accents or punctuation, computed
+    on write for any writer, as services.normalize.search_key does
+    """
+    return Column(
+        "search_key",
+        String,
+        Computed(
+            f"btrim(regexp_replace(fold_accents(lower({name})), '{SEPARATORS}', ' ', 'g'))",
+            persisted=True,
+        ),
+    )
+
+
+def _search_vector_index(table: str) -> Index:
+    """GIN index of a table's full-text search vector"""
+    return Index(f"ix_{table}_search_vector", "search_vector", postgresql_using="gin")
+
+
 # Genre models
 class GenreBase(SQLModel):
     name: str = Field(unique=True, max_length=100)
@@ -62,9 +93,18 @@ class ArtistBase(SQLModel):
 
 
 class Artist(ArtistBase, table=True):
+    __table_args__ = (
+        _trigram_index("ix_artist_search_key_trgm", "search_key"),
+        _search_vector_index("artist"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: Optional[uuid.UUID] = Field(default=None, foreign_key="user.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Maintained by crud, see crud.music._refresh_search_vectors
+    search_vector: str | None = Field(default=None, sa_type=TSVECTOR)
+    # Generated by the database, see _search_key_column
+    search_key: str | None = Field(default=None, sa_column=_search_key_column("stage_name"))
     
     # Relationships
     user: Optional["User"] = Relationship(back_populates="artist_profile")
@@ -104,10 +144,19 @@ class AlbumBase(SQLModel):
 
 
 class Album(AlbumBase, table=True):
+    __table_args__ = (
+        _trigram_index("ix_album_search_key_trgm", "search_key"),
+        _search_vector_index("album"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     artist_id: uuid.UUID = Field(foreign_key="artist.id")
     genre_id: uuid.UUID | None = Field(default=None, foreign_key="genre.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Maintained by crud, see crud.music._refresh_search_vectors
+    search_vector: str | None = Field(default=None, sa_type=TSVECTOR)
+    # Generated by the database, see _search_key_column
+    search_key: str | None = Field(default=None, sa_column=_search_key_column("title"))
     
     # Relationships
     artist: Artist = Relationship(back_populates="albums")
@@ -149,11 +198,20 @@ class SongBase(SQLModel):
 
 
 class Song(SongBase, table=True):
+    __table_args__ = (
+        _trigram_index("ix_song_search_key_trgm", "search_key"),
+        _search_vector_index("song"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     album_id: uuid.UUID = Field(foreign_key="album.id")
     artist_id: uuid.UUID = Field(foreign_key="artist.id")
     genre_id: uuid.UUID | None = Field(default=None, foreign_key="genre.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Maintained by crud, see crud.music._refresh_search_vectors
+    search_vector: str | None = Field(default=None, sa_type=TSVECTOR)
+    # Generated by the database, see _search_key_column
+    search_key: str | None = Field(default=None, sa_column=_search_key_column("title"))
     
     # Relationships
     album: Album = Relationship(back_populates="songs")
@@ -163,6 +221,8 @@ class Song(SongBase, table=True):
 
 
 class SongCreate(SongBase):
+    # Taken from the uploaded file when omitted
+    duration_ms: int | None = Field(default=None)  # type: ignore[assignment]
     album_id: uuid.UUID
     artist_id: uuid.UUID
 
@@ -197,10 +257,19 @@ class PlaylistBase(SQLModel):
 
 
 class Playlist(PlaylistBase, table=True):
+    __table_args__ = (
+        _trigram_index("ix_playlist_search_key_trgm", "search_key"),
+        _search_vector_index("playlist"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    owner_id: uuid.UUID = Field(foreign_key="user.id")
+    owner_id: uuid.UUID = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    # Maintained by crud, see crud.music._refresh_search_vectors
+    search_vector: str | None = Field(default=None, sa_type=TSVECTOR)
+    # Generated by the database, see _search_key_column
+    search_key: str | None = Field(default=None, sa_column=_search_key_column("name"))
     
     # Relationships
     owner: "User" = Relationship(back_populates="playlists")
@@ -239,3 +308,40 @@ class PlaylistSong(SQLModel, table=True):
     # Relationships
     playlist: Playlist = Relationship(back_populates="playlist_songs")
     song: Song = Relationship(back_populates="playlist_songs")
+
+
+# Full-text search results
+class SearchHit(SQLModel):
+    type: TargetType
+    id: uuid.UUID
+    name: str
+    # Text match weighted by popularity, comparable across types
+    rank: float
+    # Matching fragments of the name, lyrics or description as HTML,
+    # matches in <b>
+    highlight: str
+
+
+class SearchHitsPublic(SQLModel):
+    data: list[SearchHit]
+    count: int
+
+
+class SuggestionPublic(SQLModel):
+    type: TargetType
+    id: uuid.UUID
+    name: str
+
+
+class SuggestionsPublic(SQLModel):
+    data: list[SuggestionPublic]
+    count: int
+
+
+class SearchAllPublic(SQLModel):
+    # Matches of every type by rank, the first one is the top result
+    hits: list[SearchHit]
+    artists: ArtistsPublic
+    albums: AlbumsPublic
+    songs: SongsPublic
+    playlists: PlaylistsPublic
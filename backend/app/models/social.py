@@ -16,13 +16,13 @@ if TYPE_CHECKING:
 
 # Follow System
 class FollowBase(SQLModel):
-    following_id: uuid.UUID
+    following_id: uuid.UUID = Field(index=True)
     following_type: TargetType
 
 
 class Follow(FollowBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    follower_id: uuid.UUID = Field(foreign_key="user.id")
+    follower_id: uuid.UUID = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
@@ -38,7 +38,7 @@ class LikeBase(SQLModel):
 
 class Like(LikeBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    user_id: uuid.UUID = Field(foreign_key="user.id")
+    user_id: uuid.UUID = Field(foreign_key="user.id", index=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationships
@@ -57,7 +57,7 @@ class UserLibraryBase(SQLModel):
 
 class UserLibrary(UserLibraryBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    user_id: uuid.UUID = Field(foreign_key="user.id")
+    user_id: uuid.UUID = Field(foreign_key="user.id", index=True)
     saved_at: datetime = Field(default_factory=datetime.utcnow)
     
     # Relationships
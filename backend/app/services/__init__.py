@@ -0,0 +1,3 @@
+"""
+Service layer for Music App (media delivery, background pipelines)
+"""
@@ -0,0 +1,204 @@
+"""
+Waveform and loudness analysis of uploaded songs.
+
+The song is decoded once to 48 kHz float PCM and scanned in fixed-size
+chunks, so memory stays bounded for long files. Each chunk yields
+
+* peaks over 10 ms windows, later reduced to the configured waveform
+  resolutions and quantised to one byte per bucket, and
+* K-weighted power of 100 ms blocks, from which the integrated loudness is
+  gated as in ITU-R BS.1770 and turned into a ReplayGain 2.0 style gain.
+
+K-weighting is applied in the frequency domain per 100 ms block rather than
+as a running IIR filter, which keeps the scan vectorised and stays within a
+fraction of a dB of the reference implementation for music.
+"""
+
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import numpy.typing as npt
+
+from app.core.config import settings
+from app.services.ffmpeg import run_ffmpeg
+from app.services.storage import get_storage
+
+SAMPLE_RATE = 48000
+CHANNELS = 2
+PEAK_WINDOW = SAMPLE_RATE // 100
+LOUDNESS_BLOCK = SAMPLE_RATE // 10
+# Loudness blocks scanned at once, 10 s of audio
+CHUNK_BLOCKS = 100
+
+# Gating blocks are 400 ms long and overlap by 75%, i.e. 4 loudness blocks
+GATING_BLOCKS = 4
+ABSOLUTE_GATE_LUFS = -70.0
+RELATIVE_GATE_LU = -10.0
+REFERENCE_LOUDNESS_LUFS = -18.0
+
+# BS.1770 K-weighting biquads at 48 kHz (high shelf, then high-pass)
+K_WEIGHTING = [
+    (
+        [1.53512485958697, -2.69169618940638, 1.19839281085285],
+        [1.0, -1.69065929318241, 0.73248077421585],
+    ),
+    ([1.0, -2.0, 1.0], [1.0, -1.99004745483398, 0.99007225036621]),
+]
+
+Samples = npt.NDArray[np.float32]
+
+
+@dataclass
+class WaveformAnalysis:
+    # None for silent songs
+    loudness_lufs: float | None
+    gain_db: float | None
+    peak: float
+    # Bucket counts, short songs may have fewer than configured
+    resolutions: list[int]
+    # One byte per bucket for every resolution, concatenated in order
+    peaks: bytes
+
+
+def _k_weighting_power(block_size: int) -> npt.NDArray[np.float64]:
+    """
+    Squared K-weighting response at the rfft bins of ``block_size`` samples,
+    scaled so that weighted bin powers sum to the block's mean square.
+    """
+    z = np.exp(-2j * np.pi * np.fft.rfftfreq(block_size))
+    response = np.ones_like(z)
+    for b, a in K_WEIGHTING:
+        response *= np.polyval(b[::-1], z) / np.polyval(a[::-1], z)
+    weights: npt.NDArray[np.float64] = np.abs(response) ** 2
+    # Bins other than DC and Nyquist stand for two conjugate frequencies
+    weights[1:-1] *= 2
+    return weights / block_size**2
+
+
+def _to_lufs(power: npt.ArrayLike) -> npt.NDArray[np.float64]:
+    with np.errstate(divide="ignore"):
+        return -0.691 + 10 * np.log10(power)
+
+
+def integrated_loudness(block_power: npt.NDArray[np.float64]) -> float | None:
+    """Gated loudness of a song from the K-weighted power of its 100 ms blocks"""
+    if len(block_power) < GATING_BLOCKS:
+        return None
+    gating_power = np.convolve(
+        block_power, np.ones(GATING_BLOCKS) / GATING_BLOCKS, "valid"
+    )
+    gated = gating_power[_to_lufs(gating_power) > ABSOLUTE_GATE_LUFS]
+    if not len(gated):
+        return None
+    threshold = _to_lufs(gated.mean()) + RELATIVE_GATE_LU
+    gated = gated[_to_lufs(gated) > threshold]
+    return float(_to_lufs(gated.mean()))
+
+
+def reduce_peaks(peaks: Samples, resolution: int) -> npt.NDArray[np.uint8]:
+    """Downsample at least ``resolution`` peaks to that many one-byte buckets"""
+    edges = np.linspace(0, len(peaks), resolution + 1).astype(np.intp)
+    reduced = np.maximum.reduceat(peaks, edges[:-1])
+    return np.round(np.clip(reduced, 0.0, 1.0) * 255).astype(np.uint8)
+
+
+def analyse_samples(samples: Samples, resolutions: list[int]) -> WaveformAnalysis:
+    """Analyse 48 kHz PCM of shape (frames, channels), e.g. a memory map"""
+    weights = _k_weighting_power(LOUDNESS_BLOCK)
+    chunk_frames = CHUNK_BLOCKS * LOUDNESS_BLOCK
+    peaks: list[Samples] = []
+    block_power: list[npt.NDArray[np.float64]] = []
+    for start in range(0, len(samples), chunk_frames):
+        chunk = np.asarray(samples[start : start + chunk_frames], dtype=np.float32)
+        # Pad the last chunk to whole peak windows, silence doesn't raise a peak
+        padded = np.pad(chunk, ((0, -len(chunk) % PEAK_WINDOW), (0, 0)))
+        peaks.append(np.abs(padded).max(axis=1).reshape(-1, PEAK_WINDOW).max(axis=1))
+
+        # Only complete blocks count towards loudness
+        blocks = len(chunk) // LOUDNESS_BLOCK
+        framed = chunk[: blocks * LOUDNESS_BLOCK].reshape(
+            blocks, LOUDNESS_BLOCK, chunk.shape[1]
+        )
+        spectra = np.fft.rfft(framed, axis=1)
+        power = (np.abs(spectra) ** 2 * weights[:, None]).sum(axis=1)
+        block_power.append(power.sum(axis=1))
+
+    all_peaks = np.concatenate(peaks) if peaks else np.zeros(0, dtype=np.float32)
+    resolutions = sorted(
+        {min(resolution, len(all_peaks)) for resolution in resolutions} - {0}
+    )
+    loudness = integrated_loudness(
+        np.concatenate(block_power) if block_power else np.zeros(0)
+    )
+    return WaveformAnalysis(
+        loudness_lufs=round(loudness, 2) if loudness is not None else None,
+        gain_db=round(REFERENCE_LOUDNESS_LUFS - loudness, 2)
+        if loudness is not None
+        else None,
+        peak=float(all_peaks.max()) if len(all_peaks) else 0.0,
+        resolutions=resolutions,
+        peaks=b"".join(
+            reduce_peaks(all_peaks, resolution).tobytes() for resolution in resolutions
+        ),
+    )
+
+
+def split_peaks(peaks: bytes, resolutions: list[int]) -> dict[int, bytes]:
+    """Peaks of each resolution from their concatenated form"""
+    offsets = np.cumsum([0, *resolutions])
+    return {
+        resolution: peaks[offsets[i] : offsets[i + 1]]
+        for i, resolution in enumerate(resolutions)
+    }
+
+
+def select_resolution(resolutions: list[int], requested: int | None) -> int | None:
+    """
+    The smallest stored resolution covering ``requested``, else the largest.
+    Without a request the largest is picked.
+    """
+    if not resolutions:
+        return None
+    covering = [
+        resolution
+        for resolution in resolutions
+        if requested and resolution >= requested
+    ]
+    return min(covering) if covering else max(resolutions)
+
+
+# Runs in media job pool processes
+def analyse_song(source_key: str) -> WaveformAnalysis:
+    """Decode a song blob and compute its waveform peaks and loudness"""
+    with (
+        get_storage().open_local(source_key) as source,
+        tempfile.TemporaryDirectory() as work,
+    ):
+        pcm = Path(work) / "audio.f32"
+        run_ffmpeg(
+            "-i",
+            source,
+            "-map",
+            "0:a:0",
+            "-vn",
+            # ffmpeg spreads mono over both channels at -3 dB, which keeps
+            # its loudness as BS.1770 measures mono
+            "-ac",
+            str(CHANNELS),
+            "-ar",
+            str(SAMPLE_RATE),
+            "-f",
+            "f32le",
+            "-c:a",
+            "pcm_f32le",
+            pcm,
+        )
+        resolutions = settings.WAVEFORM_RESOLUTIONS
+        if not pcm.stat().st_size:
+            return analyse_samples(
+                np.zeros((0, CHANNELS), dtype=np.float32), resolutions
+            )
+        samples = np.memmap(pcm, dtype="<f4", mode="r").reshape(-1, CHANNELS)
+        return analyse_samples(samples, resolutions)
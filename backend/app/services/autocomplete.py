@@ -0,0 +1,254 @@
+"""
+Search-as-you-type suggestions from an in-process index of the catalog.
+
+The search keys of the names of artists, songs, public albums and public
+playlists are kept sorted from each of their words on, so "Sơn Tùng M-TP"
+is found typing "tung" or "m tp". A typed prefix is a range of that array,
+found by bisection, and a max tree over the popularity of the entries in
+array order yields the range's most popular names first without looking
+at the rest of it. Each type has its own index, so suggestions of one type
+don't look at the names of the others.
+
+The index is built from a streamed catalog query at startup and rebuilt on
+an interval, which picks up new popularity and other processes' changes.
+Changes made through this process in between are kept as a small set of
+overrides that queries merge in.
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+import time
+import uuid
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.models import Album, Artist, Playlist, Song, TargetType
+from app.services.normalize import search_key
+
+logger = logging.getLogger(__name__)
+
+# Names are found from at most this many of their words
+MAX_WORDS = 8
+
+Item = tuple[TargetType, uuid.UUID]
+CatalogRow = tuple[TargetType, uuid.UUID, str, int]
+
+SUGGESTED_TYPES = (
+    TargetType.ARTIST,
+    TargetType.ALBUM,
+    TargetType.SONG,
+    TargetType.PLAYLIST,
+)
+
+
+def _keys(name: str) -> list[str]:
+    """The name's search key from each of its words on"""
+    words = search_key(name).split(" ")
+    return [" ".join(words[i:]) for i in range(min(len(words), MAX_WORDS)) if words[i]]
+
+
+@dataclass(frozen=True, slots=True)
+class Suggestion:
+    type: TargetType
+    id: uuid.UUID
+    name: str
+    popularity: int
+
+
+class _Index:
+    """Sorted keys of a fixed set of suggestions and a max tree over them"""
+
+    def __init__(self, suggestions: Iterable[Suggestion]) -> None:
+        self.suggestions = list(suggestions)
+        # Album popularity comes from their songs, it is kept when they change
+        self.album_popularity = {
+            suggestion.id: suggestion.popularity
+            for suggestion in self.suggestions
+            if suggestion.type == TargetType.ALBUM
+        }
+        keyed = sorted(
+            (key, position)
+            for position, suggestion in enumerate(self.suggestions)
+            for key in _keys(suggestion.name)
+        )
+        self.keys = [key for key, _ in keyed]
+        self.refs = array("l", (position for _, position in keyed))
+        self.size = 1
+        while self.size < len(keyed):
+            self.size *= 2
+        # Node n covers nodes 2n and 2n + 1, leaves start at size
+        self.tree = array("d", [-1.0]) * (2 * self.size)
+        for leaf, position in enumerate(self.refs):
+            self.tree[self.size + leaf] = self.suggestions[position].popularity
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def __len__(self) -> int:
+        return len(self.suggestions)
+
+    def best(self, prefix: str) -> Iterator[Suggestion]:
+        """Suggestions with a key starting with ``prefix``, most popular first"""
+        low = bisect.bisect_left(self.keys, prefix) + self.size
+        high = bisect.bisect_left(self.keys, prefix + "\U0010ffff") + self.size
+        heap: list[tuple[float, int]] = []
+        # The nodes that exactly cover the range
+        while low < high:
+            if low & 1:
+                heap.append((-self.tree[low], low))
+                low += 1
+            if high & 1:
+                high -= 1
+                heap.append((-self.tree[high], high))
+            low //= 2
+            high //= 2
+        heapq.heapify(heap)
+        while heap:
+            _, node = heapq.heappop(heap)
+            if node >= self.size:
+                yield self.suggestions[self.refs[node - self.size]]
+            else:
+                heapq.heappush(heap, (-self.tree[2 * node], 2 * node))
+                heapq.heappush(heap, (-self.tree[2 * node + 1], 2 * node + 1))
+
+
+def _load_catalog() -> Iterator[CatalogRow]:
+    with Session(engine) as session:
+        yield from crud.stream_catalog_names(session=session)
+
+
+class Autocomplete:
+    """Most popular catalog names starting with what is typed"""
+
+    def __init__(
+        self, load: Callable[[], Iterable[CatalogRow]] = _load_catalog
+    ) -> None:
+        self.load = load
+        self.lock = threading.Lock()
+        self.indexes = {target_type: _Index([]) for target_type in SUGGESTED_TYPES}
+        # Suggestions changed since the index was built, None when removed.
+        # Replaced rather than changed so queries can read it without locking.
+        self.changes: dict[Item, Suggestion | None] = {}
+        # Changes made while a rebuild is loading, kept over the new index
+        self.changes_while_loading: dict[Item, Suggestion | None] | None = None
+
+    def _change(self, item: Item, suggestion: Suggestion | None) -> None:
+        with self.lock:
+            self.changes = {**self.changes, item: suggestion}
+            if self.changes_while_loading is not None:
+                self.changes_while_loading[item] = suggestion
+
+    def put(self, row: Artist | Album | Song | Playlist) -> None:
+        """Add or update the suggestion of a catalog row"""
+        if isinstance(row, Artist):
+            item = (TargetType.ARTIST, row.id)
+            name, popularity = row.stage_name, row.monthly_listeners
+        elif isinstance(row, Song):
+            item = (TargetType.SONG, row.id)
+            name, popularity = row.title, row.play_count
+        elif isinstance(row, Album):
+            item = (TargetType.ALBUM, row.id)
+            current = self.changes.get(item)
+            name, popularity = (
+                row.title,
+                (
+                    current.popularity
+                    if current
+                    else self.indexes[TargetType.ALBUM].album_popularity.get(row.id, 0)
+                ),
+            )
+        else:
+            item = (TargetType.PLAYLIST, row.id)
+            name, popularity = row.name, row.follower_count
+        if isinstance(row, Album | Playlist) and not row.is_public:
+            self._change(item, None)
+        else:
+            self._change(item, Suggestion(*item, name=name, popularity=popularity))
+
+    def remove(self, target_type: TargetType, item_id: uuid.UUID) -> None:
+        self._change((target_type, item_id), None)
+
+    def rebuild(self) -> None:
+        """Build the index again from the catalog"""
+        started = time.monotonic()
+        with self.lock:
+            self.changes_while_loading = {}
+        try:
+            suggestions: dict[TargetType, list[Suggestion]] = {
+                target_type: [] for target_type in SUGGESTED_TYPES
+            }
+            for target_type, item_id, name, popularity in self.load():
+                suggestions[target_type].append(
+                    Suggestion(target_type, item_id, name, popularity)
+                )
+            indexes = {
+                target_type: _Index(of_type)
+                for target_type, of_type in suggestions.items()
+            }
+        except Exception:
+            with self.lock:
+                self.changes_while_loading = None
+            raise
+        with self.lock:
+            self.indexes = indexes
+            self.changes, self.changes_while_loading = self.changes_while_loading, None
+        logger.info(
+            "Built autocomplete index of %d names in %.1fs",
+            sum(len(index) for index in indexes.values()),
+            time.monotonic() - started,
+        )
+
+    def suggest(
+        self, query: str, limit: int = 10, types: Iterable[TargetType] | None = None
+    ) -> list[Suggestion]:
+        """The ``limit`` most popular suggestions matching ``query`` as typed"""
+        prefix = search_key(query)
+        if not prefix or limit <= 0:
+            return []
+        indexes, changes = self.indexes, self.changes
+        wanted = set(SUGGESTED_TYPES if types is None else types)
+        changed = sorted(
+            (
+                suggestion
+                for suggestion in changes.values()
+                if suggestion is not None
+                and suggestion.type in wanted
+                and any(key.startswith(prefix) for key in _keys(suggestion.name))
+            ),
+            key=lambda suggestion: -suggestion.popularity,
+        )
+        indexed = (
+            suggestion
+            for suggestion in heapq.merge(
+                *(
+                    index.best(prefix)
+                    for target_type, index in indexes.items()
+                    if target_type in wanted
+                ),
+                key=lambda suggestion: -suggestion.popularity,
+            )
+            if (suggestion.type, suggestion.id) not in changes
+        )
+        suggestions: list[Suggestion] = []
+        seen: set[Item] = set()
+        for suggestion in heapq.merge(
+            indexed, changed, key=lambda suggestion: -suggestion.popularity
+        ):
+            item = (suggestion.type, suggestion.id)
+            # Names are indexed once per word, so they can come up again
+            if item in seen:
+                continue
+            seen.add(item)
+            suggestions.append(suggestion)
+            if len(suggestions) == limit:
+                break
+        return suggestions
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,162 @@
+"""
+Content-addressed blob layout for uploaded files.
+
+A blob is named after the SHA-256 of its content plus the original
+extension and stored under two levels of fan-out prefixes, e.g.
+``songs/ab/cd/abcd...ef.mp3``. Identical uploads therefore share one object
+and the name doubles as a strong, immutable validator.
+"""
+
+import logging
+import re
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+
+from app.services.storage import ObjectInfo, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Content-addressed responses never change, so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+SONGS_PREFIX = "songs"
+COVERS_PREFIX = "covers"
+
+
+@dataclass
+class GarbageCollection:
+    scanned: int = 0
+    deleted: int = 0
+    freed_bytes: int = 0
+
+
+def blob_digest(filename: str) -> str | None:
+    """SHA-256 digest encoded in a blob filename, ``None`` for legacy names"""
+    stem = filename.split(".", 1)[0]
+    return stem if DIGEST_PATTERN.match(stem) else None
+
+
+def blob_filename(sha256: str, suffix: str) -> str:
+    return f"{sha256}{suffix.lower()}"
+
+
+def blob_key(prefix: str, filename: str) -> str:
+    """
+    Storage key of ``filename`` under ``prefix``. Files uploaded before
+    content addressing keep their flat legacy location.
+    """
+    if (digest := blob_digest(filename)) is None:
+        return f"{prefix}/{filename}"
+    return f"{prefix}/{digest[:2]}/{digest[2:4]}/{filename}"
+
+
+def commit_blob(
+    storage: StorageBackend,
+    tmp_path: Path,
+    prefix: str,
+    filename: str,
+    *,
+    content_type: str | None = None,
+) -> tuple[str, bool]:
+    """
+    Store a fully written temp file at its content address. If the blob
+    already exists the temp file is dropped and the existing blob is touched
+    so garbage collection treats it as freshly uploaded.
+
+    Returns the blob key and whether it was a duplicate.
+    """
+    key = blob_key(prefix, filename)
+    if storage.exists(key):
+        tmp_path.unlink(missing_ok=True)
+        storage.touch(key)
+        return key, True
+    storage.put_file(key, tmp_path, content_type=content_type)
+    return key, False
+
+
+def iter_blobs(storage: StorageBackend, prefix: str) -> Iterator[ObjectInfo]:
+    """All content-addressed blobs under ``prefix``"""
+    for info in storage.list(f"{prefix}/"):
+        filename = info.key.rsplit("/", 1)[-1]
+        if blob_digest(filename) is not None and info.key == blob_key(prefix, filename):
+            yield info
+
+
+def collect_garbage(
+    storage: StorageBackend, prefix: str, referenced: set[str], *, grace: timedelta
+) -> GarbageCollection:
+    """
+    Delete blobs whose digest is not in ``referenced``. Blobs modified within
+    ``grace`` are kept, they may belong to an upload whose Song has not been
+    created yet.
+    """
+    result = GarbageCollection()
+    cutoff = time.time() - grace.total_seconds()
+    for info in list(iter_blobs(storage, prefix)):
+        result.scanned += 1
+        if blob_digest(info.key.rsplit("/", 1)[-1]) in referenced:
+            continue
+        if info.modified > cutoff:
+            continue
+        storage.delete(info.key)
+        result.deleted += 1
+        result.freed_bytes += info.size
+    if result.deleted:
+        logger.info(
+            "Deleted %d unreferenced blobs from %s, freed %d bytes",
+            result.deleted,
+            prefix,
+            result.freed_bytes,
+        )
+    return result
+
+
+def collect_derived_garbage(
+    storage: StorageBackend,
+    prefix: str,
+    referenced: set[str],
+    *,
+    grace: timedelta,
+    marker: str | None = None,
+    on_delete: Callable[[str], None] | None = None,
+) -> GarbageCollection:
+    """
+    Delete objects derived from song blobs, stored as ``prefix/<digest>/...``,
+    whose source digest is not in ``referenced``. ``marker`` names the object
+    that flags a complete set and is deleted first, ``on_delete`` is called
+    with each digest whose objects were deleted.
+    """
+    derived: defaultdict[str, list[ObjectInfo]] = defaultdict(list)
+    for info in storage.list(f"{prefix}/"):
+        digest = info.key.split("/")[1]
+        if DIGEST_PATTERN.match(digest):
+            derived[digest].append(info)
+
+    result = GarbageCollection()
+    cutoff = time.time() - grace.total_seconds()
+    for digest, objects in derived.items():
+        result.scanned += 1
+        if digest in referenced or max(info.modified for info in objects) > cutoff:
+            continue
+        if on_delete:
+            on_delete(digest)
+        # So a half-deleted set is never mistaken for a complete one
+        objects.sort(key=lambda info: info.key.rsplit("/", 1)[-1] != marker)
+        for info in objects:
+            storage.delete(info.key)
+            result.freed_bytes += info.size
+        result.deleted += 1
+    if result.deleted:
+        logger.info(
+            "Deleted %d unreferenced %s sets, freed %d bytes",
+            result.deleted,
+            prefix,
+            result.freed_bytes,
+        )
+    return result
@@ -0,0 +1,75 @@
+"""
+Thin wrapper around the ffmpeg and ffprobe command lines used by the media
+pipeline
+"""
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any
+
+from app.core.config import settings
+
+
+class FFmpegError(Exception):
+    """ffmpeg is missing or failed to process a file"""
+
+
+def find_ffmpeg() -> str | None:
+    """Path of the configured ffmpeg binary, ``None`` if it isn't installed"""
+    return shutil.which(settings.FFMPEG_BINARY)
+
+
+def find_ffprobe() -> str | None:
+    """Path of the configured ffprobe binary, ``None`` if it isn't installed"""
+    return shutil.which(settings.FFPROBE_BINARY)
+
+
+def _run(name: str, binary: str | None, args: list[str]) -> bytes:
+    if binary is None:
+        raise FFmpegError(f"{name} is not installed")
+    try:
+        result = subprocess.run(
+            [binary, *args],
+            check=True,
+            capture_output=True,
+            timeout=settings.FFMPEG_TIMEOUT_SECONDS,
+        )
+    except subprocess.CalledProcessError as e:
+        raise FFmpegError(e.stderr.decode(errors="replace")[-500:]) from e
+    except subprocess.TimeoutExpired as e:
+        raise FFmpegError(f"{name} timed out after {e.timeout}s") from e
+    return result.stdout
+
+
+def run_ffmpeg(*args: str | Path) -> None:
+    """Run ffmpeg quietly, raising ``FFmpegError`` with its stderr on failure"""
+    _run(
+        settings.FFMPEG_BINARY,
+        find_ffmpeg(),
+        ["-nostdin", "-hide_banner", "-loglevel", "error", "-y", *map(str, args)],
+    )
+
+
+def run_ffprobe(path: str | Path) -> dict[str, Any]:
+    """Container and stream information of a media file as parsed JSON"""
+    output = _run(
+        settings.FFPROBE_BINARY,
+        find_ffprobe(),
+        [
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            str(path),
+        ],
+    )
+    try:
+        probe: dict[str, Any] = json.loads(output)
+    except ValueError as e:
+        raise FFmpegError(f"Unreadable ffprobe output for {path}") from e
+    return probe
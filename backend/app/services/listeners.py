@@ -0,0 +1,45 @@
+"""
+Distinct listener counts from HyperLogLog sketches.
+
+Listeners of newly recorded plays are added to daily sketches per song and
+artist, which merge into the listeners of any range of days. Artists'
+monthly_listeners are refreshed from their sketches of the last
+MONTHLY_LISTENERS_DAYS days.
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+
+def update_listener_sketches() -> None:
+    """Add listeners of new plays to the daily sketches and drop expired ones"""
+    today = datetime.utcnow().date()
+    with Session(engine) as session:
+        updated = crud.roll_up_listener_sketches(
+            session=session,
+            settle=timedelta(seconds=settings.PLAY_ROLLUP_SETTLE_SECONDS),
+            precision=settings.LISTENER_SKETCH_PRECISION,
+        )
+        logger.debug("Updated %d listener sketches", updated)
+        crud.delete_listener_sketches(
+            session=session,
+            before=today - timedelta(days=settings.LISTENER_SKETCH_RETENTION_DAYS),
+        )
+
+
+def refresh_monthly_listeners() -> None:
+    """Write every artist's distinct listeners of the last few weeks"""
+    since = datetime.utcnow().date() - timedelta(
+        days=settings.MONTHLY_LISTENERS_DAYS - 1
+    )
+    with Session(engine) as session:
+        artists = crud.update_monthly_listeners(session=session, since=since)
+    logger.info("Refreshed monthly listeners of %d artists", artists)
@@ -0,0 +1,218 @@
+"""
+Yearly listening reports, computed offline.
+
+The job streams a year's plays aggregated per user and song, ordered by
+user, cuts the stream into chunks of users and summarizes the chunks on a
+process pool. Chunks are written in order, each together with the ID of
+its last user, so a job that is stopped resumes after the last chunk it
+wrote. Reports are served from their table as they are, nothing is
+computed per request.
+"""
+
+import logging
+import multiprocessing
+import time
+import uuid
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Any
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+# A user's plays of a song: user, song, artist, genre, plays, ms listened
+SongPlays = tuple[uuid.UUID, uuid.UUID, uuid.UUID, uuid.UUID | None, int, int]
+
+
+@dataclass
+class ListeningReportProgress:
+    year: int
+    # Users and (user, song) rows processed by this run
+    users: int
+    rows: int
+    elapsed_seconds: float
+
+    @property
+    def users_per_second(self) -> float:
+        return self.users / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _top(
+    plays: Counter[uuid.UUID], duration: Counter[uuid.UUID], top_n: int
+) -> list[dict[str, Any]]:
+    return [
+        {"id": key, "plays": count, "minutes": duration[key] // 60_000}
+        for key, count in plays.most_common(top_n)
+    ]
+
+
+def summarize_user(
+    year: int, user_id: uuid.UUID, rows: Iterable[SongPlays], top_n: int
+) -> dict[str, Any]:
+    """A user's report from their plays per song, top entries without names"""
+    # Plays and ms listened per song, artist and genre
+    songs: Counter[uuid.UUID] = Counter()
+    artists: Counter[uuid.UUID] = Counter()
+    genres: Counter[uuid.UUID] = Counter()
+    song_ms: Counter[uuid.UUID] = Counter()
+    artist_ms: Counter[uuid.UUID] = Counter()
+    genre_ms: Counter[uuid.UUID] = Counter()
+    for _, song_id, artist_id, genre_id, plays, duration in rows:
+        songs[song_id] += plays
+        song_ms[song_id] += duration
+        artists[artist_id] += plays
+        artist_ms[artist_id] += duration
+        if genre_id is not None:
+            genres[genre_id] += plays
+            genre_ms[genre_id] += duration
+    return {
+        "user_id": user_id,
+        "year": year,
+        "total_plays": sum(songs.values()),
+        "minutes_listened": sum(song_ms.values()) // 60_000,
+        "distinct_songs": len(songs),
+        "distinct_artists": len(artists),
+        "top_songs": _top(songs, song_ms, top_n),
+        "top_artists": _top(artists, artist_ms, top_n),
+        "top_genres": _top(genres, genre_ms, top_n),
+    }
+
+
+def summarize_users(
+    year: int, users: list[tuple[uuid.UUID, list[SongPlays]]], top_n: int
+) -> list[dict[str, Any]]:
+    """Reports of a chunk of users, run in the pool"""
+    return [summarize_user(year, user_id, rows, top_n) for user_id, rows in users]
+
+
+def _chunk_users(
+    rows: Iterator[SongPlays], chunk_users: int
+) -> Iterator[tuple[list[tuple[uuid.UUID, list[SongPlays]]], int]]:
+    """Chunks of users with their rows, and the number of rows in each"""
+    users = (
+        (user_id, list(rows)) for user_id, rows in groupby(rows, key=itemgetter(0))
+    )
+    while chunk := list(islice(users, chunk_users)):
+        yield chunk, sum(len(rows) for _, rows in chunk)
+
+
+def _name_entries(reports: list[dict[str, Any]]) -> None:
+    """Add names to the top entries of reports, in place"""
+    ids: dict[str, set[uuid.UUID]] = {
+        "top_songs": set(),
+        "top_artists": set(),
+        "top_genres": set(),
+    }
+    for report in reports:
+        for kind, kind_ids in ids.items():
+            kind_ids.update(entry["id"] for entry in report[kind])
+    with Session(engine) as session:
+        names = crud.get_report_names(
+            session=session,
+            song_ids=ids["top_songs"],
+            artist_ids=ids["top_artists"],
+            genre_ids=ids["top_genres"],
+        )
+    for report in reports:
+        for kind in ids:
+            report[kind] = [
+                {**entry, "id": str(entry["id"]), "name": names.get(entry["id"], "")}
+                for entry in report[kind]
+            ]
+
+
+def generate_listening_reports(
+    year: int,
+    *,
+    workers: int | None = None,
+    chunk_users: int | None = None,
+    restart: bool = False,
+) -> ListeningReportProgress:
+    """
+    Compute the reports of every user who played something in ``year``,
+    resuming where the last run stopped unless ``restart``
+    """
+    workers = (
+        workers or settings.LISTENING_REPORT_WORKERS or multiprocessing.cpu_count()
+    )
+    chunk_users = chunk_users or settings.LISTENING_REPORT_CHUNK_USERS
+    with Session(engine) as session:
+        run = crud.start_listening_report_run(
+            session=session, year=year, restart=restart
+        )
+    progress = ListeningReportProgress(year=year, users=0, rows=0, elapsed_seconds=0.0)
+    if run.finished_at is not None:
+        logger.info(
+            "Listening reports of %d are done, restart to compute them again", year
+        )
+        return progress
+    if run.last_user_id is not None:
+        logger.info("Resuming listening reports of %d after %d users", year, run.users)
+
+    started = time.monotonic()
+    # Chunks in the order they were read, written in that order
+    pending: deque[tuple[Future[list[dict[str, Any]]], int]] = deque()
+
+    def write_oldest() -> None:
+        future, rows = pending.popleft()
+        reports = future.result()
+        _name_entries(reports)
+        with Session(engine) as session:
+            crud.save_listening_reports(session=session, year=year, reports=reports)
+        progress.users += len(reports)
+        progress.rows += rows
+        progress.elapsed_seconds = time.monotonic() - started
+        logger.info(
+            "Listening reports of %d: %d users, %.0f users/s, %.0f rows/s",
+            year,
+            progress.users,
+            progress.users_per_second,
+            progress.rows_per_second,
+        )
+
+    # Spawned workers don't inherit the DB pool, like the media job runner's
+    with (
+        ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor,
+        Session(engine) as session,
+    ):
+        rows = crud.stream_user_song_plays(
+            session=session,
+            start=date(year, 1, 1),
+            end=date(year + 1, 1, 1),
+            after_user_id=run.last_user_id,
+        )
+        for chunk, chunk_rows in _chunk_users(rows, chunk_users):
+            # Reading stays at most two chunks per worker ahead of writing
+            if len(pending) >= 2 * workers:
+                write_oldest()
+            pending.append(
+                (
+                    executor.submit(
+                        summarize_users, year, chunk, settings.LISTENING_REPORT_TOP_N
+                    ),
+                    chunk_rows,
+                )
+            )
+        while pending:
+            write_oldest()
+
+    with Session(engine) as session:
+        crud.finish_listening_report_run(session=session, year=year)
+    progress.elapsed_seconds = time.monotonic() - started
+    return progress
@@ -0,0 +1,127 @@
+"""
+Audio metadata extraction: container duration, bitrate, sample rate,
+channels, embedded tags and cover art of uploaded songs, read with ffprobe.
+
+Extraction runs as a media job task and its result is cached per source
+blob digest, so each distinct upload is probed once no matter how many
+songs use it.
+"""
+
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.services.blobs import COVERS_PREFIX, blob_filename, commit_blob
+from app.services.ffmpeg import FFmpegError, run_ffmpeg, run_ffprobe
+from app.services.storage import get_storage
+
+# Image codecs of embedded cover art and the file type they are saved as
+COVER_FORMATS = {"mjpeg": (".jpg", "image/jpeg"), "png": (".png", "image/png")}
+
+
+@dataclass
+class AudioInfo:
+    duration_ms: int
+    bitrate_kbps: int | None = None
+    sample_rate: int | None = None
+    channels: int | None = None
+    codec: str | None = None
+    format_name: str | None = None
+    tags: dict[str, str] = field(default_factory=dict)
+    # Filename of the extracted cover blob, if the file embeds one
+    cover_filename: str | None = None
+
+
+def _int(value: Any) -> int | None:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _cover_stream(probe: dict[str, Any]) -> dict[str, Any] | None:
+    streams: list[dict[str, Any]] = probe.get("streams", [])
+    for stream in streams:
+        if stream.get("codec_type") == "video" and stream.get("disposition", {}).get(
+            "attached_pic"
+        ):
+            return stream
+    return None
+
+
+def parse_probe(probe: dict[str, Any]) -> AudioInfo:
+    """
+    Build ``AudioInfo`` from ffprobe's JSON output. Raises ``FFmpegError``
+    when the file has no audio stream.
+    """
+    audio = next(
+        (
+            stream
+            for stream in probe.get("streams", [])
+            if stream.get("codec_type") == "audio"
+        ),
+        None,
+    )
+    if audio is None:
+        raise FFmpegError("File has no audio stream")
+    container = probe.get("format", {})
+
+    # Stream durations are exact for most codecs, containers fill the gaps
+    duration = float(audio.get("duration") or container.get("duration") or 0)
+    bitrate = _int(audio.get("bit_rate")) or _int(container.get("bit_rate"))
+
+    # Tag names differ in case between containers (ID3, Vorbis comments, ...)
+    tags = {
+        name.lower(): str(value)
+        for source in (container.get("tags", {}), audio.get("tags", {}))
+        for name, value in source.items()
+    }
+    return AudioInfo(
+        duration_ms=round(duration * 1000),
+        bitrate_kbps=round(bitrate / 1000) if bitrate else None,
+        sample_rate=_int(audio.get("sample_rate")),
+        channels=_int(audio.get("channels")),
+        codec=audio.get("codec_name"),
+        format_name=container.get("format_name"),
+        tags=tags,
+    )
+
+
+def _extract_cover(source: Path, stream: dict[str, Any], work: str) -> str | None:
+    """Copy embedded cover art to the covers blob store, returns its filename"""
+    suffix, content_type = COVER_FORMATS.get(stream.get("codec_name", ""), (None, None))
+    if suffix is None:
+        return None
+    output = Path(work) / f"cover{suffix}"
+    run_ffmpeg(
+        "-i",
+        source,
+        "-map",
+        f"0:{stream['index']}",
+        "-c",
+        "copy",
+        "-f",
+        "image2",
+        output,
+    )
+    filename = blob_filename(hashlib.sha256(output.read_bytes()).hexdigest(), suffix)
+    commit_blob(
+        get_storage(), output, COVERS_PREFIX, filename, content_type=content_type
+    )
+    return filename
+
+
+# Runs in media job pool processes
+def extract_metadata(source_key: str) -> AudioInfo:
+    """Probe a song blob and store its embedded cover art, if any"""
+    with (
+        get_storage().open_local(source_key) as source,
+        tempfile.TemporaryDirectory() as work,
+    ):
+        probe = run_ffprobe(source)
+        info = parse_probe(probe)
+        if stream := _cover_stream(probe):
+            info.cover_filename = _extract_cover(source, stream, work)
+    return info
@@ -0,0 +1,49 @@
+"""
+Accent and case insensitive forms of names and queries for search.
+
+Vietnamese names are written with diacritics that users mostly don't type:
+"son tung" should find "Sơn Tùng". Text is decomposed (NFKD), the
+combining marks are dropped and đ, which has no decomposition, becomes d.
+Search keys are then lowercased with runs of punctuation, symbols and
+whitespace collapsed to single spaces, "Sơn Tùng M-TP" is "son tung m tp".
+
+Search vectors are folded in the database by the ``fold_accents`` SQL
+function, which drops the same marks, so queries folded here match them.
+Stored search keys are generated columns, computed by the database with
+the same steps (see models.music), so keys of queries made here match
+them too: lower() rather than casefold(), as SQL has no casefold, and an
+explicit class of separators rather than word or alnum classes, which the
+two disagree on for marks and numbers of other scripts, and which depend
+on the database's locale.
+"""
+
+import re
+import unicodedata
+
+# The Combining Diacritical Marks blocks, also in the SQL fold_accents
+COMBINING_MARKS = "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]"
+
+# Characters between words: ASCII and Latin-1 punctuation and symbols, the
+# general punctuation and symbol blocks, CJK punctuation and emoji. The
+# escapes read the same to Python and SQL regular expressions, which use
+# the class verbatim. Marks left after folding stay in their words.
+SEPARATORS = (
+    r"[\u0001-\u002f\u003a-\u0040\u005b-\u0060\u007b-\u00bf\u00d7\u00f7"
+    r"\u2000-\u2bff\u2e00-\u2e7f\u3000-\u3004\u3008-\u3020\u3030\u30fb"
+    r"\U0001f000-\U0001faff]+"
+)
+
+_COMBINING_MARKS = re.compile(COMBINING_MARKS)
+_UNFOLDED_LETTERS = str.maketrans("đĐ", "dD")
+_SEPARATORS = re.compile(SEPARATORS)
+
+
+def fold_accents(text: str) -> str:
+    """``text`` without diacritics, keeping case and punctuation"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return _COMBINING_MARKS.sub("", decomposed).translate(_UNFOLDED_LETTERS)
+
+
+def search_key(text: str) -> str:
+    """The lowercase words of ``text`` without diacritics, separated by spaces"""
+    return _SEPARATORS.sub(" ", fold_accents(text.lower())).strip()
@@ -0,0 +1,146 @@
+"""
+HLS packaging: split a song into fixed-duration AAC segments at one or more
+bitrates with ffmpeg and publish them with their playlists to storage.
+
+Packages live under ``hls/<digest>/`` where the digest is the source blob's
+SHA-256, so identical uploads are packaged once and every object of a
+package is immutable. The master playlist is published last and marks the
+package as complete.
+"""
+
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.ffmpeg import run_ffmpeg
+from app.services.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+HLS_PREFIX = "hls"
+MASTER_PLAYLIST = "master.m3u8"
+VARIANT_PLAYLIST = "index.m3u8"
+PLAYLIST_CONTENT_TYPE = "application/vnd.apple.mpegurl"
+SEGMENT_CONTENT_TYPE = "video/mp2t"
+
+# MPEG-TS framing adds roughly this much on top of the audio bitrate
+TS_OVERHEAD = 1.1
+
+
+class PackagingError(Exception):
+    """An encoded variant is incomplete"""
+
+
+def hls_key(digest: str, *parts: str) -> str:
+    return "/".join([HLS_PREFIX, digest, *parts])
+
+
+def variant_name(bitrate_kbps: int) -> str:
+    return f"{bitrate_kbps}k"
+
+
+def is_packaged(storage: StorageBackend, digest: str) -> bool:
+    return storage.exists(hls_key(digest, MASTER_PLAYLIST))
+
+
+def encode_variant(
+    source: Path, directory: Path, *, bitrate_kbps: int, segment_seconds: int
+) -> None:
+    """Encode ``source`` to AAC and segment it into ``directory``"""
+    run_ffmpeg(
+        "-i",
+        source,
+        "-map",
+        "0:a:0",
+        "-vn",
+        "-c:a",
+        "aac",
+        "-b:a",
+        f"{bitrate_kbps}k",
+        "-ac",
+        "2",
+        "-f",
+        "hls",
+        "-hls_time",
+        str(segment_seconds),
+        "-hls_playlist_type",
+        "vod",
+        "-hls_segment_filename",
+        directory / "seg_%05d.ts",
+        directory / VARIANT_PLAYLIST,
+    )
+
+
+def render_master_playlist(bitrates_kbps: list[int]) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for bitrate in sorted(bitrates_kbps):
+        bandwidth = int(bitrate * 1000 * TS_OVERHEAD)
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},CODECS="mp4a.40.2"')
+        lines.append(f"{variant_name(bitrate)}/{VARIANT_PLAYLIST}")
+    return "\n".join(lines) + "\n"
+
+
+def publish_package(
+    storage: StorageBackend, digest: str, variants: dict[int, Path]
+) -> None:
+    """
+    Upload encoded variant directories (one per bitrate, as written by
+    ``encode_variant`` or pre-encoded) followed by the master playlist.
+    """
+    for bitrate, directory in variants.items():
+        segments = sorted(directory.glob("*.ts"))
+        if not segments or not (directory / VARIANT_PLAYLIST).is_file():
+            raise PackagingError(f"Variant {directory} has no playlist or segments")
+        for path in segments:
+            storage.put_file(
+                hls_key(digest, variant_name(bitrate), path.name),
+                path,
+                content_type=SEGMENT_CONTENT_TYPE,
+            )
+        storage.put_file(
+            hls_key(digest, variant_name(bitrate), VARIANT_PLAYLIST),
+            directory / VARIANT_PLAYLIST,
+            content_type=PLAYLIST_CONTENT_TYPE,
+        )
+
+    with tempfile.NamedTemporaryFile("w", suffix=".m3u8", delete=False) as f:
+        f.write(render_master_playlist(list(variants)))
+    master = Path(f.name)
+    try:
+        storage.put_file(
+            hls_key(digest, MASTER_PLAYLIST), master, content_type=PLAYLIST_CONTENT_TYPE
+        )
+    finally:
+        master.unlink(missing_ok=True)
+
+
+def package_song(storage: StorageBackend, source_key: str, digest: str) -> bool:
+    """
+    Package the song blob ``source_key`` for HLS unless that was done
+    before. Returns whether a package was published, raises ``FFmpegError``
+    when encoding fails.
+    """
+    if is_packaged(storage, digest):
+        return False
+
+    started = time.monotonic()
+    with (
+        storage.open_local(source_key) as source,
+        tempfile.TemporaryDirectory() as work,
+    ):
+        variants: dict[int, Path] = {}
+        for bitrate in settings.HLS_BITRATES_KBPS:
+            directory = Path(work) / variant_name(bitrate)
+            directory.mkdir()
+            encode_variant(
+                source,
+                directory,
+                bitrate_kbps=bitrate,
+                segment_seconds=settings.HLS_SEGMENT_SECONDS,
+            )
+            variants[bitrate] = directory
+        publish_package(storage, digest, variants)
+    logger.info("Packaged %s for HLS in %.1fs", digest, time.monotonic() - started)
+    return True
@@ -0,0 +1,116 @@
+"""
+Write-behind buffer for song play counts.
+
+Plays are counted in memory per song and flushed periodically as one
+batched ``UPDATE song SET play_count = play_count + n``, instead of a
+read-modify-write round trip per play. Each replica keeps its own buffer,
+the increments are atomic so replicas don't lose each other's counts.
+Counts not yet flushed are lost if the process dies; a graceful shutdown
+flushes them.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlayCountMetrics:
+    pending_songs: int
+    pending_plays: int
+    flushes: int
+    failed_flushes: int
+    flushed_plays: int
+    last_flush_seconds: float | None
+    max_flush_seconds: float | None
+
+
+def _write_play_counts(counts: dict[uuid.UUID, int]) -> None:
+    with Session(engine) as session:
+        crud.add_play_counts(session=session, counts=counts)
+
+
+class PlayCountBuffer:
+    """Coalesces play count increments per song until they are flushed"""
+
+    def __init__(
+        self,
+        write: Callable[[dict[uuid.UUID, int]], None] = _write_play_counts,
+        max_songs: int | None = None,
+    ) -> None:
+        self.write = write
+        # Distinct songs buffered before the adding request flushes itself
+        self.max_songs = max_songs
+        self.lock = threading.Lock()
+        self.pending: Counter[uuid.UUID] = Counter()
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.flushed_plays = 0
+        self.last_flush_seconds: float | None = None
+        self.max_flush_seconds: float | None = None
+
+    def add(self, song_id: uuid.UUID, plays: int = 1) -> None:
+        with self.lock:
+            self.pending[song_id] += plays
+            full = self.max_songs is not None and len(self.pending) >= self.max_songs
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write buffered counts, returns how many plays were written. On
+        failure the counts are put back for the next flush and the error is
+        raised.
+        """
+        with self.lock:
+            counts, self.pending = dict(self.pending), Counter()
+        if not counts:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            self.write(counts)
+        except Exception:
+            with self.lock:
+                self.pending.update(counts)
+                self.failed_flushes += 1
+            raise
+        elapsed = time.perf_counter() - started
+
+        plays = sum(counts.values())
+        with self.lock:
+            self.flushes += 1
+            self.flushed_plays += plays
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds or 0.0, elapsed)
+        logger.debug(
+            "Flushed %d plays of %d songs in %.3fs", plays, len(counts), elapsed
+        )
+        return plays
+
+    def metrics(self) -> PlayCountMetrics:
+        with self.lock:
+            return PlayCountMetrics(
+                pending_songs=len(self.pending),
+                pending_plays=sum(self.pending.values()),
+                flushes=self.flushes,
+                failed_flushes=self.failed_flushes,
+                flushed_plays=self.flushed_plays,
+                last_flush_seconds=self.last_flush_seconds,
+                max_flush_seconds=self.max_flush_seconds,
+            )
+
+
+play_counts = PlayCountBuffer(max_songs=settings.PLAY_COUNT_BUFFER_MAX_SONGS)
@@ -0,0 +1,189 @@
+"""
+Repeat play suppression.
+
+A play of a song by a user counts once per window: further plays of it
+until the window has passed are dropped before they reach the play count,
+trending or play history. The window is at least the song's duration, as
+nobody can listen to a song twice in less time than that, so hammering
+the play endpoints can't inflate counts and costs no writes.
+
+The in-memory backend keeps windows per process, which is enough with a
+single worker or sticky sessions. The postgres backend shares them between
+workers through an unlogged table, for one small upsert per play, and is
+the default with several workers.
+"""
+
+import abc
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, cast
+
+from sqlalchemy import CursorResult, text
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import engine
+
+
+@dataclass
+class PlayDedupMetrics:
+    backend: str
+    accepted: int
+    dropped: int
+    # Open windows, None when they're not held in this process
+    windows: int | None
+
+
+class PlayDeduplicator(abc.ABC):
+    """Tells whether a play opens a new window, counting the outcome"""
+
+    backend = ""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.dropped = 0
+
+    @abc.abstractmethod
+    def _accept(self, user_id: uuid.UUID, song_id: uuid.UUID, window: float) -> bool:
+        """Open a window unless one is open, whether it was"""
+
+    def accept(self, user_id: uuid.UUID, song_id: uuid.UUID, window: float) -> bool:
+        """
+        Whether the play counts, i.e. the user didn't play the song within
+        the last ``window`` seconds. A counted play opens a new window.
+        """
+        accepted = self._accept(user_id, song_id, window)
+        with self.lock:
+            if accepted:
+                self.accepted += 1
+            else:
+                self.dropped += 1
+        return accepted
+
+    @abc.abstractmethod
+    def release(self, user_id: uuid.UUID, song_id: uuid.UUID) -> None:
+        """Close the window of a play that couldn't be recorded after all"""
+
+    @abc.abstractmethod
+    def prune(self) -> int:
+        """Forget windows that have passed, returns how many"""
+
+    def _windows(self) -> int | None:
+        return None
+
+    def metrics(self) -> PlayDedupMetrics:
+        with self.lock:
+            return PlayDedupMetrics(
+                backend=self.backend,
+                accepted=self.accepted,
+                dropped=self.dropped,
+                windows=self._windows(),
+            )
+
+
+class MemoryPlayDeduplicator(PlayDeduplicator):
+    backend = "memory"
+
+    def __init__(
+        self, max_windows: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        super().__init__()
+        # Beyond this, the oldest windows are forgotten early
+        self.max_windows = max_windows
+        self.clock = clock
+        # Window end per (user, song), in the order windows were opened
+        self.expires: OrderedDict[tuple[uuid.UUID, uuid.UUID], float] = OrderedDict()
+
+    def _accept(self, user_id: uuid.UUID, song_id: uuid.UUID, window: float) -> bool:
+        now = self.clock()
+        key = (user_id, song_id)
+        with self.lock:
+            if self.expires.get(key, now) > now:
+                return False
+            self.expires[key] = now + window
+            self.expires.move_to_end(key)
+            while len(self.expires) > self.max_windows:
+                self.expires.popitem(last=False)
+            return True
+
+    def release(self, user_id: uuid.UUID, song_id: uuid.UUID) -> None:
+        with self.lock:
+            self.expires.pop((user_id, song_id), None)
+
+    def prune(self) -> int:
+        now = self.clock()
+        with self.lock:
+            expired = [key for key, expires in self.expires.items() if expires <= now]
+            for key in expired:
+                del self.expires[key]
+        return len(expired)
+
+    def _windows(self) -> int | None:
+        return len(self.expires)
+
+
+class PostgresPlayDeduplicator(PlayDeduplicator):
+    backend = "postgres"
+
+    def _accept(self, user_id: uuid.UUID, song_id: uuid.UUID, window: float) -> bool:
+        # Opens the window unless one is open, against the database's clock
+        with Session(engine) as session:
+            opened = session.execute(
+                text(
+                    "INSERT INTO playdedupwindow (user_id, song_id, expires_at) "
+                    "VALUES (:user_id, :song_id, "
+                    "(now() AT TIME ZONE 'utc') + make_interval(secs => :window)) "
+                    "ON CONFLICT (user_id, song_id) DO UPDATE "
+                    "SET expires_at = excluded.expires_at "
+                    "WHERE playdedupwindow.expires_at <= (now() AT TIME ZONE 'utc') "
+                    "RETURNING 1"
+                ),
+                {"user_id": user_id, "song_id": song_id, "window": window},
+            ).first()
+            session.commit()
+        return opened is not None
+
+    def release(self, user_id: uuid.UUID, song_id: uuid.UUID) -> None:
+        with Session(engine) as session:
+            session.execute(
+                text(
+                    "DELETE FROM playdedupwindow WHERE user_id = :user_id AND song_id = :song_id"
+                ),
+                {"user_id": user_id, "song_id": song_id},
+            )
+            session.commit()
+
+    def prune(self) -> int:
+        with Session(engine) as session:
+            result = cast(
+                CursorResult[Any],
+                session.execute(
+                    text(
+                        "DELETE FROM playdedupwindow WHERE expires_at <= (now() AT TIME ZONE 'utc')"
+                    )
+                ),
+            )
+            session.commit()
+        return result.rowcount
+
+
+def play_window(duration_ms: int) -> float:
+    """Seconds within which repeat plays of a song of this length are dropped"""
+    return max(settings.PLAY_DEDUP_WINDOW_SECONDS, duration_ms / 1000)
+
+
+@lru_cache
+def get_play_deduplicator() -> PlayDeduplicator:
+    """The deduplicator configured in settings, shared by the process"""
+    backend = settings.PLAY_DEDUP_BACKEND
+    if backend is None:
+        backend = "postgres" if settings.API_WORKERS > 1 else "memory"
+    if backend == "postgres":
+        return PostgresPlayDeduplicator()
+    return MemoryPlayDeduplicator(settings.PLAY_DEDUP_MAX_WINDOWS)
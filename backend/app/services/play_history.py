@@ -0,0 +1,225 @@
+"""
+Write-behind ingestion of play history.
+
+Requests put plays on a bounded in-memory queue and return; a writer thread
+takes whatever has queued up, up to a batch, and COPYs it in one
+transaction. Batches grow with the load, so a burst of plays costs a few
+large inserts instead of one commit per play.
+
+When the database falls behind, the queue fills up and ``submit`` blocks
+for a moment, then raises ``PlayHistoryOverloaded`` so clients back off
+and retry. Failed batches are retried with backoff while the queue keeps
+applying back-pressure. A graceful shutdown drains the queue; plays still
+queued when the process dies are lost.
+
+The table is partitioned by month. ``maintain_play_history`` keeps
+partitions a few months ahead and rolls partitions past retention up into
+monthly totals before dropping them. ``roll_up_plays`` adds new plays to
+the hourly and daily play rollups that charts and stats read.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import PlayHistory
+
+logger = logging.getLogger(__name__)
+
+RETRY_INITIAL_SECONDS = 0.5
+RETRY_MAX_SECONDS = 30.0
+
+
+class PlayHistoryOverloaded(Exception):
+    pass
+
+
+@dataclass
+class PlayHistoryMetrics:
+    queued: int
+    max_queued: int
+    accepted: int
+    rejected: int
+    batches: int
+    failed_batches: int
+    written: int
+    last_batch_size: int | None
+    last_batch_seconds: float | None
+    max_batch_seconds: float | None
+
+
+def _write_play_history(plays: Sequence[PlayHistory]) -> None:
+    with Session(engine) as session:
+        crud.insert_play_history(session=session, plays=plays)
+
+
+def maintain_play_history(today: date | None = None) -> None:
+    """Create upcoming play history partitions and retire expired ones"""
+    month = (today or datetime.utcnow().date()).replace(day=1)
+    with Session(engine) as session:
+        for ahead in range(settings.PLAY_HISTORY_PARTITIONS_AHEAD + 1):
+            partition = crud.add_months(month, ahead)
+            if crud.create_play_history_partition(session=session, month=partition):
+                logger.info("Created play history partition of %s", partition)
+        before = crud.add_months(month, -settings.PLAY_HISTORY_RETENTION_MONTHS)
+        rolled_up = crud.roll_up_play_history(session=session, before=before)
+        if rolled_up:
+            logger.info("Rolled up %d plays before %s", rolled_up, before)
+
+
+def roll_up_plays() -> None:
+    """Add newly recorded plays to the play rollups and prune old hourly ones"""
+    with Session(engine) as session:
+        rolled_up = crud.roll_up_recorded_plays(
+            session=session,
+            settle=timedelta(seconds=settings.PLAY_ROLLUP_SETTLE_SECONDS),
+        )
+        logger.debug("Rolled up %d recorded plays", rolled_up)
+        crud.delete_hourly_song_plays(
+            session=session,
+            before=datetime.utcnow()
+            - timedelta(days=settings.PLAY_ROLLUP_HOURLY_RETENTION_DAYS),
+        )
+
+
+class PlayHistoryIngestor:
+    """Queues plays and writes them in batches from a background thread"""
+
+    def __init__(
+        self,
+        write: Callable[[Sequence[PlayHistory]], None] = _write_play_history,
+        max_queued: int = 0,
+        batch_size: int = 1000,
+        submit_timeout: float = 0.0,
+    ) -> None:
+        self.write = write
+        self.queue: queue.Queue[PlayHistory] = queue.Queue(max_queued)
+        self.batch_size = batch_size
+        # How long a request waits for room in a full queue
+        self.submit_timeout = submit_timeout
+        self.stopping = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.written = 0
+        self.last_batch_size: int | None = None
+        self.last_batch_seconds: float | None = None
+        self.max_batch_seconds: float | None = None
+
+    def submit(self, play: PlayHistory) -> None:
+        try:
+            self.queue.put(play, timeout=self.submit_timeout)
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise PlayHistoryOverloaded from None
+        with self.lock:
+            self.accepted += 1
+
+    def start(self) -> None:
+        self.stopping.clear()
+        self.thread = threading.Thread(
+            target=self._run, name="play-history-writer", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Write the plays still queued and stop the writer thread, giving up
+        after ``timeout`` seconds if the database stays unavailable.
+        """
+        self.stopping.set()
+        if self.thread:
+            self.thread.join(timeout)
+            if self.thread.is_alive():
+                logger.error(
+                    "Play history writer did not stop in time, %d plays still queued",
+                    self.queue.qsize(),
+                )
+            self.thread = None
+
+    def _take_batch(self, wait: float | None) -> list[PlayHistory]:
+        """Wait for a play, then take whatever else is queued up to a batch"""
+        try:
+            batch = [self.queue.get(timeout=wait)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_batch(self, batch: list[PlayHistory]) -> None:
+        started = time.perf_counter()
+        try:
+            self.write(batch)
+        except Exception:
+            with self.lock:
+                self.failed_batches += 1
+            raise
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.batches += 1
+            self.written += len(batch)
+            self.last_batch_size = len(batch)
+            self.last_batch_seconds = elapsed
+            self.max_batch_seconds = max(self.max_batch_seconds or 0.0, elapsed)
+        logger.debug("Wrote %d plays in %.3fs", len(batch), elapsed)
+
+    def _run(self) -> None:
+        while True:
+            stopping = self.stopping.is_set()
+            # Poll so a stop request is noticed while the queue is empty,
+            # once stopping only what is left is taken
+            batch = self._take_batch(wait=0 if stopping else 0.5)
+            if not batch:
+                if stopping:
+                    return
+                continue
+            delay = RETRY_INITIAL_SECONDS
+            while True:
+                try:
+                    self._write_batch(batch)
+                    break
+                except Exception:
+                    logger.exception(
+                        "Writing %d plays failed, retrying in %.1fs", len(batch), delay
+                    )
+                    time.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_SECONDS)
+
+    def metrics(self) -> PlayHistoryMetrics:
+        with self.lock:
+            return PlayHistoryMetrics(
+                queued=self.queue.qsize(),
+                max_queued=self.queue.maxsize,
+                accepted=self.accepted,
+                rejected=self.rejected,
+                batches=self.batches,
+                failed_batches=self.failed_batches,
+                written=self.written,
+                last_batch_size=self.last_batch_size,
+                last_batch_seconds=self.last_batch_seconds,
+                max_batch_seconds=self.max_batch_seconds,
+            )
+
+
+play_history = PlayHistoryIngestor(
+    max_queued=settings.PLAY_HISTORY_QUEUE_SIZE,
+    batch_size=settings.PLAY_HISTORY_BATCH_SIZE,
+    submit_timeout=settings.PLAY_HISTORY_SUBMIT_TIMEOUT_SECONDS,
+)
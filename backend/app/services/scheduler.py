@@ -0,0 +1,30 @@
+"""
+Periodic background jobs run inside the API process
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(
+    interval: float, func: Callable[[], Any], name: str, immediately: bool = False
+) -> None:
+    """
+    Call the blocking ``func`` on the threadpool every ``interval`` seconds
+    until cancelled, starting right away if ``immediately``. Failures are
+    logged and the job keeps running.
+    """
+    while True:
+        if not immediately:
+            await asyncio.sleep(interval)
+        immediately = False
+        try:
+            await run_in_threadpool(func)
+        except Exception:
+            logger.exception("Periodic job %s failed", name)
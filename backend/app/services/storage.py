@@ -0,0 +1,447 @@
+"""
+Pluggable object storage for uploaded files.
+
+``LocalStorage`` keeps objects under a directory on disk. ``S3Storage``
+talks to any S3-compatible API (AWS S3, MinIO, ...) over a pooled httpx
+client with SigV4 signing, so several API replicas can share audio without
+a shared volume and clients can download straight from the object store
+through presigned URLs.
+"""
+
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+from abc import ABC, abstractmethod
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class StorageError(Exception):
+    """The storage backend failed to complete a request"""
+
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    # Unix timestamp of the last write
+    modified: float
+
+
+class StorageBackend(ABC):
+    @abstractmethod
+    def stat(self, key: str) -> ObjectInfo | None:
+        """Size and modification time of ``key``, ``None`` if it doesn't exist"""
+
+    @abstractmethod
+    def put_file(
+        self, key: str, path: Path, *, content_type: str | None = None
+    ) -> None:
+        """Store the local file ``path`` as ``key``. The file may be consumed."""
+
+    @abstractmethod
+    def iter_range(
+        self, key: str, start: int, end: int
+    ) -> Generator[bytes, None, None]:
+        """Stream the inclusive byte range ``start``-``end`` of ``key``"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete ``key`` if it exists"""
+
+    @abstractmethod
+    def touch(self, key: str) -> None:
+        """Bump the modification time of ``key``"""
+
+    @abstractmethod
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        """All objects whose key starts with ``prefix``"""
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def local_path(self, key: str) -> Path | None:  # noqa: ARG002
+        """Filesystem path of ``key`` when the backend is a local directory"""
+        return None
+
+    def presigned_url(self, key: str, *, expires_in: int) -> str | None:  # noqa: ARG002
+        """Time-limited URL clients can download ``key`` from directly"""
+        return None
+
+    @contextmanager
+    def open_local(self, key: str) -> Iterator[Path]:
+        """
+        A local file with the content of ``key`` for tools that need a path,
+        downloaded to a temp file when the backend is remote.
+        """
+        if (path := self.local_path(key)) is not None:
+            yield path
+            return
+        info = self.stat(key)
+        if info is None:
+            raise StorageError(f"Object {key} not found")
+        fd, tmp_name = tempfile.mkstemp(suffix=Path(key).suffix)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in self.iter_range(key, 0, info.size - 1):
+                    out.write(chunk)
+            yield Path(tmp_name)
+        finally:
+            os.unlink(tmp_name)
+
+
+class LocalStorage(StorageBackend):
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root):
+            raise StorageError(f"Invalid key {key}")
+        return path
+
+    def local_path(self, key: str) -> Path | None:
+        return self._path(key)
+
+    def stat(self, key: str) -> ObjectInfo | None:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(key=key, size=stat.st_size, modified=stat.st_mtime)
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str | None = None
+    ) -> None:  # noqa: ARG002
+        destination = self._path(key)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        # A rename when the scratch dir is on the same filesystem, a copy otherwise
+        shutil.move(path, destination)
+
+    def iter_range(
+        self, key: str, start: int, end: int
+    ) -> Generator[bytes, None, None]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and (chunk := f.read(min(COPY_CHUNK_SIZE, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def touch(self, key: str) -> None:
+        os.utime(self._path(key))
+
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        base = self._path(prefix.rstrip("/")) if prefix.strip("/") else self.root
+        if not base.is_dir():
+            return
+        for path in base.rglob("*"):
+            if path.is_file():
+                stat = path.stat()
+                yield ObjectInfo(
+                    key=path.relative_to(self.root).as_posix(),
+                    size=stat.st_size,
+                    modified=stat.st_mtime,
+                )
+
+
+# ===== S3 =====
+
+S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode(), hashlib.sha256).digest()
+
+
+def _uri_encode(value: str, *, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+class SigV4Signer:
+    """AWS Signature Version 4 for the S3 service"""
+
+    def __init__(self, *, access_key: str, secret_key: str, region: str) -> None:
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+
+    def _scope(self, date: str) -> str:
+        return f"{date}/{self.region}/s3/aws4_request"
+
+    def _signature(self, amz_date: str, canonical_request: str) -> str:
+        date = amz_date[:8]
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                self._scope(date),
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            ]
+        )
+        key = _hmac(f"AWS4{self.secret_key}".encode(), date)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        return hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _canonical_request(
+        method: str,
+        path: str,
+        query: dict[str, str],
+        headers: dict[str, str],
+        payload_hash: str,
+    ) -> tuple[str, str]:
+        canonical_query = "&".join(
+            f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items())
+        )
+        lowered = {k.lower(): " ".join(v.split()) for k, v in headers.items()}
+        signed_headers = ";".join(sorted(lowered))
+        canonical_headers = "".join(f"{k}:{lowered[k]}\n" for k in sorted(lowered))
+        request = "\n".join(
+            [
+                method,
+                _uri_encode(path, safe="/-_.~"),
+                canonical_query,
+                canonical_headers,
+                signed_headers,
+                payload_hash,
+            ]
+        )
+        return request, signed_headers
+
+    def sign_headers(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        query: dict[str, str],
+        headers: dict[str, str],
+        *,
+        now: datetime,
+        payload_hash: str = UNSIGNED_PAYLOAD,
+    ) -> dict[str, str]:
+        """Headers, including ``Authorization``, for a signed request"""
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        signed = {
+            **headers,
+            "host": host,
+            "x-amz-date": amz_date,
+            "x-amz-content-sha256": payload_hash,
+        }
+        canonical_request, signed_headers = self._canonical_request(
+            method, path, query, signed, payload_hash
+        )
+        signature = self._signature(amz_date, canonical_request)
+        signed["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self.access_key}/{self._scope(amz_date[:8])}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        del signed["host"]
+        return signed
+
+    def presign_query(
+        self, method: str, host: str, path: str, *, now: datetime, expires_in: int
+    ) -> dict[str, str]:
+        """Query parameters of a presigned URL"""
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        query = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{self._scope(amz_date[:8])}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonical_request, _ = self._canonical_request(
+            method, path, query, {"host": host}, UNSIGNED_PAYLOAD
+        )
+        query["X-Amz-Signature"] = self._signature(amz_date, canonical_request)
+        return query
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible backend using path-style addressing. Requests share one
+    httpx connection pool; payloads are streamed in both directions.
+    """
+
+    def __init__(
+        self,
+        *,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str,
+        pool_size: int,
+        public_endpoint_url: str | None = None,
+    ) -> None:
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.public_endpoint_url = (public_endpoint_url or endpoint_url).rstrip("/")
+        self.bucket = bucket
+        self.signer = SigV4Signer(
+            access_key=access_key, secret_key=secret_key, region=region
+        )
+        self.client = httpx.Client(
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+            timeout=httpx.Timeout(30.0, read=120.0),
+        )
+
+    def _path(self, key: str) -> str:
+        return f"/{self.bucket}/{key}" if key else f"/{self.bucket}"
+
+    def _request(
+        self,
+        method: str,
+        key: str,
+        *,
+        query: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+        content: Iterator[bytes] | bytes | None = None,
+        stream: bool = False,
+    ) -> httpx.Response:
+        query = query or {}
+        path = self._path(key)
+        host = urlsplit(self.endpoint_url).netloc
+        signed = self.signer.sign_headers(
+            method, host, path, query, headers or {}, now=datetime.now(timezone.utc)
+        )
+        request = self.client.build_request(
+            method,
+            self.endpoint_url + _uri_encode(path, safe="/-_.~"),
+            params=query,
+            headers=signed,
+            content=content,
+        )
+        response = self.client.send(request, stream=stream)
+        if response.status_code >= 300 and response.status_code != 404:
+            detail = response.read().decode(errors="replace")[:500]
+            response.close()
+            raise StorageError(
+                f"S3 {method} {key} failed: {response.status_code} {detail}"
+            )
+        return response
+
+    def stat(self, key: str) -> ObjectInfo | None:
+        response = self._request("HEAD", key)
+        if response.status_code == 404:
+            return None
+        return ObjectInfo(
+            key=key,
+            size=int(response.headers["content-length"]),
+            modified=parsedate_to_datetime(
+                response.headers["last-modified"]
+            ).timestamp(),
+        )
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str | None = None
+    ) -> None:
+        def iter_file() -> Iterator[bytes]:
+            with open(path, "rb") as f:
+                while chunk := f.read(COPY_CHUNK_SIZE):
+                    yield chunk
+
+        headers = {"content-length": str(path.stat().st_size)}
+        if content_type:
+            headers["content-type"] = content_type
+        self._request("PUT", key, headers=headers, content=iter_file()).close()
+        path.unlink(missing_ok=True)
+
+    def iter_range(
+        self, key: str, start: int, end: int
+    ) -> Generator[bytes, None, None]:
+        response = self._request(
+            "GET", key, headers={"range": f"bytes={start}-{end}"}, stream=True
+        )
+        try:
+            if response.status_code == 404:
+                raise StorageError(f"Object {key} not found")
+            yield from response.iter_bytes(COPY_CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def delete(self, key: str) -> None:
+        self._request("DELETE", key).close()
+
+    def touch(self, key: str) -> None:
+        # Copying an object onto itself with replaced metadata resets LastModified
+        self._request(
+            "PUT",
+            key,
+            headers={
+                "x-amz-copy-source": _uri_encode(self._path(key), safe="/-_.~"),
+                "x-amz-metadata-directive": "REPLACE",
+            },
+        ).close()
+
+    def list(self, prefix: str) -> Iterator[ObjectInfo]:
+        token = None
+        while True:
+            query = {"list-type": "2", "prefix": prefix}
+            if token:
+                query["continuation-token"] = token
+            root = ET.fromstring(self._request("GET", "", query=query).content)
+            for item in root.iter(f"{S3_NAMESPACE}Contents"):
+                modified = item.findtext(f"{S3_NAMESPACE}LastModified") or ""
+                yield ObjectInfo(
+                    key=item.findtext(f"{S3_NAMESPACE}Key") or "",
+                    size=int(item.findtext(f"{S3_NAMESPACE}Size") or 0),
+                    modified=datetime.fromisoformat(
+                        modified.replace("Z", "+00:00")
+                    ).timestamp(),
+                )
+            token = root.findtext(f"{S3_NAMESPACE}NextContinuationToken")
+            if root.findtext(f"{S3_NAMESPACE}IsTruncated") != "true" or not token:
+                return
+
+    def presigned_url(self, key: str, *, expires_in: int) -> str | None:
+        path = self._path(key)
+        query = self.signer.presign_query(
+            "GET",
+            urlsplit(self.public_endpoint_url).netloc,
+            path,
+            now=datetime.now(timezone.utc),
+            expires_in=expires_in,
+        )
+        encoded = "&".join(
+            f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in query.items()
+        )
+        return f"{self.public_endpoint_url}{_uri_encode(path, safe='/-_.~')}?{encoded}"
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """The storage backend configured in settings, shared by the process"""
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            public_endpoint_url=settings.S3_PUBLIC_ENDPOINT_URL,
+            bucket=settings.S3_BUCKET,
+            access_key=settings.S3_ACCESS_KEY_ID,
+            secret_key=settings.S3_SECRET_ACCESS_KEY,
+            region=settings.S3_REGION,
+            pool_size=settings.S3_POOL_SIZE,
+        )
+    return LocalStorage(Path(settings.STORAGE_LOCAL_ROOT))
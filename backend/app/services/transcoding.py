@@ -0,0 +1,330 @@
+"""
+Media processing for uploaded songs: metadata extraction, waveform and
+loudness analysis, transcoding into renditions at several bitrates and HLS
+packaging, run from the MediaJob queue on a process pool.
+
+Every replica runs a ``MediaJobRunner``. Jobs are claimed from the database
+with ``SKIP LOCKED``, so replicas share the queue without coordination, and
+each job fans out into metadata and analysis tasks, one task per rendition
+and one for the HLS package.
+"""
+
+import logging
+import multiprocessing
+import tempfile
+import threading
+import uuid
+from collections.abc import Callable
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.models import Rendition
+from app.services.analysis import WaveformAnalysis, analyse_song
+from app.services.ffmpeg import run_ffmpeg
+from app.services.metadata import AudioInfo, extract_metadata
+from app.services.packaging import package_song
+from app.services.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_PREFIX = "renditions"
+RENDITION_CONTENT_TYPE = "audio/mp4"
+RENDITION_SUFFIX = ".m4a"
+
+QUALITY_ORIGINAL = "original"
+
+# Client hints (Save-Data, ECT) mapped to a quality level
+SLOW_CONNECTION_TYPES = {"slow-2g", "2g"}
+CLIENT_HINT_HEADERS = "Save-Data, ECT"
+
+
+def rendition_filename(bitrate_kbps: int) -> str:
+    return f"{bitrate_kbps}k{RENDITION_SUFFIX}"
+
+
+def rendition_key(digest: str, bitrate_kbps: int) -> str:
+    return f"{RENDITIONS_PREFIX}/{digest}/{rendition_filename(bitrate_kbps)}"
+
+
+# ===== WORKER TASKS =====
+# These run in pool processes and must stay importable top-level functions.
+
+
+def transcode_rendition(
+    source_key: str, digest: str, bitrate_kbps: int
+) -> tuple[str, int]:
+    """Encode one AAC rendition of a song blob and store it, returns key and size"""
+    storage = get_storage()
+    key = rendition_key(digest, bitrate_kbps)
+    with (
+        storage.open_local(source_key) as source,
+        tempfile.TemporaryDirectory() as work,
+    ):
+        output = Path(work) / rendition_filename(bitrate_kbps)
+        run_ffmpeg(
+            "-i",
+            source,
+            "-map",
+            "0:a:0",
+            "-vn",
+            "-c:a",
+            "aac",
+            "-b:a",
+            f"{bitrate_kbps}k",
+            # Put the index first so playback can start before the download ends
+            "-movflags",
+            "+faststart",
+            output,
+        )
+        size = output.stat().st_size
+        storage.put_file(key, output, content_type=RENDITION_CONTENT_TYPE)
+    return key, size
+
+
+def package_hls(source_key: str, digest: str) -> bool:
+    return package_song(get_storage(), source_key, digest)
+
+
+# ===== JOB PLANNING =====
+
+
+@dataclass
+class MediaTask:
+    name: str
+    func: Callable[..., Any]
+    args: tuple[Any, ...]
+    # Called in the API process with the task's result
+    on_result: Callable[[Session, Any], None] | None = field(default=None)
+
+
+def _save_rendition(
+    digest: str, bitrate_kbps: int, session: Session, result: tuple[str, int]
+) -> None:
+    key, size = result
+    crud.save_rendition(
+        session=session,
+        source_digest=digest,
+        bitrate_kbps=bitrate_kbps,
+        key=key,
+        content_type=RENDITION_CONTENT_TYPE,
+        size=size,
+    )
+
+
+def _save_metadata(digest: str, session: Session, info: AudioInfo) -> None:
+    crud.save_audio_metadata(session=session, source_digest=digest, values=asdict(info))
+    metadata = crud.get_audio_metadata(session=session, source_digest=digest)
+    if metadata:
+        crud.apply_audio_metadata(session=session, metadata=metadata)
+
+
+def _save_analysis(digest: str, session: Session, analysis: WaveformAnalysis) -> None:
+    crud.save_audio_analysis(
+        session=session, source_digest=digest, values=asdict(analysis)
+    )
+
+
+def media_task_count() -> int:
+    return len(plan_media_tasks("", ""))
+
+
+def plan_media_tasks(source_key: str, digest: str) -> list[MediaTask]:
+    """The tasks processing one song blob consists of"""
+    # Metadata goes first, it is quick and fixes song durations
+    tasks = [
+        MediaTask(
+            name="metadata",
+            func=extract_metadata,
+            args=(source_key,),
+            on_result=partial(_save_metadata, digest),
+        ),
+        MediaTask(
+            name="analysis",
+            func=analyse_song,
+            args=(source_key,),
+            on_result=partial(_save_analysis, digest),
+        ),
+    ]
+    tasks += [
+        MediaTask(
+            name=f"rendition {bitrate}k",
+            func=transcode_rendition,
+            args=(source_key, digest, bitrate),
+            on_result=partial(_save_rendition, digest, bitrate),
+        )
+        for bitrate in sorted(set(settings.TRANSCODE_QUALITY_KBPS.values()))
+    ]
+    tasks.append(MediaTask(name="hls", func=package_hls, args=(source_key, digest)))
+    return tasks
+
+
+# ===== RENDITION SELECTION =====
+
+
+def requested_quality(
+    quality: str | None, *, save_data: str | None, ect: str | None
+) -> str:
+    """
+    Quality level for a stream request: the ``quality`` parameter if given,
+    otherwise derived from the Save-Data and ECT client hints.
+    """
+    levels = sorted(
+        settings.TRANSCODE_QUALITY_KBPS,
+        key=lambda level: settings.TRANSCODE_QUALITY_KBPS[level],
+    )
+    if quality:
+        return quality
+    if (save_data or "").strip().lower() == "on" or (
+        ect or ""
+    ).strip() in SLOW_CONNECTION_TYPES:
+        return levels[0]
+    if (ect or "").strip() == "3g" and len(levels) > 1:
+        return levels[len(levels) // 2]
+    return levels[-1]
+
+
+def select_rendition(renditions: list[Rendition], quality: str) -> Rendition | None:
+    """
+    Best rendition for a quality level: the highest bitrate not above the
+    level's target, else the lowest available. ``None`` means the original.
+    """
+    target = settings.TRANSCODE_QUALITY_KBPS.get(quality)
+    if target is None or not renditions:
+        return None
+    renditions = sorted(renditions, key=lambda rendition: rendition.bitrate_kbps)
+    eligible = [
+        rendition for rendition in renditions if rendition.bitrate_kbps <= target
+    ]
+    return eligible[-1] if eligible else renditions[0]
+
+
+# ===== JOB RUNNER =====
+
+
+class MediaJobRunner:
+    """Claims queued media jobs and runs their tasks on a process pool"""
+
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.executor = self._start_pool()
+        self.lock = threading.Lock()
+        # Job ID -> number of its tasks still queued or running
+        self.outstanding: dict[uuid.UUID, int] = {}
+        # Jobs with tasks lost to a broken pool, requeued once all are done
+        self.broken: set[uuid.UUID] = set()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        # Spawned workers don't inherit the API process's DB pool or sockets
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def dispatch(self) -> int:
+        """Claim enough pending jobs to keep every worker busy, returns how many"""
+        with self.lock:
+            idle = self.workers - sum(self.outstanding.values())
+        if idle <= 0:
+            return 0
+        tasks_total = media_task_count()
+        with Session(engine) as session:
+            jobs = crud.claim_media_jobs(
+                session=session, limit=-(-idle // tasks_total), tasks_total=tasks_total
+            )
+        for index, job in enumerate(jobs):
+            tasks = plan_media_tasks(job.source_key, job.source_digest)
+            try:
+                futures = [
+                    self.executor.submit(task.func, *task.args) for task in tasks
+                ]
+            except BrokenProcessPool:
+                # A worker died, e.g. killed for memory, and took the pool down
+                logger.warning("Media job pool broke, starting a new one")
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._start_pool()
+                with Session(engine) as session:
+                    crud.requeue_media_jobs(
+                        session=session,
+                        job_ids=[claimed.id for claimed in jobs[index:]],
+                    )
+                return index
+            with self.lock:
+                self.outstanding[job.id] = len(tasks)
+            for task, future in zip(tasks, futures, strict=True):
+                future.add_done_callback(partial(self._task_done, job.id, task))
+        return len(jobs)
+
+    def _task_done(
+        self, job_id: uuid.UUID, task: MediaTask, future: Future[Any]
+    ) -> None:
+        try:
+            error = None
+            try:
+                result = future.result()
+                if task.on_result:
+                    with Session(engine) as session:
+                        task.on_result(session, result)
+            except CancelledError:
+                # Shutting down, the job is put back in the queue
+                return
+            except BrokenProcessPool:
+                # Requeued below once its other tasks are done, the pool is
+                # started again on the next dispatch
+                with self.lock:
+                    self.broken.add(job_id)
+                return
+            except Exception as e:
+                logger.exception("Media task %s of job %s failed", task.name, job_id)
+                error = f"{task.name}: {e}"
+            with Session(engine) as session:
+                crud.record_media_task(session=session, job_id=job_id, error=error)
+        finally:
+            with self.lock:
+                self.outstanding[job_id] -= 1
+                broken = False
+                if not self.outstanding[job_id]:
+                    del self.outstanding[job_id]
+                    broken = job_id in self.broken
+                    self.broken.discard(job_id)
+            if broken:
+                # The job may have crashed the pool itself, so it counts as
+                # an attempt
+                with Session(engine) as session:
+                    crud.requeue_media_jobs(
+                        session=session,
+                        job_ids=[job_id],
+                        max_attempts=settings.MEDIA_JOB_MAX_ATTEMPTS,
+                    )
+
+    def requeue_stale(self) -> int:
+        """Put back jobs whose runner died before finishing them"""
+        cutoff = datetime.utcnow() - timedelta(
+            seconds=settings.MEDIA_JOB_TIMEOUT_SECONDS
+        )
+        with Session(engine) as session:
+            count = crud.requeue_media_jobs(
+                session=session,
+                started_before=cutoff,
+                max_attempts=settings.MEDIA_JOB_MAX_ATTEMPTS,
+            )
+        if count:
+            logger.warning("Requeued %d stale media jobs", count)
+        return count
+
+    def shutdown(self) -> None:
+        """Stop the pool and queue this runner's unfinished jobs again"""
+        with self.lock:
+            job_ids = list(self.outstanding)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if job_ids:
+            with Session(engine) as session:
+                crud.requeue_media_jobs(session=session, job_ids=job_ids)
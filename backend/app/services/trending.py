@@ -0,0 +1,151 @@
+"""
+Trending songs by exponentially decayed play counts.
+
+Every play adds ``2 ** ((played - reference) / half_life)`` to its song's
+score, so scores never have to be decayed one by one: all of them shrink
+by the same factor as time passes and their order is kept. Dividing by
+``2 ** ((now - reference) / half_life)`` gives the decayed play count, a
+play a half-life ago counts as half a play. The reference is moved
+forward from time to time so the weights stay small.
+
+Scores are updated from this process's plays as they come in, and
+reloaded from the hourly play rollups on an interval, which adds the
+plays of other processes and survives restarts. Plays counted here since
+the rollups' watermark are not in them yet, they are added back on top of
+the reloaded scores. The top songs are ranked on refresh, requests just
+slice that list.
+"""
+
+import heapq
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from collections.abc import Callable
+from datetime import timezone
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+
+logger = logging.getLogger(__name__)
+
+# Half-lives after which the reference time is moved forward
+REBASE_HALF_LIVES = 32
+# Songs whose decayed play count falls below this are forgotten
+MIN_DECAYED_PLAYS = 0.01
+
+
+def _load_rollup_scores(
+    reference: float, half_life: float
+) -> tuple[dict[uuid.UUID, float], float]:
+    """Decayed plays of the rollups and the epoch time they have plays up to"""
+    with Session(engine) as session:
+        scores = crud.get_decayed_song_plays(
+            session=session,
+            reference=reference,
+            half_life=half_life,
+            # Older plays add less than MIN_DECAYED_PLAYS each
+            since=reference - 7 * half_life,
+        )
+        # Read after the scores, a rollup in between only leaves plays out
+        # until the next reload instead of counting them twice
+        watermark = crud.get_play_rollup_watermark(session=session)
+    if watermark is None:
+        return scores, 0.0
+    return scores, watermark.replace(tzinfo=timezone.utc).timestamp()
+
+
+class TrendingEngine:
+    """Decayed play scores per song and the top songs by them"""
+
+    def __init__(
+        self,
+        half_life: float,
+        size: int,
+        load: Callable[
+            [float, float], tuple[dict[uuid.UUID, float], float]
+        ] = _load_rollup_scores,
+    ) -> None:
+        # Seconds for a play to count half
+        self.half_life = half_life
+        # Songs ranked on refresh
+        self.size = size
+        self.load = load
+        self.lock = threading.Lock()
+        self.reference = time.time()
+        self.scores: dict[uuid.UUID, float] = {}
+        self.ranked: list[uuid.UUID] = []
+        # Time counted, song, plays and play time of the plays added since
+        # the last reload, oldest first
+        self.added: deque[tuple[float, uuid.UUID, int, float]] = deque()
+
+    def _weight(self, at: float) -> float:
+        return 2 ** ((at - self.reference) / self.half_life)
+
+    def add(self, song_id: uuid.UUID, plays: int = 1, at: float | None = None) -> None:
+        """
+        Count plays of a song at the epoch time ``at``, now by default.
+        Later times count as now, a play can't outweigh a current one.
+        """
+        now = time.time()
+        at = now if at is None else min(at, now)
+        with self.lock:
+            self.scores[song_id] = self.scores.get(song_id, 0.0) + plays * self._weight(
+                at
+            )
+            self.added.append((now, song_id, plays, at))
+
+    def decayed_plays(self, song_id: uuid.UUID, now: float | None = None) -> float:
+        with self.lock:
+            return self.scores.get(song_id, 0.0) / self._weight(now or time.time())
+
+    def refresh(self, now: float | None = None) -> None:
+        """Rank the top songs, forgetting songs that are no longer played"""
+        now = now or time.time()
+        with self.lock:
+            if now - self.reference > REBASE_HALF_LIVES * self.half_life:
+                scale = 1 / self._weight(now)
+                self.scores = {
+                    song_id: score * scale for song_id, score in self.scores.items()
+                }
+                self.reference = now
+            threshold = MIN_DECAYED_PLAYS * self._weight(now)
+            self.scores = {
+                song_id: score
+                for song_id, score in self.scores.items()
+                if score >= threshold
+            }
+            self.ranked = heapq.nlargest(
+                self.size, self.scores, key=self.scores.__getitem__
+            )
+
+    def reload(self) -> None:
+        """
+        Replace the scores with those of the rolled up plays of all processes,
+        plus the plays added here that were counted after the rollups' watermark
+        """
+        reference = time.time()
+        scores, watermark = self.load(reference, self.half_life)
+        with self.lock:
+            self.reference = reference
+            while self.added and self.added[0][0] <= watermark:
+                self.added.popleft()
+            for _, song_id, plays, at in self.added:
+                scores[song_id] = scores.get(song_id, 0.0) + plays * self._weight(at)
+            self.scores = scores
+        self.refresh()
+        logger.debug("Loaded trending scores of %d songs", len(scores))
+
+    def top(self, skip: int = 0, limit: int = 50) -> list[uuid.UUID]:
+        """Song IDs ranked by decayed plays as of the last refresh"""
+        return self.ranked[skip : skip + limit]
+
+
+trending = TrendingEngine(
+    half_life=settings.TRENDING_HALF_LIFE_HOURS * 60 * 60,
+    size=settings.TRENDING_SIZE,
+)
@@ -0,0 +1,360 @@
+"""
+Bounded-memory upload pipeline: parse the request body as it arrives, stream
+the file to a scratch file, hash on the fly and commit it to the storage
+backend under the file's content address. Also backs resumable chunked
+uploads.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from collections.abc import AsyncIterator, Collection, Mapping
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import crud
+from app.services.blobs import blob_filename, commit_blob
+from app.services.storage import StorageBackend
+
+if TYPE_CHECKING:
+    from python_multipart.multipart import MultipartCallbacks
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Room for the boundaries, part headers and small fields around a form's
+# file when its Content-Length is checked against the file size limit
+FORM_OVERHEAD = 64 * 1024
+
+
+class InvalidChunk(Exception):
+    """A resumable upload chunk did not have its expected length"""
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded its size limit"""
+
+    def __init__(self, max_size: int) -> None:
+        super().__init__(f"Upload exceeds {max_size} bytes")
+        self.max_size = max_size
+
+
+@dataclass
+class StoredUpload:
+    filename: str
+    key: str
+    size: int
+    sha256: str
+    # The same content had been stored before and was reused
+    deduplicated: bool = False
+
+
+class UnsupportedContentType(Exception):
+    """The uploaded file's declared content type is not allowed"""
+
+    def __init__(self, content_type: str) -> None:
+        super().__init__(f"Content type {content_type!r} is not allowed")
+        self.content_type = content_type
+
+
+class InvalidForm(Exception):
+    """The request body was not a multipart form with the expected file"""
+
+
+@dataclass
+class FormUpload:
+    stored: StoredUpload
+    # As sent by the client
+    original_filename: str
+    content_type: str
+
+
+class _FormFileReceiver:
+    """
+    Multipart parser callbacks keeping the data of the first file sent in
+    ``field``. Other parts are skipped as they go by.
+    """
+
+    def __init__(
+        self, field: str, content_types: Collection[str], max_size: int
+    ) -> None:
+        self.field = field.encode()
+        self.content_types = content_types
+        self.max_size = max_size
+        self.header_name = b""
+        self.header_value = b""
+        self.headers: dict[bytes, bytes] = {}
+        self.receiving = False
+        self.complete = False
+        self.filename = ""
+        self.content_type = ""
+        self.size = 0
+        # Data received since it was last written out
+        self.pending: list[bytes] = []
+
+    def callbacks(self) -> "MultipartCallbacks":
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self.header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self.header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self.headers[self.header_name.lower()] = self.header_value
+        self.header_name = self.header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if (
+            self.complete
+            or options.get(b"name") != self.field
+            or b"filename" not in options
+        ):
+            return
+        content_type, _ = parse_options_header(self.headers.get(b"content-type", b""))
+        # Checked before any of the file is written
+        if content_type.decode("latin-1") not in self.content_types:
+            raise UnsupportedContentType(content_type.decode("latin-1"))
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.content_type = content_type.decode("latin-1")
+        self.receiving = True
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self.receiving:
+            return
+        self.size += end - start
+        if self.size > self.max_size:
+            raise UploadTooLarge(self.max_size)
+        self.pending.append(data[start:end])
+
+    def on_part_end(self) -> None:
+        if self.receiving:
+            self.receiving = False
+            self.complete = True
+
+
+def _scratch_file(directory: Path) -> tuple[BinaryIO, Path]:
+    # Keep the scratch dir on the storage volume so local commits are a rename
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".part")
+    return os.fdopen(fd, "wb"), Path(tmp_name)
+
+
+def _append(out: BinaryIO, digest: "hashlib._Hash", pieces: list[bytes]) -> None:
+    for piece in pieces:
+        digest.update(piece)
+        out.write(piece)
+
+
+def _finish(out: BinaryIO) -> None:
+    out.flush()
+    os.fsync(out.fileno())
+
+
+async def save_form_upload(
+    headers: Mapping[str, str],
+    body: AsyncIterator[bytes],
+    storage: StorageBackend,
+    prefix: str,
+    *,
+    field: str,
+    content_types: Collection[str],
+    scratch_dir: Path,
+    max_size: int,
+) -> FormUpload:
+    """
+    Parse a multipart/form-data request ``body`` as it arrives and copy the
+    file in ``field`` into the blob store under ``prefix``, staging it in
+    ``scratch_dir``.
+
+    Requests whose Content-Length exceeds the limit are refused before any
+    of the body is read. Only the file's data is written, once, while memory
+    stays bounded by the network buffer, all I/O runs on the threadpool and
+    the blob only appears once the whole file has been written.
+    Raises ``UploadTooLarge`` as soon as the limit is crossed,
+    ``UnsupportedContentType`` when the file's type is not one of
+    ``content_types`` and ``InvalidForm`` for anything else that is not an
+    upload of that file.
+    """
+    content_length = headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_size + FORM_OVERHEAD:
+        raise UploadTooLarge(max_size)
+    _, params = parse_options_header(headers.get("content-type", ""))
+    if b"boundary" not in params:
+        raise InvalidForm("Expected a multipart/form-data body")
+
+    receiver = _FormFileReceiver(field, content_types, max_size)
+    parser = MultipartParser(params[b"boundary"], receiver.callbacks())
+    digest = hashlib.sha256()
+    out, tmp_path = await run_in_threadpool(_scratch_file, scratch_dir)
+    try:
+        try:
+            received = 0
+            async for chunk in body:
+                # Bodies without a Content-Length are bounded too
+                received += len(chunk)
+                if received > max_size + FORM_OVERHEAD:
+                    raise UploadTooLarge(max_size)
+                parser.write(chunk)
+                if receiver.pending:
+                    pieces, receiver.pending = receiver.pending, []
+                    await run_in_threadpool(_append, out, digest, pieces)
+            parser.finalize()
+            if not receiver.complete:
+                raise InvalidForm(f"Expected a file in the '{field}' field")
+            await run_in_threadpool(_finish, out)
+        finally:
+            await run_in_threadpool(out.close)
+        stored = await _commit(
+            storage,
+            tmp_path,
+            prefix,
+            suffix=Path(receiver.filename).suffix,
+            content_type=receiver.content_type,
+            size=receiver.size,
+            sha256=digest.hexdigest(),
+        )
+    except MultipartParseError as e:
+        tmp_path.unlink(missing_ok=True)
+        raise InvalidForm(str(e)) from e
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return FormUpload(
+        stored=stored,
+        original_filename=receiver.filename,
+        content_type=receiver.content_type,
+    )
+
+
+async def _commit(
+    storage: StorageBackend,
+    tmp_path: Path,
+    prefix: str,
+    *,
+    suffix: str,
+    content_type: str | None,
+    size: int,
+    sha256: str,
+) -> StoredUpload:
+    """
+    Store ``tmp_path`` as the blob of its content. The file is removed once
+    the blob is stored and left in place if storing it fails.
+    """
+    filename = blob_filename(sha256, suffix)
+    key, deduplicated = await run_in_threadpool(
+        commit_blob, storage, tmp_path, prefix, filename, content_type=content_type
+    )
+    await run_in_threadpool(tmp_path.unlink, missing_ok=True)
+    return StoredUpload(
+        filename=filename, key=key, size=size, sha256=sha256, deduplicated=deduplicated
+    )
+
+
+# ===== RESUMABLE UPLOADS =====
+
+
+def allocate_partial(path: Path, size: int) -> None:
+    """Create the sparse file that chunks of a resumable upload are written into"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+async def write_chunk(
+    path: Path, *, offset: int, length: int, body: AsyncIterator[bytes]
+) -> None:
+    """
+    Write a request body stream at ``offset`` of a partial upload. Pieces are
+    written as they arrive, so memory stays bounded by the network buffer.
+    Raises ``InvalidChunk`` unless exactly ``length`` bytes were received.
+    """
+    fd = await run_in_threadpool(os.open, path, os.O_WRONLY)
+    try:
+        position = offset
+        async for piece in body:
+            if position + len(piece) > offset + length:
+                raise InvalidChunk(f"Chunk at offset {offset} exceeds {length} bytes")
+            await run_in_threadpool(os.pwrite, fd, piece, position)
+            position += len(piece)
+        if position != offset + length:
+            raise InvalidChunk(f"Chunk at offset {offset} must be {length} bytes")
+    finally:
+        os.close(fd)
+
+
+def _hash_file(path: Path) -> tuple[int, str]:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest()
+
+
+async def commit_partial(
+    path: Path,
+    storage: StorageBackend,
+    prefix: str,
+    *,
+    suffix: str,
+    content_type: str | None = None,
+) -> StoredUpload:
+    """
+    Hash an assembled resumable upload and store it under ``prefix``. The
+    partial file is kept if storing fails, so the completion can be retried.
+    """
+    size, sha256 = await run_in_threadpool(_hash_file, path)
+    return await _commit(
+        storage,
+        path,
+        prefix,
+        suffix=suffix,
+        content_type=content_type,
+        size=size,
+        sha256=sha256,
+    )
+
+
+def sweep_expired_upload_sessions(
+    session: Session, partial_dir: Path, completion_timeout: timedelta
+) -> int:
+    """
+    Drop expired upload sessions together with their partial files, and
+    reopen sessions that have been completing for longer than
+    ``completion_timeout``
+    """
+    stalled = crud.reopen_stalled_upload_sessions(
+        session=session, started_before=datetime.utcnow() - completion_timeout
+    )
+    if stalled:
+        logger.warning("Reopened %d upload sessions stuck completing", len(stalled))
+    expired = crud.delete_expired_upload_sessions(session=session)
+    for upload_id in expired:
+        (partial_dir / f"{upload_id}.part").unlink(missing_ok=True)
+    if expired:
+        logger.info("Swept %d expired upload sessions", len(expired))
+    return len(expired)
@@ -0,0 +1,76 @@
+"""
+Short-lived cache of users' stats.
+
+Stats are counted in one query, but clients poll them, so each process
+keeps them for a little while. Likes, follows, library and playlist
+changes invalidate the stats of the users they change, the ones made
+through other processes show up once the cached stats expire.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable
+
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import UserStatsPublic
+
+
+def _load_user_stats(session: Session, user_id: uuid.UUID) -> UserStatsPublic:
+    return crud.get_user_stats(session=session, user_id=user_id)
+
+
+class UserStatsCache:
+    def __init__(
+        self,
+        ttl: float,
+        max_users: int,
+        load: Callable[[Session, uuid.UUID], UserStatsPublic] = _load_user_stats,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        # Seconds stats are served from the cache
+        self.ttl = ttl
+        # Beyond this, the stats cached longest ago are dropped
+        self.max_users = max_users
+        self.load = load
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Expiry and stats per user, in the order they were cached
+        self.cached: OrderedDict[uuid.UUID, tuple[float, UserStatsPublic]] = (
+            OrderedDict()
+        )
+        # Bumped by every invalidation, stats loaded meanwhile aren't cached
+        self.generation = 0
+
+    def get(self, session: Session, user_id: uuid.UUID) -> UserStatsPublic:
+        now = self.clock()
+        with self.lock:
+            cached = self.cached.get(user_id)
+            if cached and cached[0] > now:
+                return cached[1]
+            generation = self.generation
+        stats = self.load(session, user_id)
+        with self.lock:
+            if generation == self.generation:
+                self.cached[user_id] = (now + self.ttl, stats)
+                self.cached.move_to_end(user_id)
+                while len(self.cached) > self.max_users:
+                    self.cached.popitem(last=False)
+        return stats
+
+    def invalidate(self, *user_ids: uuid.UUID) -> None:
+        """Drop the stats of users whose likes, follows etc. changed"""
+        with self.lock:
+            self.generation += 1
+            for user_id in user_ids:
+                self.cached.pop(user_id, None)
+
+
+user_stats = UserStatsCache(
+    ttl=settings.USER_STATS_CACHE_SECONDS,
+    max_users=settings.USER_STATS_CACHE_MAX_USERS,
+)
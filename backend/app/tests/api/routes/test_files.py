@@ -0,0 +1,97 @@
+import hashlib
+import os
+from collections.abc import Generator
+from email.utils import formatdate
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.main import app
+from app.services.blobs import blob_filename, blob_key
+from app.services.storage import LocalStorage, get_storage
+
+CONTENT = os.urandom(600_000)
+FILENAME = blob_filename(hashlib.sha256(CONTENT).hexdigest(), ".mp3")
+URL = f"{settings.API_V1_STR}/files/songs/{FILENAME}"
+ETAG = f'"{hashlib.sha256(CONTENT).hexdigest()}"'
+
+
+@pytest.fixture(scope="module")
+def storage_client(
+    tmp_path_factory: pytest.TempPathFactory,
+) -> Generator[TestClient, None, None]:
+    root = tmp_path_factory.mktemp("storage")
+    path = root / blob_key("songs", FILENAME)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(CONTENT)
+    app.dependency_overrides[get_storage] = lambda: LocalStorage(Path(root))
+    # Not entered, the lifespan's background jobs need the database
+    yield TestClient(app)
+    del app.dependency_overrides[get_storage]
+
+
+def test_whole_song(storage_client: TestClient) -> None:
+    r = storage_client.get(URL)
+
+    assert r.status_code == 200
+    assert r.content == CONTENT
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"] == ETAG
+
+
+def test_single_range(storage_client: TestClient) -> None:
+    # Crosses a read chunk boundary
+    r = storage_client.get(URL, headers={"Range": "bytes=200000-299999"})
+
+    assert r.status_code == 206
+    assert r.headers["content-range"] == f"bytes 200000-299999/{len(CONTENT)}"
+    assert r.content == CONTENT[200_000:300_000]
+
+
+def test_multiple_ranges(storage_client: TestClient) -> None:
+    r = storage_client.get(URL, headers={"Range": "bytes=0-9, -10"})
+
+    assert r.status_code == 206
+    media_type, boundary = r.headers["content-type"].split("; boundary=")
+    assert media_type == "multipart/byteranges"
+    size = len(CONTENT)
+    assert r.content == (
+        f"\r\n--{boundary}\r\nContent-Type: audio/mpeg\r\n"
+        f"Content-Range: bytes 0-9/{size}\r\n\r\n".encode()
+        + CONTENT[:10]
+        + f"\r\n--{boundary}\r\nContent-Type: audio/mpeg\r\n"
+        f"Content-Range: bytes {size - 10}-{size - 1}/{size}\r\n\r\n".encode()
+        + CONTENT[-10:]
+        + f"\r\n--{boundary}--\r\n".encode()
+    )
+
+
+def test_unsatisfiable_range(storage_client: TestClient) -> None:
+    r = storage_client.get(URL, headers={"Range": f"bytes={len(CONTENT)}-"})
+
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize(
+    "if_range",
+    ['"0000"', formatdate(0, usegmt=True)],
+    ids=["etag", "date"],
+)
+def test_stale_if_range_sends_whole_song(
+    storage_client: TestClient, if_range: str
+) -> None:
+    r = storage_client.get(URL, headers={"Range": "bytes=0-9", "If-Range": if_range})
+
+    assert r.status_code == 200
+    assert "content-range" not in r.headers
+    assert r.content == CONTENT
+
+
+def test_matching_if_range_sends_range(storage_client: TestClient) -> None:
+    r = storage_client.get(URL, headers={"Range": "bytes=0-9", "If-Range": ETAG})
+
+    assert r.status_code == 206
+    assert r.content == CONTENT[:10]
@@ -0,0 +1,17 @@
+from datetime import date
+
+from app import crud
+from app.crud.analytics import PLAY_HISTORY_PARTITION, PLAY_HISTORY_PARTITION_PATTERN
+
+
+def test_add_months_crosses_years() -> None:
+    assert crud.add_months(date(2026, 10, 18), 3) == date(2027, 1, 1)
+    assert crud.add_months(date(2026, 1, 31), -13) == date(2024, 12, 1)
+    assert crud.add_months(date(2026, 12, 1), 0) == date(2026, 12, 1)
+
+
+def test_partition_names_round_trip() -> None:
+    name = PLAY_HISTORY_PARTITION.format(date(2026, 3, 1), date(2026, 3, 1))
+
+    assert name == "playhistory_y2026m03"
+    assert PLAY_HISTORY_PARTITION_PATTERN.fullmatch(name)
@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+
+from app import crud
+from app.models import UploadSession
+
+
+def _upload(total_size: int, chunk_size: int) -> UploadSession:
+    upload = UploadSession(
+        filename="master.flac",
+        content_type="audio/flac",
+        total_size=total_size,
+        owner_id=uuid.uuid4(),
+        chunk_size=chunk_size,
+        expires_at=datetime.utcnow(),
+    )
+    upload.received_chunks = bytes(-(-crud.upload_chunk_count(upload) // 8))
+    return upload
+
+
+def test_upload_chunk_layout() -> None:
+    upload = _upload(total_size=25, chunk_size=10)
+    assert crud.upload_chunk_count(upload) == 3
+    assert [crud.upload_chunk_length(upload, i) for i in range(3)] == [10, 10, 5]
+
+
+def test_upload_missing_offsets_and_received_bytes() -> None:
+    upload = _upload(total_size=25, chunk_size=10)
+    assert crud.get_upload_missing_offsets(upload) == [0, 10, 20]
+    assert crud.get_upload_received_bytes(upload) == 0
+
+    bitmap = bytearray(upload.received_chunks)
+    bitmap[0] |= 0b101
+    upload.received_chunks = bytes(bitmap)
+
+    assert crud.is_upload_chunk_received(upload, 2)
+    assert crud.get_upload_missing_offsets(upload) == [10]
+    assert crud.get_upload_received_bytes(upload) == 15
@@ -0,0 +1,56 @@
+import uuid
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.models import MediaJob, MediaJobStatus
+
+
+@pytest.fixture(scope="module")
+def db() -> Generator[Session, None, None]:
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Needs the database")
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def running_job(db: Session) -> Generator[MediaJob, None, None]:
+    job = crud.enqueue_media_job(
+        session=db, source_key="songs/k", source_digest=uuid.uuid4().hex
+    )
+    job.status = MediaJobStatus.RUNNING
+    db.add(job)
+    db.commit()
+    yield job
+    db.delete(job)
+    db.commit()
+
+
+@pytest.mark.parametrize(
+    "attempts, status",
+    [(1, MediaJobStatus.PENDING), (3, MediaJobStatus.FAILED)],
+    ids=["retried", "given-up"],
+)
+def test_requeue_fails_jobs_out_of_attempts(
+    db: Session, running_job: MediaJob, attempts: int, status: MediaJobStatus
+) -> None:
+    running_job.attempts = attempts
+    db.add(running_job)
+    db.commit()
+
+    count = crud.requeue_media_jobs(
+        session=db, job_ids=[running_job.id], max_attempts=3
+    )
+
+    db.refresh(running_job)
+    assert count == 1
+    assert running_job.status == status
+    assert (running_job.finished_at is not None) == (status == MediaJobStatus.FAILED)
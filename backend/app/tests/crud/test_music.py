@@ -0,0 +1,83 @@
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.models import AlbumCreate, Artist, ArtistCreate, SongCreate, TargetType
+from app.services.normalize import search_key
+from app.tests.utils.utils import random_lower_string
+
+
+@pytest.fixture(scope="module")
+def db() -> Generator[Session, None, None]:
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Needs the database")
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def artist(db: Session) -> Generator[Artist, None, None]:
+    artist = crud.create_artist(
+        session=db, artist_create=ArtistCreate(stage_name=random_lower_string())
+    )
+    yield artist
+    for song in artist.songs:
+        crud.delete_song(session=db, song_id=song.id)
+    for album in artist.albums:
+        crud.delete_album(session=db, album_id=album.id)
+    crud.delete_artist(session=db, artist_id=artist.id)
+
+
+def test_search_text_escapes_highlights(db: Session, artist: Artist) -> None:
+    word = random_lower_string()
+    album = crud.create_album(
+        session=db, album_create=AlbumCreate(title="Tags", artist_id=artist.id)
+    )
+    crud.create_song(
+        session=db,
+        song_create=SongCreate(
+            title="Tags",
+            duration_ms=1000,
+            lyrics=f'<script>alert("{word}")</script> & {word}',
+            album_id=album.id,
+            artist_id=artist.id,
+        ),
+    )
+
+    [hit] = crud.search_text(session=db, target_type=TargetType.SONG, query=word)
+
+    assert "<script>" not in hit.highlight
+    assert (
+        f"&lt;script&gt;alert(&quot;<b>{word}</b>&quot;)&lt;/script&gt;"
+        in hit.highlight
+    )
+    assert f"&amp; <b>{word}</b>" in hit.highlight
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "周杰伦 (Jay Chou)",
+        "宇多田ヒカル・ガロン",
+        "방탄소년단「BTS」",
+        "Кино — Группа крови",
+        "Сергей Лазарев №1",
+        "Sơn Tùng M-TP",
+        "Đen Vâu, Hồ Ngọc Hà",
+        "अरिजीत सिंह",
+        "Beyoncé ♥ ﬁ_2²",
+    ],
+)
+def test_search_keys_match_the_database(db: Session, name: str) -> None:
+    artist = crud.create_artist(session=db, artist_create=ArtistCreate(stage_name=name))
+    try:
+        assert artist.search_key == search_key(name)
+    finally:
+        crud.delete_artist(session=db, artist_id=artist.id)
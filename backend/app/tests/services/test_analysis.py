@@ -0,0 +1,98 @@
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services import analysis
+from app.services.analysis import (
+    SAMPLE_RATE,
+    analyse_samples,
+    analyse_song,
+    select_resolution,
+    split_peaks,
+)
+from app.services.ffmpeg import find_ffmpeg
+from app.services.storage import LocalStorage
+
+
+def _sine(frequency: float, seconds: float, amplitude: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    wave = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return np.stack([wave, wave], axis=1)
+
+
+def test_analyse_samples_measures_reference_tone() -> None:
+    # A 1 kHz tone at -6 dBFS in both channels reads -6 LUFS per BS.1770
+    result = analyse_samples(_sine(1000, 5, 0.5), [100, 400])
+
+    assert result.loudness_lufs == pytest.approx(-6.02, abs=0.05)
+    assert result.gain_db == pytest.approx(-11.98, abs=0.05)
+    assert result.peak == pytest.approx(0.5, abs=1e-3)
+    assert result.resolutions == [100, 400]
+    assert len(result.peaks) == 500
+    assert set(split_peaks(result.peaks, result.resolutions)[100]) == {128}
+
+
+def test_analyse_samples_tracks_envelope() -> None:
+    samples = np.concatenate([_sine(440, 2, 0.1), _sine(440, 2, 0.8)])
+
+    result = analyse_samples(samples, [4])
+
+    assert list(result.peaks) == [26, 26, 204, 204]
+
+
+def test_analyse_samples_caps_resolution_and_handles_silence() -> None:
+    # 50 ms of silence: 5 peak windows and no loudness block
+    result = analyse_samples(
+        np.zeros((SAMPLE_RATE // 20, 2), dtype=np.float32), [4, 256]
+    )
+
+    assert result.resolutions == [4, 5]
+    assert result.loudness_lufs is None
+    assert result.gain_db is None
+    assert result.peaks == bytes(9)
+
+    empty = analyse_samples(np.zeros((0, 2), dtype=np.float32), [256])
+    assert (empty.resolutions, empty.peaks, empty.peak) == ([], b"", 0.0)
+
+
+def test_select_resolution() -> None:
+    assert select_resolution([256, 1024, 4096], 300) == 1024
+    assert select_resolution([256, 1024, 4096], 10000) == 4096
+    assert select_resolution([256, 1024, 4096], None) == 4096
+    assert select_resolution([], 256) is None
+
+
+@pytest.mark.skipif(find_ffmpeg() is None, reason="ffmpeg is not installed")
+def test_analyse_song_decodes_blob(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ffmpeg = find_ffmpeg()
+    assert ffmpeg is not None
+    storage = LocalStorage(tmp_path / "store")
+    monkeypatch.setattr(analysis, "get_storage", lambda: storage)
+    monkeypatch.setattr(settings, "WAVEFORM_RESOLUTIONS", [256, 1024])
+    source = tmp_path / "track.flac"
+    subprocess.run(
+        [
+            ffmpeg,
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=frequency=1000:duration=3",
+            str(source),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    storage.put_file("songs/track.flac", source)
+
+    result = analyse_song("songs/track.flac")
+
+    # lavfi's sine is 1/8 of full scale, upmixed to stereo at -3 dB
+    assert result.loudness_lufs == pytest.approx(-21.07, abs=0.1)
+    assert result.peak == pytest.approx(0.125 / np.sqrt(2), abs=1e-3)
+    # 3 s give 300 peak windows, so the larger resolutions are capped to that
+    assert result.resolutions == [256, 300]
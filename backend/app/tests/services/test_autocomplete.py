@@ -0,0 +1,122 @@
+import random
+import uuid
+from collections.abc import Iterator
+
+import pytest
+
+from app.models import Album, Artist, Song, TargetType
+from app.services.autocomplete import Autocomplete, CatalogRow, Suggestion, _Index
+
+
+def _row(target_type: TargetType, name: str, popularity: int) -> CatalogRow:
+    return target_type, uuid.uuid4(), name, popularity
+
+
+def _names(suggestions: list[Suggestion]) -> list[str]:
+    return [suggestion.name for suggestion in suggestions]
+
+
+def test_suggestions_match_any_word_most_popular_first() -> None:
+    rows = [
+        _row(TargetType.ARTIST, "Sơn Tùng M-TP", 900),
+        _row(TargetType.SONG, "Lạc Trôi", 500),
+        _row(TargetType.SONG, "Chúng Ta Của Hiện Tại", 700),
+        _row(TargetType.PLAYLIST, "Tùng's  hits", 100),
+        _row(TargetType.ALBUM, "m-tp M-TP", 50),
+    ]
+    autocomplete = Autocomplete(load=lambda: rows)
+    autocomplete.rebuild()
+
+    assert _names(autocomplete.suggest("tùng")) == ["Sơn Tùng M-TP", "Tùng's  hits"]
+    assert _names(autocomplete.suggest("SON tung")) == ["Sơn Tùng M-TP"]
+    assert _names(autocomplete.suggest("M TP")) == ["Sơn Tùng M-TP", "m-tp M-TP"]
+    assert _names(autocomplete.suggest("ta", types=[TargetType.SONG])) == [
+        "Chúng Ta Của Hiện Tại"
+    ]
+    assert _names(autocomplete.suggest("l", limit=1)) == ["Lạc Trôi"]
+    assert autocomplete.suggest("  !! ") == []
+    assert autocomplete.suggest("tùng", limit=0) == []
+    assert autocomplete.suggest("tùng", limit=-1) == []
+
+
+def test_type_filter_only_reads_the_indexes_of_those_types(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    rows = [_row(TargetType.ARTIST, f"Love {i}", 1000 + i) for i in range(1000)]
+    rows.append(_row(TargetType.SONG, "Love Story", 1))
+    autocomplete = Autocomplete(load=lambda: rows)
+    autocomplete.rebuild()
+    artists = autocomplete.indexes[TargetType.ARTIST]
+    searched: list[str] = []
+    best = artists.best
+
+    def tracked_best(prefix: str) -> Iterator[Suggestion]:
+        searched.append(prefix)
+        return best(prefix)
+
+    monkeypatch.setattr(artists, "best", tracked_best)
+
+    assert _names(autocomplete.suggest("love", types=[TargetType.SONG])) == [
+        "Love Story"
+    ]
+    assert searched == []
+    assert len(autocomplete.suggest("love", limit=3)) == 3
+    assert searched == ["love"]
+
+
+def test_best_yields_the_whole_range_by_popularity() -> None:
+    rng = random.Random(1)
+    suggestions = [
+        Suggestion(
+            TargetType.SONG, uuid.uuid4(), f"{rng.choice('abc')}{i}", rng.randrange(100)
+        )
+        for i in range(300)
+    ]
+    index = _Index(suggestions)
+
+    found = list(index.best("b"))
+
+    expected = [
+        suggestion for suggestion in suggestions if suggestion.name.startswith("b")
+    ]
+    assert sorted(found, key=id) == sorted(expected, key=id)
+    assert [s.popularity for s in found] == sorted(
+        (s.popularity for s in found), reverse=True
+    )
+
+
+def test_changes_are_merged_until_the_next_rebuild() -> None:
+    rows = [_row(TargetType.SONG, "Hello", 10), _row(TargetType.SONG, "Help", 5)]
+    autocomplete = Autocomplete(load=lambda: rows)
+    autocomplete.rebuild()
+    _, hello_id, _, _ = rows[0]
+
+    autocomplete.put(Song(id=hello_id, title="Goodbye", play_count=10))
+    autocomplete.put(Artist(stage_name="Helen", monthly_listeners=7))
+    autocomplete.put(Album(title="Help me", is_public=False))
+
+    assert _names(autocomplete.suggest("hel")) == ["Helen", "Help"]
+    assert _names(autocomplete.suggest("good")) == ["Goodbye"]
+
+    autocomplete.remove(TargetType.SONG, hello_id)
+    assert autocomplete.suggest("good") == []
+
+    # The catalog now has what was changed
+    rows[:] = [_row(TargetType.ARTIST, "Helen", 7)]
+    autocomplete.rebuild()
+    assert _names(autocomplete.suggest("hel")) == ["Helen"]
+    assert autocomplete.changes == {}
+
+
+def test_changes_made_while_loading_are_kept() -> None:
+    added = Artist(stage_name="Late", monthly_listeners=1)
+
+    def load() -> list[CatalogRow]:
+        autocomplete.put(added)
+        return [_row(TargetType.SONG, "Early", 1)]
+
+    autocomplete = Autocomplete(load=load)
+    autocomplete.rebuild()
+
+    assert _names(autocomplete.suggest("la")) == ["Late"]
+    assert _names(autocomplete.suggest("ea")) == ["Early"]
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from app.services.blobs import (
+    blob_digest,
+    blob_filename,
+    blob_key,
+    collect_garbage,
+    commit_blob,
+)
+from app.services.storage import LocalStorage
+
+DIGEST = hashlib.sha256(b"song").hexdigest()
+
+
+def test_blob_key_fans_out_by_digest() -> None:
+    filename = blob_filename(DIGEST, ".MP3")
+    assert filename == f"{DIGEST}.mp3"
+    assert blob_digest(filename) == DIGEST
+    assert blob_key("songs", filename) == f"songs/{DIGEST[:2]}/{DIGEST[2:4]}/{filename}"
+
+
+def test_legacy_filenames_stay_flat() -> None:
+    filename = "0b7e7c1e-3c39-4a53-9c1e-0e4c8b1a2f4d.mp3"
+    assert blob_digest(filename) is None
+    assert blob_key("songs", filename) == f"songs/{filename}"
+
+
+def test_commit_blob_deduplicates(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    filename = blob_filename(DIGEST, ".mp3")
+    first = tmp_path / "first.part"
+    first.write_bytes(b"song")
+    second = tmp_path / "second.part"
+    second.write_bytes(b"song")
+
+    key, duplicate = commit_blob(storage, first, "songs", filename)
+    assert not duplicate
+    path = tmp_path / key
+    os.utime(path, (0, 0))
+
+    again, duplicate = commit_blob(storage, second, "songs", filename)
+    assert duplicate
+    assert again == key
+    assert not second.exists()
+    assert path.stat().st_mtime > 0
+
+
+def test_collect_garbage_keeps_referenced_and_recent_blobs(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    digests = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(3)]
+    paths = [tmp_path / blob_key("songs", blob_filename(d, ".mp3")) for d in digests]
+    for path in paths:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * 10)
+    old = time.time() - 3600
+    for path in paths[:2]:
+        os.utime(path, (old, old))
+
+    result = collect_garbage(storage, "songs", {digests[0]}, grace=timedelta(minutes=5))
+
+    assert (result.scanned, result.deleted, result.freed_bytes) == (3, 1, 10)
+    assert paths[0].exists()
+    assert not paths[1].exists()
+    assert paths[2].exists()
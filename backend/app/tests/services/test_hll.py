@@ -0,0 +1,48 @@
+import uuid
+
+import pytest
+
+from app.services.hll import HyperLogLog, relative_error
+
+
+@pytest.mark.parametrize("count", [0, 1, 100, 5000, 100_000])
+def test_count_is_within_error_bound(count: int) -> None:
+    sketch = HyperLogLog(12)
+    sketch.update(uuid.UUID(int=i) for i in range(count))
+
+    # Three standard errors, the odd small count is exact
+    assert sketch.count() == pytest.approx(count, rel=3 * relative_error(12), abs=1)
+
+
+def test_repeated_values_count_once() -> None:
+    sketch = HyperLogLog(10)
+    listeners = [uuid.uuid4() for _ in range(50)]
+    for _ in range(20):
+        sketch.update(listeners)
+
+    assert sketch.count() == pytest.approx(50, abs=2)
+
+
+def test_merge_counts_the_union() -> None:
+    first, second = HyperLogLog(12), HyperLogLog(12)
+    first.update(uuid.UUID(int=i) for i in range(0, 3000))
+    second.update(uuid.UUID(int=i) for i in range(2000, 5000))
+
+    first.merge(second)
+    merged_again = HyperLogLog.from_bytes(first.to_bytes())
+    merged_again.merge(second)
+
+    assert first.count() == pytest.approx(5000, rel=3 * relative_error(12))
+    assert merged_again.count() == first.count()
+
+
+def test_sketches_round_trip_and_check_precision() -> None:
+    sketch = HyperLogLog(8)
+    sketch.add(uuid.uuid4())
+
+    loaded = HyperLogLog.from_bytes(sketch.to_bytes())
+
+    assert loaded.precision == 8
+    assert loaded.count() == 1
+    with pytest.raises(ValueError):
+        loaded.merge(HyperLogLog(12))
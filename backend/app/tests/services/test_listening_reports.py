@@ -0,0 +1,44 @@
+import uuid
+
+from app.services.listening_reports import _chunk_users, summarize_user
+
+
+def test_user_report_ranks_songs_artists_and_genres() -> None:
+    user_id = uuid.uuid4()
+    songs = [uuid.uuid4() for _ in range(3)]
+    artist_a, artist_b = uuid.uuid4(), uuid.uuid4()
+    rock = uuid.uuid4()
+    rows = [
+        (user_id, songs[0], artist_a, rock, 10, 10 * 180_000),
+        (user_id, songs[1], artist_b, None, 4, 4 * 240_000),
+        (user_id, songs[2], artist_b, rock, 7, 7 * 120_000),
+    ]
+
+    report = summarize_user(2026, user_id, rows, top_n=2)
+
+    assert (report["total_plays"], report["minutes_listened"]) == (21, 30 + 16 + 14)
+    assert (report["distinct_songs"], report["distinct_artists"]) == (3, 2)
+    assert report["top_songs"] == [
+        {"id": songs[0], "plays": 10, "minutes": 30},
+        {"id": songs[2], "plays": 7, "minutes": 14},
+    ]
+    assert [entry["id"] for entry in report["top_artists"]] == [artist_b, artist_a]
+    assert report["top_genres"] == [{"id": rock, "plays": 17, "minutes": 44}]
+
+
+def test_chunks_keep_users_whole() -> None:
+    users = sorted(uuid.uuid4() for _ in range(5))
+    rows = [
+        (user_id, uuid.uuid4(), uuid.uuid4(), None, 1, 1000)
+        for user_id in users
+        for _ in range(3)
+    ]
+
+    chunks = list(_chunk_users(iter(rows), chunk_users=2))
+
+    assert [[user_id for user_id, _ in chunk] for chunk, _ in chunks] == [
+        users[0:2],
+        users[2:4],
+        users[4:],
+    ]
+    assert [count for _, count in chunks] == [6, 6, 3]
@@ -0,0 +1,117 @@
+import subprocess
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app.services import metadata
+from app.services.ffmpeg import FFmpegError, find_ffmpeg, find_ffprobe
+from app.services.metadata import extract_metadata, parse_probe
+from app.services.storage import LocalStorage
+
+PROBE: dict[str, Any] = {
+    "streams": [
+        {
+            "index": 0,
+            "codec_type": "audio",
+            "codec_name": "mp3",
+            "sample_rate": "44100",
+            "channels": 2,
+            "bit_rate": "320000",
+            "duration": "215.012245",
+            "tags": {"encoder": "LAME3.100"},
+        },
+        {
+            "index": 1,
+            "codec_type": "video",
+            "codec_name": "mjpeg",
+            "disposition": {"attached_pic": 1},
+        },
+    ],
+    "format": {
+        "format_name": "mp3",
+        "duration": "215.100000",
+        "bit_rate": "321000",
+        "tags": {"TITLE": "Song", "Artist": "Band", "track": "3/12"},
+    },
+}
+
+
+def test_parse_probe_reads_audio_stream_and_tags() -> None:
+    info = parse_probe(PROBE)
+
+    assert info.duration_ms == 215012
+    assert info.bitrate_kbps == 320
+    assert (info.sample_rate, info.channels, info.codec) == (44100, 2, "mp3")
+    assert info.format_name == "mp3"
+    assert info.tags == {
+        "title": "Song",
+        "artist": "Band",
+        "track": "3/12",
+        "encoder": "LAME3.100",
+    }
+    assert info.cover_filename is None
+
+
+def test_parse_probe_falls_back_to_container_values() -> None:
+    stream = {"codec_type": "audio", "codec_name": "flac", "sample_rate": "48000"}
+    info = parse_probe(
+        {"streams": [stream], "format": {"duration": "1.5", "bit_rate": "900000"}}
+    )
+
+    assert info.duration_ms == 1500
+    assert info.bitrate_kbps == 900
+    assert info.channels is None
+
+
+def test_parse_probe_rejects_files_without_audio() -> None:
+    with pytest.raises(FFmpegError):
+        parse_probe({"streams": [PROBE["streams"][1]], "format": {}})
+
+
+@pytest.mark.skipif(
+    find_ffmpeg() is None or find_ffprobe() is None, reason="ffmpeg is not installed"
+)
+def test_extract_metadata_probes_and_stores_cover(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ffmpeg = find_ffmpeg()
+    assert ffmpeg is not None
+    storage = LocalStorage(tmp_path / "store")
+    monkeypatch.setattr(metadata, "get_storage", lambda: storage)
+    cover = tmp_path / "cover.jpg"
+    source = tmp_path / "track.mp3"
+    for command in (
+        ["-f", "lavfi", "-i", "color=size=16x16", "-frames:v", "1", str(cover)],
+        [
+            "-f",
+            "lavfi",
+            "-i",
+            "sine=duration=2",
+            "-i",
+            str(cover),
+            "-map",
+            "0",
+            "-map",
+            "1",
+            "-c:v",
+            "copy",
+            "-disposition:v",
+            "attached_pic",
+            "-metadata",
+            "title=Tone",
+            str(source),
+        ],
+    ):
+        subprocess.run([ffmpeg, *command], check=True, capture_output=True)
+    storage.put_file("songs/track.mp3", source)
+
+    info = extract_metadata("songs/track.mp3")
+
+    assert abs(info.duration_ms - 2000) < 100
+    assert info.codec == "mp3"
+    assert info.tags["title"] == "Tone"
+    assert info.cover_filename and info.cover_filename.endswith(".jpg")
+    assert [path.name for path in (tmp_path / "store" / "covers").rglob("*.jpg")] == [
+        info.cover_filename
+    ]
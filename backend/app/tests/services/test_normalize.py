@@ -0,0 +1,21 @@
+from app.services.normalize import fold_accents, search_key
+
+
+def test_vietnamese_names_fold_to_plain_letters() -> None:
+    assert fold_accents("Sơn Tùng M-TP") == "Son Tung M-TP"
+    assert fold_accents("Đen Vâu, Hồ Ngọc Hà") == "Den Vau, Ho Ngoc Ha"
+    assert fold_accents("Mỹ Tâm ỗ ử") == "My Tam o u"
+
+
+def test_search_keys_ignore_case_accents_and_punctuation() -> None:
+    assert search_key("  SƠN TÙNG   M-TP!! ") == "son tung m tp"
+    assert search_key("Đừng_Làm Trái Tim Anh Đau") == "dung lam trai tim anh dau"
+    assert search_key("Beyoncé — Café ﬁ") == "beyonce cafe fi"
+    assert search_key("?!") == ""
+
+
+def test_search_keys_keep_marks_of_other_scripts() -> None:
+    # The voiced mark of ガ is left after folding, it stays in the word
+    assert search_key("宇多田ヒカル・ガロン") == "宇多田ヒカル カ\u3099ロン"
+    assert search_key("अरिजीत सिंह") == "अरिजीत सिंह"
+    assert search_key("Кино — Группа крови") == "кино группа крови"
@@ -0,0 +1,148 @@
+import hashlib
+import math
+import struct
+import wave
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.services.blobs import collect_derived_garbage
+from app.services.ffmpeg import FFmpegError, find_ffmpeg
+from app.services.packaging import (
+    HLS_PREFIX,
+    MASTER_PLAYLIST,
+    VARIANT_PLAYLIST,
+    hls_key,
+    is_packaged,
+    package_song,
+    publish_package,
+    render_master_playlist,
+)
+from app.services.storage import LocalStorage
+
+DIGEST = hashlib.sha256(b"song").hexdigest()
+
+
+class RecordingStorage(LocalStorage):
+    def __init__(self, root: Path) -> None:
+        super().__init__(root)
+        self.put_keys: list[str] = []
+
+    def put_file(
+        self, key: str, path: Path, *, content_type: str | None = None
+    ) -> None:
+        self.put_keys.append(key)
+        super().put_file(key, path, content_type=content_type)
+
+
+def _write_variant(directory: Path, segments: int) -> None:
+    directory.mkdir(parents=True)
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:6", "#EXT-X-PLAYLIST-TYPE:VOD"]
+    for index in range(segments):
+        (directory / f"seg_{index:05d}.ts").write_bytes(b"\x47" * 188)
+        lines += ["#EXTINF:6.0,", f"seg_{index:05d}.ts"]
+    (directory / VARIANT_PLAYLIST).write_text("\n".join(lines + ["#EXT-X-ENDLIST"]))
+
+
+def _write_sine_wav(path: Path, seconds: float, rate: int = 22050) -> None:
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(
+            b"".join(
+                struct.pack("<h", int(8000 * math.sin(2 * math.pi * 440 * i / rate)))
+                for i in range(int(seconds * rate))
+            )
+        )
+
+
+def test_render_master_playlist_lists_variants_by_bitrate() -> None:
+    playlist = render_master_playlist([128, 64])
+
+    assert playlist.splitlines() == [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-INDEPENDENT-SEGMENTS",
+        '#EXT-X-STREAM-INF:BANDWIDTH=70400,CODECS="mp4a.40.2"',
+        "64k/index.m3u8",
+        '#EXT-X-STREAM-INF:BANDWIDTH=140800,CODECS="mp4a.40.2"',
+        "128k/index.m3u8",
+    ]
+
+
+def test_publish_package_writes_master_playlist_last(tmp_path: Path) -> None:
+    storage = RecordingStorage(tmp_path / "store")
+    _write_variant(tmp_path / "work" / "64k", 2)
+    _write_variant(tmp_path / "work" / "128k", 2)
+
+    publish_package(
+        storage,
+        DIGEST,
+        {64: tmp_path / "work" / "64k", 128: tmp_path / "work" / "128k"},
+    )
+
+    assert storage.put_keys[-1] == hls_key(DIGEST, MASTER_PLAYLIST)
+    assert hls_key(DIGEST, "128k", "seg_00001.ts") in storage.put_keys
+    assert is_packaged(storage, DIGEST)
+
+
+def test_collect_package_garbage_drops_unreferenced_packages(tmp_path: Path) -> None:
+    storage = LocalStorage(tmp_path)
+    other = hashlib.sha256(b"other").hexdigest()
+    for digest in (DIGEST, other):
+        _write_variant(tmp_path / "work" / digest, 1)
+        publish_package(storage, digest, {64: tmp_path / "work" / digest})
+
+    deleted: list[str] = []
+    result = collect_derived_garbage(
+        storage,
+        HLS_PREFIX,
+        {DIGEST},
+        grace=timedelta(0),
+        marker=MASTER_PLAYLIST,
+        on_delete=deleted.append,
+    )
+
+    assert (result.scanned, result.deleted) == (2, 1)
+    assert deleted == [other]
+    assert is_packaged(storage, DIGEST)
+    assert list(storage.list(f"hls/{other}/")) == []
+
+
+def test_package_song_fails_without_encoder(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "FFMPEG_BINARY", "no-such-ffmpeg")
+    source = tmp_path / "track.wav"
+    source.write_bytes(b"RIFF")
+    storage = LocalStorage(tmp_path / "store")
+    storage.put_file("songs/track.wav", source)
+
+    with pytest.raises(FFmpegError):
+        package_song(storage, "songs/track.wav", DIGEST)
+    assert not is_packaged(storage, DIGEST)
+
+
+@pytest.mark.skipif(find_ffmpeg() is None, reason="ffmpeg is not installed")
+def test_package_song_segments_each_bitrate(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "HLS_BITRATES_KBPS", [64, 128])
+    monkeypatch.setattr(settings, "HLS_SEGMENT_SECONDS", 2)
+    storage = LocalStorage(tmp_path / "store")
+    source = tmp_path / "track.wav"
+    _write_sine_wav(source, 5)
+    storage.put_file("songs/track.wav", source)
+
+    assert package_song(storage, "songs/track.wav", DIGEST)
+    assert not package_song(storage, "songs/track.wav", DIGEST)
+
+    for variant in ("64k", "128k"):
+        playlist = (
+            tmp_path / "store" / hls_key(DIGEST, variant, VARIANT_PLAYLIST)
+        ).read_text()
+        assert "#EXT-X-ENDLIST" in playlist
+        assert playlist.count(".ts") >= 2
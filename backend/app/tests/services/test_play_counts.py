@@ -0,0 +1,88 @@
+import threading
+import uuid
+
+import pytest
+
+from app.services.play_counts import PlayCountBuffer
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.batches: list[dict[uuid.UUID, int]] = []
+        self.fail = False
+
+    def __call__(self, counts: dict[uuid.UUID, int]) -> None:
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.batches.append(counts)
+
+
+def test_flush_coalesces_plays_per_song() -> None:
+    writer = FakeWriter()
+    buffer = PlayCountBuffer(writer)
+    first, second = uuid.uuid4(), uuid.uuid4()
+
+    for song_id in (first, second, first, first):
+        buffer.add(song_id)
+
+    assert buffer.metrics().pending_plays == 4
+    assert buffer.flush() == 4
+    assert writer.batches == [{first: 3, second: 1}]
+    assert buffer.flush() == 0
+    assert len(writer.batches) == 1
+
+    metrics = buffer.metrics()
+    assert (metrics.pending_songs, metrics.flushes, metrics.flushed_plays) == (0, 1, 4)
+    assert metrics.last_flush_seconds is not None
+
+
+def test_failed_flush_keeps_counts_for_next_flush() -> None:
+    writer = FakeWriter()
+    buffer = PlayCountBuffer(writer)
+    song_id = uuid.uuid4()
+    buffer.add(song_id, 2)
+
+    writer.fail = True
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    buffer.add(song_id)
+    writer.fail = False
+
+    assert buffer.flush() == 3
+    assert writer.batches == [{song_id: 3}]
+    assert buffer.metrics().failed_flushes == 1
+
+
+def test_full_buffer_flushes_itself() -> None:
+    writer = FakeWriter()
+    buffer = PlayCountBuffer(writer, max_songs=2)
+
+    buffer.add(uuid.uuid4())
+    assert writer.batches == []
+    buffer.add(uuid.uuid4())
+
+    assert len(writer.batches) == 1
+    assert buffer.metrics().pending_songs == 0
+
+
+def test_concurrent_adds_are_not_lost() -> None:
+    writer = FakeWriter()
+    buffer = PlayCountBuffer(writer)
+    song_id = uuid.uuid4()
+
+    def play() -> None:
+        for _ in range(1000):
+            buffer.add(song_id)
+
+    threads = [threading.Thread(target=play) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    flushed = 0
+    while any(thread.is_alive() for thread in threads):
+        flushed += buffer.flush()
+    for thread in threads:
+        thread.join()
+    flushed += buffer.flush()
+
+    assert flushed == 8000
+    assert sum(batch[song_id] for batch in writer.batches) == 8000
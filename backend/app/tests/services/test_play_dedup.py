@@ -0,0 +1,125 @@
+import uuid
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, col, delete
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models import PlayDedupWindow
+from app.services.play_dedup import (
+    MemoryPlayDeduplicator,
+    PostgresPlayDeduplicator,
+    get_play_deduplicator,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_repeat_plays_within_window_are_dropped() -> None:
+    clock = FakeClock()
+    deduplicator = MemoryPlayDeduplicator(max_windows=10, clock=clock)
+    user_id, song_id = uuid.uuid4(), uuid.uuid4()
+
+    assert deduplicator.accept(user_id, song_id, window=30)
+    clock.now += 29
+    assert not deduplicator.accept(user_id, song_id, window=30)
+    # Dropped plays don't extend the window
+    clock.now += 1
+    assert deduplicator.accept(user_id, song_id, window=30)
+
+    metrics = deduplicator.metrics()
+    assert (metrics.accepted, metrics.dropped, metrics.windows) == (2, 1, 1)
+
+
+def test_windows_are_per_user_and_song() -> None:
+    deduplicator = MemoryPlayDeduplicator(max_windows=10, clock=FakeClock())
+    user_id, song_id = uuid.uuid4(), uuid.uuid4()
+
+    assert deduplicator.accept(user_id, song_id, window=30)
+    assert deduplicator.accept(user_id, uuid.uuid4(), window=30)
+    assert deduplicator.accept(uuid.uuid4(), song_id, window=30)
+
+
+def test_released_window_accepts_retry() -> None:
+    deduplicator = MemoryPlayDeduplicator(max_windows=10, clock=FakeClock())
+    user_id, song_id = uuid.uuid4(), uuid.uuid4()
+
+    assert deduplicator.accept(user_id, song_id, window=30)
+    deduplicator.release(user_id, song_id)
+    assert deduplicator.accept(user_id, song_id, window=30)
+
+
+def test_prune_forgets_passed_windows() -> None:
+    clock = FakeClock()
+    deduplicator = MemoryPlayDeduplicator(max_windows=10, clock=clock)
+    user_id = uuid.uuid4()
+    deduplicator.accept(user_id, uuid.uuid4(), window=10)
+    deduplicator.accept(user_id, uuid.uuid4(), window=60)
+
+    clock.now += 30
+    assert deduplicator.prune() == 1
+    assert deduplicator.metrics().windows == 1
+
+
+def test_oldest_windows_are_forgotten_beyond_limit() -> None:
+    deduplicator = MemoryPlayDeduplicator(max_windows=2, clock=FakeClock())
+    user_id = uuid.uuid4()
+    songs = [uuid.uuid4() for _ in range(3)]
+    for song_id in songs:
+        deduplicator.accept(user_id, song_id, window=30)
+
+    assert deduplicator.metrics().windows == 2
+    assert deduplicator.accept(user_id, songs[0], window=30)
+    assert not deduplicator.accept(user_id, songs[2], window=30)
+
+
+@pytest.mark.parametrize(
+    "workers, backend", [(1, "memory"), (4, "postgres")], ids=["one", "several"]
+)
+def test_default_backend_follows_api_workers(
+    monkeypatch: pytest.MonkeyPatch, workers: int, backend: str
+) -> None:
+    monkeypatch.setattr(settings, "PLAY_DEDUP_BACKEND", None)
+    monkeypatch.setattr(settings, "API_WORKERS", workers)
+    get_play_deduplicator.cache_clear()
+    try:
+        assert get_play_deduplicator().backend == backend
+    finally:
+        get_play_deduplicator.cache_clear()
+
+
+@pytest.fixture
+def user_id() -> Generator[uuid.UUID, None, None]:
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("Needs the database")
+    user_id = uuid.uuid4()
+    yield user_id
+    with Session(engine) as session:
+        session.execute(
+            delete(PlayDedupWindow).where(col(PlayDedupWindow.user_id) == user_id)
+        )
+        session.commit()
+
+
+def test_postgres_windows_are_shared_between_workers(user_id: uuid.UUID) -> None:
+    # Each API worker process has its own deduplicator
+    first, second = PostgresPlayDeduplicator(), PostgresPlayDeduplicator()
+    song_id = uuid.uuid4()
+
+    assert first.accept(user_id, song_id, window=30)
+    assert not second.accept(user_id, song_id, window=30)
+    assert not first.accept(user_id, song_id, window=30)
+
+    second.release(user_id, song_id)
+    assert first.accept(user_id, song_id, window=30)
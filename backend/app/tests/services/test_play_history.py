@@ -0,0 +1,95 @@
+import threading
+import uuid
+from collections.abc import Sequence
+
+import pytest
+
+from app.models import PlayHistory
+from app.services import play_history
+from app.services.play_history import PlayHistoryIngestor, PlayHistoryOverloaded
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.batches: list[list[PlayHistory]] = []
+        self.failures = 0
+
+    def __call__(self, plays: Sequence[PlayHistory]) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is down")
+        self.batches.append(list(plays))
+
+
+def _play() -> PlayHistory:
+    return PlayHistory(
+        user_id=uuid.uuid4(), song_id=uuid.uuid4(), duration_played_ms=1000
+    )
+
+
+def test_queued_plays_are_written_in_batches_on_stop() -> None:
+    writer = FakeWriter()
+    ingestor = PlayHistoryIngestor(writer, batch_size=4)
+    plays = [_play() for _ in range(10)]
+    for play in plays:
+        ingestor.submit(play)
+
+    ingestor.start()
+    ingestor.stop(timeout=5)
+
+    assert [len(batch) for batch in writer.batches] == [4, 4, 2]
+    assert [play for batch in writer.batches for play in batch] == plays
+    metrics = ingestor.metrics()
+    assert (metrics.queued, metrics.accepted, metrics.batches, metrics.written) == (
+        0,
+        10,
+        3,
+        10,
+    )
+
+
+def test_full_queue_rejects_plays() -> None:
+    ingestor = PlayHistoryIngestor(FakeWriter(), max_queued=2, submit_timeout=0.01)
+    ingestor.submit(_play())
+    ingestor.submit(_play())
+
+    with pytest.raises(PlayHistoryOverloaded):
+        ingestor.submit(_play())
+    assert ingestor.metrics().rejected == 1
+
+
+def test_failed_batches_are_retried(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(play_history, "RETRY_INITIAL_SECONDS", 0.01)
+    writer = FakeWriter()
+    writer.failures = 2
+    ingestor = PlayHistoryIngestor(writer)
+    play = _play()
+    ingestor.submit(play)
+
+    ingestor.start()
+    ingestor.stop(timeout=5)
+
+    assert writer.batches == [[play]]
+    assert ingestor.metrics().failed_batches == 2
+
+
+def test_writer_keeps_up_with_concurrent_submits() -> None:
+    writer = FakeWriter()
+    ingestor = PlayHistoryIngestor(
+        writer, max_queued=100, batch_size=50, submit_timeout=5
+    )
+    ingestor.start()
+
+    def play() -> None:
+        for _ in range(500):
+            ingestor.submit(_play())
+
+    threads = [threading.Thread(target=play) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ingestor.stop(timeout=5)
+
+    assert sum(len(batch) for batch in writer.batches) == 2000
+    assert max(len(batch) for batch in writer.batches) <= 50
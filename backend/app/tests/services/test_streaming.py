@@ -0,0 +1,65 @@
+import pytest
+
+from app.services.streaming import (
+    RangeNotSatisfiable,
+    if_range_matches,
+    parse_range_header,
+)
+
+
+def test_parse_single_range() -> None:
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+
+
+def test_parse_open_ended_range() -> None:
+    assert parse_range_header("bytes=500-", 1000) == [(500, 999)]
+
+
+def test_parse_suffix_range() -> None:
+    assert parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-5000", 1000) == [(0, 999)]
+
+
+def test_parse_clamps_end_to_file_size() -> None:
+    assert parse_range_header("bytes=900-5000", 1000) == [(900, 999)]
+
+
+def test_parse_merges_overlapping_and_adjacent_ranges() -> None:
+    assert parse_range_header("bytes=200-299, 0-99, 100-150, 250-400", 1000) == [
+        (0, 150),
+        (200, 400),
+    ]
+
+
+def test_parse_ignores_malformed_headers() -> None:
+    assert parse_range_header("items=0-1", 1000) is None
+    assert parse_range_header("bytes=abc-def", 1000) is None
+    assert parse_range_header("bytes=10-5", 1000) is None
+    assert parse_range_header("bytes=5", 1000) is None
+    too_many = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(50))
+    assert parse_range_header(f"bytes={too_many}", 1000) is None
+
+
+def test_parse_unsatisfiable_range() -> None:
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=1000-1100", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=-0", 1000)
+
+
+def test_if_range_requires_strong_etag() -> None:
+    etag = '"abc-10"'
+    assert if_range_matches('"abc-10"', etag=etag, last_modified=0)
+    assert not if_range_matches('W/"abc-10"', etag=etag, last_modified=0)
+    assert not if_range_matches('"other"', etag=etag, last_modified=0)
+
+
+def test_if_range_date() -> None:
+    date = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert if_range_matches(date, etag='"x"', last_modified=1445412480.5)
+    assert not if_range_matches(date, etag='"x"', last_modified=1445412481)
+
+
+def test_parse_open_ended_range_past_end_is_unsatisfiable() -> None:
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=5000-", 1000)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import subprocess
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from app import crud
+from app.core.config import settings
+from app.models import MediaJob, Rendition
+from app.services import transcoding
+from app.services.ffmpeg import find_ffmpeg
+from app.services.storage import LocalStorage
+from app.services.transcoding import (
+    MediaJobRunner,
+    MediaTask,
+    rendition_key,
+    requested_quality,
+    select_rendition,
+    transcode_rendition,
+)
+
+DIGEST = hashlib.sha256(b"song").hexdigest()
+
+
+def _renditions(*bitrates: int) -> list[Rendition]:
+    return [
+        Rendition(
+            source_digest=DIGEST,
+            bitrate_kbps=bitrate,
+            key=rendition_key(DIGEST, bitrate),
+            content_type="audio/mp4",
+            size=1,
+        )
+        for bitrate in bitrates
+    ]
+
+
+def test_requested_quality_prefers_parameter_over_client_hints() -> None:
+    assert requested_quality("medium", save_data="on", ect="2g") == "medium"
+    assert requested_quality(None, save_data="on", ect="4g") == "low"
+    assert requested_quality(None, save_data=None, ect="2g") == "low"
+    assert requested_quality(None, save_data=None, ect="3g") == "medium"
+    assert requested_quality(None, save_data=None, ect=None) == "high"
+
+
+def _selected_bitrate(renditions: list[Rendition], quality: str) -> int | None:
+    rendition = select_rendition(renditions, quality)
+    return rendition.bitrate_kbps if rendition else None
+
+
+def test_select_rendition_picks_best_fit_or_original() -> None:
+    renditions = _renditions(320, 96, 160)
+
+    assert _selected_bitrate(renditions, "medium") == 160
+    assert _selected_bitrate(renditions, "high") == 320
+    assert _selected_bitrate(_renditions(160, 320), "low") == 160
+    assert select_rendition(renditions, "original") is None
+    assert select_rendition([], "high") is None
+
+
+@pytest.mark.skipif(find_ffmpeg() is None, reason="ffmpeg is not installed")
+def test_transcode_rendition_stores_aac(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    ffmpeg = find_ffmpeg()
+    assert ffmpeg is not None
+    storage = LocalStorage(tmp_path / "store")
+    monkeypatch.setattr(transcoding, "get_storage", lambda: storage)
+    source = tmp_path / "track.wav"
+    subprocess.run(
+        [ffmpeg, "-f", "lavfi", "-i", "sine=duration=3", str(source)],
+        check=True,
+        capture_output=True,
+    )
+    storage.put_file("songs/track.wav", source)
+
+    key, size = transcode_rendition("songs/track.wav", DIGEST, 96)
+
+    assert key == rendition_key(DIGEST, 96)
+    stat = storage.stat(key)
+    assert stat is not None and stat.size == size
+    # MP4 container with the moov atom moved to the front
+    head = b"".join(storage.iter_range(key, 0, 4095))
+    assert head[4:8] == b"ftyp"
+    assert head.index(b"moov") < 4096
+
+
+def test_broken_pool_is_restarted_and_its_jobs_requeued(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    crashed = MediaJob(id=uuid.uuid4(), source_key="k", source_digest=DIGEST)
+    jobs = [crashed]
+    requeued: list[dict[str, Any]] = []
+    recorded: list[str | None] = []
+    # Kills its worker, the way an OOM kill does
+    task = MediaTask(name="crash", func=os._exit, args=(1,))
+    monkeypatch.setattr(transcoding, "media_task_count", lambda: 1)
+    monkeypatch.setattr(transcoding, "plan_media_tasks", lambda *_: [task])
+
+    def requeue_media_jobs(**kwargs: Any) -> int:
+        del kwargs["session"]
+        requeued.append(kwargs)
+        return 1
+
+    def record_media_task(*, error: str | None, **_: Any) -> None:
+        recorded.append(error)
+
+    monkeypatch.setattr(
+        crud, "claim_media_jobs", lambda **_: [jobs.pop()] if jobs else []
+    )
+    monkeypatch.setattr(crud, "requeue_media_jobs", requeue_media_jobs)
+    monkeypatch.setattr(crud, "record_media_task", record_media_task)
+    runner = MediaJobRunner(workers=1)
+    try:
+        assert runner.dispatch() == 1
+        deadline = time.monotonic() + 30
+        while not requeued and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # The crash counts against the job's attempts
+        assert requeued == [
+            {"job_ids": [crashed.id], "max_attempts": settings.MEDIA_JOB_MAX_ATTEMPTS}
+        ]
+        assert not recorded and not runner.outstanding
+
+        # The next dispatch finds the pool broken, starts a new one and puts
+        # back what it claimed without counting an attempt
+        claimed = MediaJob(id=uuid.uuid4(), source_key="k", source_digest=DIGEST)
+        jobs.append(claimed)
+        assert runner.dispatch() == 0
+        assert requeued[1] == {"job_ids": [claimed.id]}
+
+        monkeypatch.setattr(task, "func", abs)
+        jobs.append(claimed)
+        assert runner.dispatch() == 1
+        while not recorded and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert recorded == [None]
+    finally:
+        runner.executor.shutdown()
@@ -0,0 +1,85 @@
+import time
+import uuid
+
+import pytest
+
+from app.services.trending import TrendingEngine
+
+HOUR = 60 * 60
+
+
+def test_recent_plays_outrank_old_ones() -> None:
+    engine = TrendingEngine(half_life=HOUR, size=10, load=lambda *_: ({}, 0.0))
+    old, new = uuid.uuid4(), uuid.uuid4()
+    engine.reference = 0.0
+
+    engine.add(old, plays=3, at=0.0)
+    engine.add(new, plays=2, at=2 * HOUR)
+    engine.refresh(now=2 * HOUR)
+
+    assert engine.top() == [new, old]
+    assert engine.decayed_plays(old, now=2 * HOUR) == pytest.approx(0.75)
+    assert engine.decayed_plays(new, now=2 * HOUR) == pytest.approx(2.0)
+
+
+def test_refresh_rebases_and_forgets_stale_songs() -> None:
+    engine = TrendingEngine(half_life=HOUR, size=10, load=lambda *_: ({}, 0.0))
+    stale, fresh = uuid.uuid4(), uuid.uuid4()
+    engine.reference = 0.0
+    engine.add(stale, at=0.0)
+    engine.add(fresh, at=100 * HOUR)
+
+    engine.refresh(now=100 * HOUR)
+
+    assert engine.reference == 100 * HOUR
+    assert engine.scores == {fresh: pytest.approx(1.0)}
+    assert engine.top() == [fresh]
+
+
+def test_top_is_limited_to_size_and_paged() -> None:
+    engine = TrendingEngine(half_life=HOUR, size=3, load=lambda *_: ({}, 0.0))
+    songs = [uuid.uuid4() for _ in range(5)]
+    for plays, song_id in enumerate(songs, start=1):
+        engine.add(song_id, plays=plays)
+
+    engine.refresh()
+
+    assert engine.top() == songs[:1:-1]
+    assert engine.top(skip=1, limit=1) == [songs[3]]
+
+
+def test_reload_replaces_scores(monkeypatch: pytest.MonkeyPatch) -> None:
+    loaded, rolled_up, pending = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    engine = TrendingEngine(
+        half_life=HOUR,
+        size=10,
+        load=lambda reference, half_life: ({loaded: 4.0}, 200.0),
+    )
+    monkeypatch.setattr(time, "time", lambda: 100.0)
+    engine.add(rolled_up)
+    monkeypatch.setattr(time, "time", lambda: 300.0)
+    engine.add(pending, plays=2)
+
+    engine.reload()
+
+    assert engine.top() == [loaded, pending]
+    assert engine.decayed_plays(loaded, now=300.0) == pytest.approx(4.0)
+    assert engine.decayed_plays(pending, now=300.0) == pytest.approx(2.0)
+    assert engine.decayed_plays(rolled_up) == 0.0
+
+    monkeypatch.setattr(time, "time", lambda: 400.0)
+    engine.load = lambda reference, half_life: ({loaded: 4.0, pending: 2.0}, 300.0)
+    engine.reload()
+
+    assert engine.decayed_plays(pending, now=400.0) == pytest.approx(2.0)
+
+
+def test_future_plays_count_as_now() -> None:
+    engine = TrendingEngine(half_life=HOUR, size=10, load=lambda *_: ({}, 0.0))
+    song = uuid.uuid4()
+    now = time.time()
+    engine.reference = now
+
+    engine.add(song, at=now + 10_000 * HOUR)
+
+    assert engine.decayed_plays(song, now=now) == pytest.approx(1.0, rel=1e-3)
@@ -0,0 +1,174 @@
+import hashlib
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import anyio
+import pytest
+
+from app.services.storage import LocalStorage
+from app.services.uploads import (
+    FormUpload,
+    InvalidForm,
+    UnsupportedContentType,
+    UploadTooLarge,
+    commit_partial,
+    save_form_upload,
+)
+
+BOUNDARY = "----boundary7MA4YWxkTrZu0gW"
+
+
+def _form(filename: str, content: bytes, content_type: str = "audio/flac") -> bytes:
+    return (
+        (
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="title"\r\n\r\n'
+            "A title\r\n"
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        + content
+        + f"\r\n--{BOUNDARY}--\r\n".encode()
+    )
+
+
+def _save(
+    body: bytes,
+    root: Path,
+    max_size: int,
+    *,
+    content_length: int | None = None,
+    read: list[bytes] | None = None,
+) -> FormUpload:
+    async def stream() -> AsyncIterator[bytes]:
+        # Split so that parts straddle the pieces
+        for start in range(0, len(body), 65_000):
+            if read is not None:
+                read.append(body[start : start + 65_000])
+            yield body[start : start + 65_000]
+
+    headers = {
+        "content-type": f"multipart/form-data; boundary={BOUNDARY}",
+        "content-length": str(len(body) if content_length is None else content_length),
+    }
+    return anyio.run(
+        lambda: save_form_upload(
+            headers,
+            stream(),
+            LocalStorage(root / "store"),
+            "songs",
+            field="file",
+            content_types=["audio/flac", "audio/mpeg"],
+            scratch_dir=root / "scratch",
+            max_size=max_size,
+        )
+    )
+
+
+def _files(root: Path) -> list[Path]:
+    return [p for p in root.rglob("*") if p.is_file()]
+
+
+class FailingStorage(LocalStorage):
+    def put_file(
+        self, key: str, path: Path, *, content_type: str | None = None
+    ) -> None:
+        raise OSError("Storage unavailable")
+
+
+def test_save_upload_streams_and_hashes(tmp_path: Path) -> None:
+    content = b"abc" * 500_000
+
+    upload = _save(_form("track.flac", content), tmp_path, 10 * 1024 * 1024)
+
+    stored = upload.stored
+    sha256 = hashlib.sha256(content).hexdigest()
+    assert (tmp_path / "store" / stored.key).read_bytes() == content
+    assert stored.filename == f"{sha256}.flac"
+    assert stored.size == len(content)
+    assert stored.sha256 == sha256
+    assert not stored.deduplicated
+    assert upload.original_filename == "track.flac"
+    assert upload.content_type == "audio/flac"
+    assert [p.name for p in _files(tmp_path)] == [stored.filename]
+
+
+def test_save_upload_deduplicates_identical_content(tmp_path: Path) -> None:
+    first = _save(_form("a.mp3", b"same", "audio/mpeg"), tmp_path, 100).stored
+    second = _save(_form("b.mp3", b"same", "audio/mpeg"), tmp_path, 100).stored
+
+    assert second.deduplicated
+    assert second.key == first.key
+    assert len(_files(tmp_path)) == 1
+
+
+def test_save_upload_rejects_oversized_file(tmp_path: Path) -> None:
+    body = _form("track.mp3", b"x" * 4_000_000, "audio/mpeg")
+
+    # Sent without a usable Content-Length, the file's size is still checked
+    with pytest.raises(UploadTooLarge):
+        _save(body, tmp_path, 1_000_000, content_length=0)
+
+    assert _files(tmp_path) == []
+
+
+def test_save_upload_rejects_content_length_before_reading(tmp_path: Path) -> None:
+    read: list[bytes] = []
+
+    with pytest.raises(UploadTooLarge):
+        _save(_form("track.mp3", b"x" * 2_000_000), tmp_path, 1_000_000, read=read)
+
+    assert read == []
+    assert _files(tmp_path) == []
+
+
+def test_save_upload_rejects_content_type_before_writing(tmp_path: Path) -> None:
+    with pytest.raises(UnsupportedContentType):
+        _save(
+            _form("track.exe", b"MZ" * 1000, "application/octet-stream"),
+            tmp_path,
+            100_000,
+        )
+
+    assert _files(tmp_path) == []
+
+
+def test_save_upload_requires_the_file_field(tmp_path: Path) -> None:
+    body = f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="title"\r\n\r\nA\r\n'
+    body += f"--{BOUNDARY}--\r\n"
+
+    with pytest.raises(InvalidForm):
+        _save(body.encode(), tmp_path, 100)
+
+    assert _files(tmp_path) == []
+
+
+def test_commit_partial_removes_partial_once_stored(tmp_path: Path) -> None:
+    partial = tmp_path / "upload.part"
+    partial.write_bytes(b"fLaC" * 1000)
+
+    stored = anyio.run(
+        lambda: commit_partial(
+            partial, LocalStorage(tmp_path / "store"), "songs", suffix=".flac"
+        )
+    )
+
+    assert stored.sha256 == hashlib.sha256(b"fLaC" * 1000).hexdigest()
+    assert not partial.exists()
+    assert _files(tmp_path) == [tmp_path / "store" / stored.key]
+
+
+def test_commit_partial_keeps_partial_when_storing_fails(tmp_path: Path) -> None:
+    partial = tmp_path / "upload.part"
+    partial.write_bytes(b"fLaC" * 1000)
+
+    with pytest.raises(OSError):
+        anyio.run(
+            lambda: commit_partial(
+                partial, FailingStorage(tmp_path / "store"), "songs", suffix=".flac"
+            )
+        )
+
+    # Left for the client to complete the session again
+    assert partial.read_bytes() == b"fLaC" * 1000
@@ -0,0 +1,81 @@
+import uuid
+from typing import cast
+
+from sqlmodel import Session
+
+from app.models import UserStatsPublic
+from app.services.user_stats import UserStatsCache
+
+# The loader is faked, the session is passed through to it unused
+SESSION = cast(Session, None)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeLoader:
+    def __init__(self) -> None:
+        self.loads = 0
+
+    def __call__(self, _session: Session, _user_id: uuid.UUID) -> UserStatsPublic:
+        self.loads += 1
+        return _stats(likes_count=self.loads)
+
+
+def _stats(**counts: int) -> UserStatsPublic:
+    fields = dict.fromkeys(UserStatsPublic.model_fields, 0)
+    return UserStatsPublic(**{**fields, **counts})
+
+
+def test_stats_are_cached_until_they_expire() -> None:
+    clock, load = FakeClock(), FakeLoader()
+    cache = UserStatsCache(ttl=30, max_users=10, load=load, clock=clock)
+    user_id = uuid.uuid4()
+
+    assert cache.get(SESSION, user_id).likes_count == 1
+    clock.now += 29
+    assert cache.get(SESSION, user_id).likes_count == 1
+    clock.now += 1
+    assert cache.get(SESSION, user_id).likes_count == 2
+
+
+def test_invalidated_stats_are_loaded_again() -> None:
+    load = FakeLoader()
+    cache = UserStatsCache(ttl=30, max_users=10, load=load, clock=FakeClock())
+    user_id, other_id = uuid.uuid4(), uuid.uuid4()
+    cache.get(SESSION, user_id)
+    cache.get(SESSION, other_id)
+
+    cache.invalidate(user_id)
+
+    assert cache.get(SESSION, user_id).likes_count == 3
+    assert cache.get(SESSION, other_id).likes_count == 2
+
+
+def test_stats_loaded_during_invalidation_are_not_cached() -> None:
+    user_id = uuid.uuid4()
+    cache: UserStatsCache
+
+    def load(_session: Session, _user_id: uuid.UUID) -> UserStatsPublic:
+        # A like committed while the stats are counted
+        cache.invalidate(user_id)
+        return _stats()
+
+    cache = UserStatsCache(ttl=30, max_users=10, load=load, clock=FakeClock())
+    cache.get(SESSION, user_id)
+
+    assert user_id not in cache.cached
+
+
+def test_oldest_stats_are_dropped_beyond_limit() -> None:
+    cache = UserStatsCache(ttl=30, max_users=2, load=FakeLoader(), clock=FakeClock())
+    user_ids = [uuid.uuid4() for _ in range(3)]
+    for user_id in user_ids:
+        cache.get(SESSION, user_id)
+
+    assert list(cache.cached) == user_ids[1:]
@@ -0,0 +1,94 @@
+"""
+Benchmark song file delivery throughput for a single worker.
+
+Compares the previous 8 KiB generator behind ``StreamingResponse`` with
+``FileDeliveryResponse``, which reads with pread as it does under uvicorn.
+Both write into a local socket drained by a reader thread, so the numbers
+include the cost of getting the bytes to the kernel.
+
+    python scripts/bench_file_delivery.py --size-mb 50 --rounds 5
+"""
+
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+import anyio
+from fastapi.responses import StreamingResponse
+
+from app.services.streaming import FileDeliveryResponse
+
+
+def legacy_response(path: Path) -> StreamingResponse:
+    def iter_file() -> Iterator[bytes]:
+        with open(path, "rb") as f:
+            while chunk := f.read(8192):
+                yield chunk
+
+    return StreamingResponse(iter_file(), media_type="audio/mpeg")
+
+
+def drain(sock: socket.socket) -> None:
+    while sock.recv(1 << 20):
+        pass
+
+
+async def deliver(response: Any, sock: socket.socket) -> None:
+    scope = {"type": "http", "method": "GET", "extensions": {}}
+
+    async def receive() -> dict[str, Any]:
+        await anyio.sleep_forever()
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.body" and message["body"]:
+            sock.sendall(message["body"])
+
+    await response(scope, receive, send)
+
+
+def run(name: str, make_response: Any, path: Path, rounds: int) -> None:
+    size = path.stat().st_size
+    best = float("inf")
+    for _ in range(rounds):
+        writer, reader = socket.socketpair()
+        thread = threading.Thread(target=drain, args=(reader,))
+        thread.start()
+        started = time.perf_counter()
+        try:
+            anyio.run(partial(deliver, make_response(path), writer))
+        finally:
+            elapsed = time.perf_counter() - started
+            writer.close()
+            thread.join()
+        reader.close()
+        best = min(best, elapsed)
+    print(f"{name:<28} {size / best / 1e6:10.1f} MB/s  ({best * 1000:.1f} ms)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "song.mp3"
+        path.write_bytes(os.urandom(args.size_mb * 1024 * 1024))
+
+        def delivery(p: Path) -> FileDeliveryResponse:
+            return FileDeliveryResponse(p, [(0, p.stat().st_size)])
+
+        run("generator (8 KiB reads)", legacy_response, path, args.rounds)
+        run("pread (256 KiB aligned)", delivery, path, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
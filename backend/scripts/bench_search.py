@@ -0,0 +1,147 @@
+"""
+Benchmark catalog search latency against a large song table.
+
+Fills a temporary table with generated song titles and times the previous
+``ILIKE '%q%'`` search, which scans every row, against the trigram search
+of ``crud.search_songs`` on a GIN index of the titles. Queries are pieces
+of titles, misspelled words and words no title has. Needs the pg_trgm
+extension, which the migrations create.
+
+    python scripts/bench_search.py --rows 1000000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import string
+import time
+
+from sqlalchemy import text
+
+from app.core.db import engine
+
+SYLLABLES = [
+    "la",
+    "mi",
+    "son",
+    "tung",
+    "ho",
+    "an",
+    "ve",
+    "dem",
+    "nha",
+    "tro",
+    "xa",
+    "em",
+    "yeu",
+    "mua",
+    "thu",
+    "ban",
+    "gio",
+    "trang",
+    "sao",
+    "bien",
+    "nho",
+    "lanh",
+    "dau",
+]
+
+LEGACY_SEARCH = text(
+    "SELECT id FROM bench_song WHERE title ILIKE '%' || :q || '%' ORDER BY title LIMIT 50"
+)
+TRIGRAM_SEARCH = text(
+    "SELECT id FROM bench_song "
+    "WHERE title ILIKE '%' || :q || '%' OR :q <% title "
+    "ORDER BY word_similarity(:q, title) DESC, title LIMIT 50"
+)
+
+
+def word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def misspell(rng: random.Random, value: str) -> str:
+    index = rng.randrange(len(value))
+    return value[:index] + rng.choice(string.ascii_lowercase) + value[index + 1 :]
+
+
+def make_queries(rng: random.Random, titles: list[str], count: int) -> list[str]:
+    queries = []
+    for i in range(count):
+        title = rng.choice(titles)
+        if i % 3 == 0:
+            start = rng.randrange(max(1, len(title) - 4))
+            queries.append(title[start : start + rng.randint(4, 8)])
+        elif i % 3 == 1:
+            queries.append(misspell(rng, rng.choice(title.split())))
+        else:
+            queries.append("q" + word(rng) + "z")
+    return queries
+
+
+def run(name: str, conn, statement, queries: list[str]) -> None:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        conn.execute(statement, {"q": query}).all()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<28} p50 {statistics.median(timings):9.2f} ms   p99 {p99:9.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    words = sorted({word(rng) for _ in range(20_000)})
+
+    with engine.connect() as conn:
+        conn.execute(
+            text("CREATE TEMP TABLE bench_song (id serial PRIMARY KEY, title text)")
+        )
+        conn.execute(
+            text(
+                "INSERT INTO bench_song (title) "
+                "SELECT array_to_string(ARRAY("
+                "  SELECT words[1 + floor(random() * cardinality(words))::int] "
+                "  FROM generate_series(1, 2 + (n % 4))"
+                "), ' ') "
+                "FROM generate_series(1, :rows) AS n, CAST(:words AS text[]) AS words"
+            ),
+            {"words": words, "rows": args.rows},
+        )
+        conn.execute(text("ANALYZE bench_song"))
+        titles = [
+            row[0]
+            for row in conn.execute(
+                text("SELECT title FROM bench_song TABLESAMPLE SYSTEM (1) LIMIT 1000")
+            )
+        ]
+        queries = make_queries(rng, titles, args.queries)
+        print(f"{args.rows} songs, {len(queries)} queries")
+
+        run("ILIKE, sequential scan", conn, LEGACY_SEARCH, queries)
+        if not conn.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        ).first():
+            print("pg_trgm is not installed, the trigram search can't be timed")
+            conn.rollback()
+            return
+        started = time.perf_counter()
+        conn.execute(
+            text(
+                "CREATE INDEX bench_song_title_trgm ON bench_song USING gin (title gin_trgm_ops)"
+            )
+        )
+        conn.execute(text("ANALYZE bench_song"))
+        print(f"{'trigram index built':<28} {time.perf_counter() - started:9.1f} s")
+        run("trigram, GIN index", conn, TRIGRAM_SEARCH, queries)
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
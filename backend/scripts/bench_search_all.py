@@ -0,0 +1,161 @@
+"""
+Benchmark /search/all against a generated catalog.
+
+Fills the artist, album, song and playlist tables with generated names in a
+transaction that is rolled back, then times the four searches the endpoint
+used to run one after another against ``crud.search_all``, which ranks the
+four types in one query. The one query saves three round trips per
+request, and nothing else: with the database on the same host (200000
+songs) both took 47-49 ms p50 and 570-590 ms p99, no measurable gain.
+It has not been measured against a database on another host.
+
+    python scripts/bench_search_all.py --songs 200000 --queries 200
+"""
+
+import argparse
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app import crud
+from app.core.db import engine
+from app.models import TargetType
+
+SYLLABLES = [
+    "la",
+    "mi",
+    "son",
+    "tung",
+    "ho",
+    "an",
+    "ve",
+    "dem",
+    "nha",
+    "tro",
+    "xa",
+    "em",
+    "yeu",
+    "mua",
+    "thu",
+    "ban",
+    "gio",
+    "trang",
+    "sao",
+    "bien",
+    "nho",
+    "lanh",
+    "dau",
+]
+
+# Random names of 1 to 4 words out of :words
+NAME = (
+    "array_to_string(ARRAY("
+    "  SELECT words[1 + floor(random() * cardinality(words))::int] "
+    "  FROM generate_series(1, 1 + (n % 4))"
+    "), ' ')"
+)
+FILL = [
+    "INSERT INTO artist (id, stage_name, verified, followers_count, monthly_listeners, created_at) "
+    # Stage names are unique
+    f"SELECT gen_random_uuid(), {NAME} || ' ' || n, false, 0, floor(random() * 100000)::int, "
+    "now() "
+    "FROM generate_series(1, :songs / 50) AS n, CAST(:words AS text[]) AS words",
+    "INSERT INTO album (id, title, album_type, total_tracks, duration_ms, is_public, artist_id, "
+    "created_at) "
+    f"SELECT gen_random_uuid(), {NAME}, 'ALBUM', 0, 0, true, artist.id, now() "
+    "FROM (SELECT id, row_number() OVER () AS n FROM artist) AS artist, "
+    "generate_series(1, 5), CAST(:words AS text[]) AS words",
+    "INSERT INTO song (id, title, duration_ms, track_number, disc_number, explicit, "
+    "popularity_score, play_count, album_id, artist_id, created_at) "
+    f"SELECT gen_random_uuid(), {NAME}, 180000, 1, 1, false, 0, "
+    "floor(random() * 100000)::int, album.id, album.artist_id, now() "
+    "FROM (SELECT id, artist_id, row_number() OVER () AS n FROM album) AS album, "
+    "generate_series(1, 10), CAST(:words AS text[]) AS words",
+    "INSERT INTO playlist (id, name, is_public, is_collaborative, follower_count, total_tracks, "
+    "total_duration_ms, owner_id, created_at, updated_at) "
+    f"SELECT gen_random_uuid(), {NAME}, true, false, floor(random() * 1000)::int, 0, 0, "
+    '(SELECT id FROM "user" LIMIT 1), now(), now() '
+    "FROM generate_series(1, :songs / 20) AS n, CAST(:words AS text[]) AS words",
+    "UPDATE artist SET search_vector = to_tsvector('simple', stage_name) "
+    "WHERE search_vector IS NULL",
+    "UPDATE album SET search_vector = to_tsvector('simple', title) WHERE search_vector IS NULL",
+    "UPDATE song SET search_vector = to_tsvector('simple', title) WHERE search_vector IS NULL",
+    "UPDATE playlist SET search_vector = to_tsvector('simple', name) "
+    "WHERE search_vector IS NULL",
+    "ANALYZE artist, album, song, playlist",
+]
+
+
+def word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+
+
+def run(name: str, search: Callable[[str], object], queries: list[str]) -> None:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        search(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<28} p50 {statistics.median(timings):9.2f} ms   p99 {p99:9.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--songs", type=int, default=200_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    words = sorted({word(rng) for _ in range(5_000)})
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        for statement in FILL:
+            conn.execute(text(statement), {"words": words, "songs": args.songs})
+        # Whole words and words as typed so far
+        queries = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(1, 2)))[
+                : rng.randint(3, 12)
+            ]
+            for _ in range(args.queries)
+        ]
+        # Searches don't commit, the session only reads in the transaction
+        session = Session(bind=conn)
+        print(f"{args.songs} songs, {len(queries)} queries")
+
+        def one_by_one(query: str) -> None:
+            for target_type in (
+                TargetType.ARTIST,
+                TargetType.ALBUM,
+                TargetType.SONG,
+                TargetType.PLAYLIST,
+            ):
+                crud.search_text(
+                    session=session,
+                    target_type=target_type,
+                    query=query,
+                    match="prefix",
+                    limit=args.limit,
+                )
+
+        run("4 queries, one by one", one_by_one, queries)
+        run(
+            "search_all, one query",
+            lambda query: crud.search_all(
+                session=session, query=query, limit=args.limit
+            ),
+            queries,
+        )
+        session.close()
+        transaction.rollback()
+
+
+if __name__ == "__main__":
+    main()